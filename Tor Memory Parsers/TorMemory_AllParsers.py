@@ -0,0 +1,29 @@
+import argparse
+import os
+import sys
+
+from shared import CheckpointError, RunOptions, add_output_arguments, banner, check_output_arguments, extract_all_to_csv
+from plugins import builtin_parsers
+
+# Every parser here is served by the same single pass over the memory dump; tor_mem_scan.py also runs plugins
+memory_parsers = builtin_parsers()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run all Tor memory parsers over a Memory Dump in a single pass.")
+    parser.add_argument('-i', '--input', type=str, required=True, help="Path to the memory dump file.")
+    parser.add_argument('-o', '--output', type=str, help="Path to the output folder, one CSV is written per parser.")
+    add_output_arguments(parser)
+
+    args = parser.parse_args()
+    check_output_arguments(parser, args)
+    if not args.quiet:
+        print(banner("All Parsers (Single Pass)"))
+
+    if not os.path.isfile(args.input):
+        print("The specified memory dump file does not exist.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        extract_all_to_csv(args.input, args.output, memory_parsers, RunOptions.from_args(args))
+    except CheckpointError as e:
+        print(f"[-] {e}", file=sys.stderr)
+        sys.exit(1)
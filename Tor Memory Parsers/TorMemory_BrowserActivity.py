@@ -1,7 +1,7 @@
 import mmap
 import re
 
-from shared import run_argparser
+from shared import MemoryParser, log_event, reject, run_argparser
 from records import BrowserActivity
 
 # Pre-compile patterns for efficiency
@@ -19,7 +19,13 @@ patterns = [
 ]
 pattern_re = re.compile(b'|'.join(re.escape(p) for p in patterns))  # Join patterns into one regex
 
-def process_match(match_offset: int, memory_data: mmap.mmap, output_folder: str | None) -> BrowserActivity | None:
+# Byte pairs that end a carved activity string
+termination_pattern = re.compile(rb'\x00\x0E|\x00\xE5|\x00\x00')
+
+# Longest activity string searched for a terminator; hits with no terminator inside this window are dropped
+MAX_RECORD_LENGTH = 4096
+
+def process_match(match_offset: int, memory_data: mmap.mmap, output_folder: str | None, max_record_length: int = MAX_RECORD_LENGTH) -> BrowserActivity | None:
     """Processes pattern match within memory dump and writes relevant data to CSV."""
     match_prefix_len = 8
     try:
@@ -38,11 +44,11 @@ def process_match(match_offset: int, memory_data: mmap.mmap, output_folder: str
 
         if first_byte not in (b'\x00', b'\x08', b'\xFF', b'\xD0', b'\x2E', b'\x4F'):
             http_data_start = index
-            termination_pattern = re.compile(rb'\x00\x0E|\x00\xE5|\x00\x00')
-            match = termination_pattern.search(memory_data[http_data_start:])
+            # Search the mapped buffer in place so each hit costs at most max_record_length bytes
+            match = termination_pattern.search(memory_data, http_data_start, http_data_start + max_record_length)
             if not match:
-                return None
-            http_data_end = http_data_start + match.start()
+                return reject("no terminator within max record length")
+            http_data_end = match.start()
 
             try:
                 extracted_data = ''.join(
@@ -61,20 +67,32 @@ def process_match(match_offset: int, memory_data: mmap.mmap, output_folder: str
 
             # Skip writing if no printable data is found**
             if not extracted_data.strip():
-                return None
+                return reject("no printable data")
 
             index = http_data_end + 2  
-            print(f"[+] Potential Browser Activity identified at offset: {index}")
+            log_event(f"[+] Potential Browser Activity identified at offset: {index}")
 
             return BrowserActivity(match_offset, entry_type, extracted_data)
 
+        return reject("excluded first byte")
+
+csv_headers = ["Offset", "Type", "Extracted Data"]
+
+memory_parser = MemoryParser(
+    name = "browser_activity",
+    csv_headers = csv_headers,
+    regex_pattern = pattern_re,
+    process_matcher = process_match,
+    record_type = BrowserActivity
+)
+
 if __name__ == '__main__':
     run_argparser(
         description = "Extract Potential Tor Browser activity from Memory.",
         input_help = "Path to the memory dump file.",
         output_help = "Path to the output CSV file.",
         program_name = "Potential Browser Activity",
-        csv_headers = ["Offset", "Type", "Extracted Data"],
+        csv_headers = csv_headers,
         regex_pattern = pattern_re,
         process_matcher = process_match,
         output_folder = ""
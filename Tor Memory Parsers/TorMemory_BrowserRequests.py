@@ -1,20 +1,31 @@
 import mmap
-import re
 
-from shared import run_argparser
+from shared import MemoryParser, find_within, log_event, reject, run_argparser
 from records import BrowserRequest
+from anchors import Anchor, anchor_encoding, anchor_pattern
 
-# Pre-compile patterns for efficiency
-patterns = [
-    b'\x02\x00\x00\x00\xF8\x01\x00\x00\x4F\x5E',
-    b'\x02\x00\x00\x00\xF8\x00\x00\x00\x4F\x5E',
-    b'\x02\x00\x00\x00\xF8\x03\x00\x00\x4F\x5E',
+# Each header is followed by the 'O^' of the origin attributes, as 8-bit or two-byte text
+anchors = [
+    Anchor(b'\x02\x00\x00\x00\xF8\x01\x00\x00', 'O^'),
+    Anchor(b'\x02\x00\x00\x00\xF8\x00\x00\x00', 'O^'),
+    Anchor(b'\x02\x00\x00\x00\xF8\x03\x00\x00', 'O^'),
 ]
-pattern_re = re.compile(b'|'.join(re.escape(p) for p in patterns))  # Join patterns into one regex
+pattern_re = anchor_pattern(anchors)  # Join the anchors in both encodings into one regex
+
+# Furthest each field marker is searched for past the end of the previous field, in bytes of 8-bit text
+FIELD_LIMITS = {
+    'private_browsing_id': 100,         # 'privateBrowsingId='
+    'first_party_domain': 256,          # 'firstPartyDomain='
+    'first_party_domain_end': 256,      # ','
+    'requested_resource': 512,          # 'p,:'
+    'requested_resource_end': 2048,     # '\x00'
+}
 
 def process_match(match_offset: int, memory_data: mmap.mmap, _: str | None) -> BrowserRequest | None:
     """Processes pattern match within memory dump and writes to CSV only if required fields exist."""
-    match_prefix_len = 9
+    encoding = anchor_encoding(memory_data, match_offset, anchors)
+    text, unit = encoding.encode, encoding.unit  # Fields are in the same encoding as the anchor
+    match_prefix_len = 8 + unit
     try:
         matched_prefix = memory_data[match_offset:match_offset + match_prefix_len]
     except IndexError:
@@ -29,59 +40,69 @@ def process_match(match_offset: int, memory_data: mmap.mmap, _: str | None) -> B
         entry_type = "Browser Request" 
 
         # Extract Private Browsing ID (Required)
-        private_start = memory_data.find(b'privateBrowsingId=', index)
-        if private_start == -1 or private_start > index + 100:
-            return None
+        private_start = find_within(memory_data, text('privateBrowsingId='), index, FIELD_LIMITS['private_browsing_id'] * unit, 'browser_requests.private_browsing_id', unit)
+        if private_start == -1:
+            return reject("no privateBrowsingId")
 
-        private_id_start = private_start + len(b'privateBrowsingId=')
-        private_browsing_id_byte = memory_data[private_id_start:private_id_start+1]
+        private_id_start = private_start + len(text('privateBrowsingId='))
+        private_browsing_id_byte = memory_data[private_id_start:private_id_start + unit]
 
         try:
-            private_browsing_id = private_browsing_id_byte.decode('utf-8')
+            private_browsing_id = private_browsing_id_byte.decode(encoding.name)
             if not private_browsing_id.isprintable():
                 private_browsing_id = f"[Non-printable: {private_browsing_id_byte.hex()}]"
         except UnicodeDecodeError:
             private_browsing_id = f"[Non-printable: {private_browsing_id_byte.hex()}]"
 
-        index = private_id_start + 1
+        index = private_id_start + unit
 
         # Extract First Party Domain (Required)
-        first_party_start = memory_data.find(b'firstPartyDomain=', index)
+        first_party_start = find_within(memory_data, text('firstPartyDomain='), index, FIELD_LIMITS['first_party_domain'] * unit, 'browser_requests.first_party_domain', unit)
         if first_party_start == -1:
-            return  
+            return reject("no firstPartyDomain")
 
-        first_party_start += len(b'firstPartyDomain=')
-        first_party_end = memory_data.find(b'\x2C', first_party_start)
+        first_party_start += len(text('firstPartyDomain='))
+        first_party_end = find_within(memory_data, text(','), first_party_start, FIELD_LIMITS['first_party_domain_end'] * unit, 'browser_requests.first_party_domain_end', unit)
         if first_party_end == -1:
-            return  
+            return reject("unterminated firstPartyDomain")
 
-        first_party_domain = memory_data[first_party_start:first_party_end].decode(errors='ignore').strip()
-        index = first_party_end + 1
+        first_party_domain = encoding.decode(memory_data[first_party_start:first_party_end]).strip()
+        index = first_party_end + unit
 
         # Extract Requested Resource (Optional)
-        requested_resource_start = memory_data.find(b'\x70\x2C\x3A', index)
+        requested_resource_start = find_within(memory_data, text('p,:'), index, FIELD_LIMITS['requested_resource'] * unit, 'browser_requests.requested_resource', unit)
         if requested_resource_start != -1:
-            requested_resource_start += 3
-            requested_resource_end = memory_data.find(b'\x00', requested_resource_start)
+            requested_resource_start += len(text('p,:'))
+            requested_resource_end = find_within(memory_data, text('\x00'), requested_resource_start, FIELD_LIMITS['requested_resource_end'] * unit, 'browser_requests.requested_resource_end', unit)
             if requested_resource_end != -1:
-                requested_resource = memory_data[requested_resource_start:requested_resource_end].decode(errors='ignore').strip()
-                index = requested_resource_end + 1
+                requested_resource = encoding.decode(memory_data[requested_resource_start:requested_resource_end]).strip()
+                index = requested_resource_end + unit
         
         # Set Type as "Partially Recovered" if only required fields are found
         if requested_resource == "":
             entry_type = "Partially Carved Browser Request"
 
-        print(f"[+] {entry_type} Identified at offset {match_offset}")
+        log_event(f"[+] {entry_type} Identified at offset {match_offset}")
 
         return BrowserRequest(match_offset, entry_type, private_browsing_id, first_party_domain, requested_resource)
 
+csv_headers = ["Offset", "Type", "Private Browsing ID", "First Party Domain", "Request"]
+
+memory_parser = MemoryParser(
+    name = "browser_requests",
+    csv_headers = csv_headers,
+    regex_pattern = pattern_re,
+    process_matcher = process_match,
+    record_type = BrowserRequest
+)
+
 if __name__ == '__main__':
     run_argparser(
         description = "Extract Tor Browser Requests from Memory.",
         input_help = "Path to the memory dump file.",
         output_help = "Path to the output CSV file.",
         program_name = "Browser Requests",
-        csv_headers = ["Offset", "Type", "Private Browsing ID", "First Party Domain", "Request"],
+        csv_headers = csv_headers,
         regex_pattern = pattern_re,
         process_matcher = process_match,
         output_folder = ""
@@ -1,115 +1,112 @@
 import mmap
 import re
 
-from shared import run_argparser
-from base64icon import extract_base64_icon
+from shared import MemoryParser, bound_hits, log_event, reject, run_argparser
 from records import TabData
+from anchors import Anchor, anchor_encoding, anchor_pattern
+from fieldschema import DEFAULT_MAX_LENGTH, Field, FieldSchema
+from structured_clone import TAG_MARKER_OFFSET, DecodeError, decode_record, property_text, read_string, string_value_after_key
 
-# Pre-compile the pattern for efficiency
-patterns = [
-    b'\xFF\xFF\x66\x69\x72\x65\x66\x6F\x78\x2D\x70\x72\x69\x76\x61\x74\x65\x00'
+# The 'firefox-private' string after its \xFF\xFF tag marker, as 8-bit or two-byte text, with its first padding
+anchors = [
+    Anchor(b'\xFF\xFF', 'firefox-private\x00'),
 ]
-pattern_re = re.compile(b'|'.join(re.escape(p) for p in patterns))
+pattern_re = anchor_pattern(anchors)
+
+# Longest favicon URL carved, in bytes; base64 data:image favicons run to tens of KB
+MAX_FAVICON_LENGTH = 256 * 1024
+
+# Scans used to find the end of a favicon URL in bulk instead of byte by byte
+utf8_end_re = re.compile(rb'[\x00-\x1F]')  # First non-printable byte
+utf16_run_re = re.compile(rb'(?:.\x00)*', re.DOTALL)  # Code units whose odd (high) byte is zero
+
+def find_utf8_end(memory_data: mmap.mmap, start: int, window_end: int) -> int:
+    """Returns the offset of the first non-printable byte at or after start, or window_end if there is none"""
+    match = utf8_end_re.search(memory_data, start, window_end)
+    return match.start() if match else window_end
+
+def find_utf16_end(memory_data: mmap.mmap, start: int, window_end: int) -> int:
+    """Returns the offset of the first odd byte at or after start that is not 0x00, or window_end if there is none"""
+    # Walk whole code units from the even offset at or before start, so the odd bytes line up with the pattern
+    run = utf16_run_re.match(memory_data, start & ~1, window_end)
+    end = run.end() + 1
+    return end if end < window_end else max(start, window_end)
+
+def read_favicon_url(memory_data: mmap.mmap, index: int) -> tuple[str, int] | None:
+    """Reads a favicon URL stored as either UTF-16LE or UTF-8, returning the URL and the offset past it"""
+    # Detect encoding (UTF-16 if 2nd byte is 0x00, otherwise assume UTF-8)
+    is_utf16 = memory_data[index + 1] == 0x00  
+
+    # Find the end of the URL within MAX_FAVICON_LENGTH bytes
+    if is_utf16:
+        # UTF-16: Stop at first odd-byte that is NOT `0x00`
+        window_end = min(index + MAX_FAVICON_LENGTH, len(memory_data) - 1)
+        favicon_end = find_utf16_end(memory_data, index, window_end)
+    else:
+        # UTF-8: Stop at first non-printable character
+        window_end = min(index + MAX_FAVICON_LENGTH, len(memory_data))
+        favicon_end = find_utf8_end(memory_data, index, window_end)
+    if favicon_end == index + MAX_FAVICON_LENGTH:
+        bound_hits['browser_session_data.favicon_url'] += 1
+
+    if favicon_end <= index:
+        return None
+
+    # Decode based on detected encoding
+    raw_favicon_bytes = memory_data[index:favicon_end]
+    if is_utf16:
+        return raw_favicon_bytes.decode("utf-16-le", errors="ignore").strip(), favicon_end
+    return raw_favicon_bytes.decode("utf-8", errors="ignore").strip(), favicon_end
+
+# Fields following the 'firefox-private' anchor, in the order they are stored. Each key
+# name is followed by a \xFF\xFF marker that starts its value.
+field_schema = FieldSchema([
+    Field('url', b'url', key_window=15, value_window=16, marker_prefixed=False, required=True),
+    Field('title', b'title', key_window=50, value_window=16, marker_prefixed=False, default="Title Not Present"),
+    Field('favicon_url', b'favIconUrl', key_window=50, value_window=24, marker_prefixed=False, default="FavIconURL Not Present", max_length=MAX_FAVICON_LENGTH, reader=read_favicon_url),
+])
+string_limits = field_schema.max_lengths()
 
 def process_match(match_offset: int, memory_data: mmap.mmap, extracted_icons_folder: str | None) -> TabData | None:
     """Manually walks the memory data to extract Browser Tab Session Data."""
-    match_prefix_len = 26
+    encoding = anchor_encoding(memory_data, match_offset, anchors)
+    index = string_value_after_key(match_offset, len(encoding.encode('firefox-private')))  # Move past matched pattern
+
+    # Decode the tab record as a SpiderMonkey structured clone, starting after the 'firefox-private' string
+    properties = {}
     try:
-        matched_prefix = memory_data[match_offset:match_offset + match_prefix_len]
-    except IndexError:
-        return  
-
-    index = match_offset + match_prefix_len  # Move past matched pattern
-
-    # Locate 'url'
-    url_marker = memory_data.find(b'url', index, index + 15)
-    if url_marker == -1:  
-        return  # Skip if 'url' is not found
-
-    index = url_marker + 3 
-
-    # Initialize extracted fields
-    url = ""
-    title = "Title Not Present"
-    favicon_url = "FavIconURL Not Present"
-
-    # Extract URL
-    url_start_marker = memory_data.find(b'\xFF\xFF', index, index + 16)
-    if url_start_marker != -1:
-        index = url_start_marker + 2 
-        url_end = memory_data.find(b'\x00\x00', index, index + 2000)
-        if url_end != -1:
-            try:
-                url = memory_data[index:url_end].decode(errors='ignore').strip()
-            except UnicodeDecodeError:
-                url = "Decoding Error"
-            index = url_end + 2 
-
-    # Extract Title
-    title_marker = memory_data.find(b'title', index, index + 50)
-    if title_marker != -1:
-        index = title_marker + 5
-        title_start_marker = memory_data.find(b'\xFF\xFF', index, index + 16)  # Find FF FF within 16 bytes
-        if title_start_marker != -1:
-            index = title_start_marker + 2 
-            title_end = memory_data.find(b'\x00\x00', index, index + 2000)  # End marker for Title
-            if title_end != -1:
-                try:
-                    title = memory_data[index:title_end].decode(errors="ignore").strip()
-                except UnicodeDecodeError:
-                    title = "Decoding Error"
-                index = title_end + 2 
-
-    # Extract FavIconURL
-    favicon_marker = memory_data.find(b'favIconUrl', index, index + 50)  # Search for FavIcon URL
-    if favicon_marker != -1:
-        index = favicon_marker + 10  # Move past 'favIconUrl'
-        favicon_start_marker = memory_data.find(b'\xFF\xFF', index, index + 24)  # Search for `FF FF`
-        if favicon_start_marker != -1:
-            index = favicon_start_marker + 2  # Move past `FF FF`
-            
-            # Detect encoding (UTF-16 if 2nd byte is 0x00, otherwise assume UTF-8)
-            is_utf16 = memory_data[index + 1] == 0x00  
-
-            # Find the end of the URL dynamically
-            favicon_end = index
-            if is_utf16:
-                # UTF-16: Stop at first odd-byte that is NOT `0x00`
-                while favicon_end + 1 < len(memory_data):
-                    if favicon_end % 2 != 0 and memory_data[favicon_end] != 0x00:  
-                        break
-                    favicon_end += 1
-            else:
-                # UTF-8: Stop at first non-printable character
-                while favicon_end < len(memory_data):
-                    if memory_data[favicon_end] < 0x20:  # Stop at first non-printable byte
-                        break
-                    favicon_end += 1
-
-            # Extract and decode the favicon URL**
-            if favicon_end > index:
-                try:
-                    raw_favicon_bytes = memory_data[index:favicon_end]
-                    
-                    # Decode based on detected encoding
-                    if is_utf16:
-                        favicon_url = raw_favicon_bytes.decode("utf-16-le", errors="ignore").strip()
-                    else:
-                        favicon_url = raw_favicon_bytes.decode("utf-8", errors="ignore").strip()
-
-                except UnicodeDecodeError:
-                    favicon_url = "Decoding Error"
-
-                index = favicon_end  # Move index past extracted data
-
-                # Check if the extracted URL is Base64 and extract the icon
-                if extracted_icons_folder:
-                    extract_base64_icon(favicon_url, match_offset, extracted_icons_folder)
-                
-    print(f"[+] Extracted Browser Tab Session Data at offset {match_offset}")
+        anchor, record_start = read_string(memory_data, match_offset - TAG_MARKER_OFFSET, len('firefox-private'))
+        if anchor == 'firefox-private':
+            properties = decode_record(memory_data, record_start, string_limits, DEFAULT_MAX_LENGTH)
+    except DecodeError:
+        pass
+
+    if 'url' in properties:
+        fields = {field.name: property_text(properties, field.key.decode(), field.default) for field in field_schema.fields}
+    else:
+        # The record does not decode cleanly, so walk the \xFF\xFF markers instead
+
+        # Extract URL (Required), Title and FavIconURL
+        fields = field_schema.extract(memory_data, index, encoding)
+        if fields is None:
+            return reject("no url")  # Skip if 'url' is not found
+    favicon_url = fields['favicon_url']
+
+    # Base64 favicons are extracted into extracted_icons_folder by the run's FaviconWriter as the record is written
+    log_event(f"[+] Extracted Browser Tab Session Data at offset {match_offset}")
 
     # Write extracted data to CSV
-    return TabData(match_offset, "Browser Tab Session Data", url, title, favicon_url)
+    return TabData(match_offset, "Browser Tab Session Data", fields['url'], fields['title'], favicon_url)
+
+csv_headers = ["Offset", "Type", "URL", "Title", "FavIcon URL"]
+
+memory_parser = MemoryParser(
+    name = "browser_session_data",
+    csv_headers = csv_headers,
+    regex_pattern = pattern_re,
+    process_matcher = process_match,
+    record_type = TabData
+)
 
 if __name__ == '__main__':
     run_argparser(
@@ -117,7 +114,7 @@ if __name__ == '__main__':
         input_help = "Path to the memory dump file.",
         output_help = "Path to the output folder.",
         program_name = "Browser Tab Session Data",
-        csv_headers = ["Offset", "Type", "URL", "Title", "FavIcon URL"],
+        csv_headers = csv_headers,
         regex_pattern = pattern_re,
         process_matcher = process_match,
         output_folder = ""
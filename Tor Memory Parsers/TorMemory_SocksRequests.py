@@ -1,21 +1,36 @@
 import mmap
-import re
 
-from shared import run_argparser
+from shared import MemoryParser, find_within, log_event, reject, run_argparser
 from records import SocksRequest
+from anchors import Anchor, anchor_encoding, anchor_pattern
 
-# Pre-compile patterns for efficiency
-patterns = [
-    b'\x01\x00\x00\x00\xF8\x00\x00\x00\x2E',
-    b'\x01\x00\x00\x00\xF8\x01\x00\x00\x2E',   
-    b'\x02\x00\x00\x00\xF8\x01\x00\x00\x2E', 
-    b'\x02\x00\x00\x00\xF8\x00\x00\x00\x2E',   
+# Each header is followed by a '.', as 8-bit or two-byte text
+anchors = [
+    Anchor(b'\x01\x00\x00\x00\xF8\x00\x00\x00', '.'),
+    Anchor(b'\x01\x00\x00\x00\xF8\x01\x00\x00', '.'),
+    Anchor(b'\x02\x00\x00\x00\xF8\x01\x00\x00', '.'),
+    Anchor(b'\x02\x00\x00\x00\xF8\x00\x00\x00', '.'),
 ]
-pattern_re = re.compile(b'|'.join(re.escape(p) for p in patterns))  # Join patterns into one regex
+pattern_re = anchor_pattern(anchors)  # Join the anchors in both encodings into one regex
+
+# Furthest each field marker is searched for past the end of the previous field, in bytes of 8-bit text
+FIELD_LIMITS = {
+    'tls_metadata': 41,             # '[tlsflags' within 50 bytes of the match
+    'tls_metadata_end': 128,        # ']'
+    'url': 2048,                    # '(socks'
+    'socks_info': 20,               # ')'
+    'second_url_start': 65,         # '['
+    'second_url_end': 65,           # ':0:'
+    'private_browsing_id': 200,     # 'privateBrowsingId='
+    'first_party_domain': 256,      # 'firstPartyDomain='
+    'first_party_domain_end': 512,  # '\x00'
+}
 
 def process_match(match_offset: int, memory_data: mmap.mmap, _: str | None) -> SocksRequest | None:
     """Processes pattern match within memory dump"""
-    match_prefix_len = 9
+    encoding = anchor_encoding(memory_data, match_offset, anchors)
+    text, unit = encoding.encode, encoding.unit  # Fields are in the same encoding as the anchor
+    match_prefix_len = 8 + unit
     try:
         matched_prefix = memory_data[match_offset:match_offset + match_prefix_len]
     except IndexError:
@@ -32,90 +47,102 @@ def process_match(match_offset: int, memory_data: mmap.mmap, _: str | None) -> S
         first_party_domain = ""
 
         def stop_extraction() -> SocksRequest:
-            print (f"[+] Partially Carved SOCKS5 Traffic Identified at offset {match_offset}")
+            log_event(f"[+] Partially Carved SOCKS5 Traffic Identified at offset {match_offset}")
             return SocksRequest(match_offset, "Partially Carved SOCKS5 Browser Request", tls_metadata, url, socks_info, second_url, private_browsing_id, first_party_domain)
 
         # Extract TLS metadata (Required)
-        tls_metadata_start = memory_data.find(b'[tlsflags', index)
-        if tls_metadata_start != -1 and tls_metadata_start <= match_offset + 50:
-            tls_metadata_end = memory_data.find(b']', tls_metadata_start)
+        tls_metadata_start = find_within(memory_data, text('[tlsflags'), index, FIELD_LIMITS['tls_metadata'] * unit, 'socks_requests.tls_metadata', unit)
+        if tls_metadata_start != -1:
+            tls_metadata_end = find_within(memory_data, text(']'), tls_metadata_start, FIELD_LIMITS['tls_metadata_end'] * unit, 'socks_requests.tls_metadata_end', unit)
             if tls_metadata_end != -1:
-                tls_metadata = memory_data[tls_metadata_start:tls_metadata_end+1].decode(errors='ignore').strip()
+                tls_metadata = encoding.decode(memory_data[tls_metadata_start:tls_metadata_end + unit]).strip()
                 tls_metadata = tls_metadata.replace("[tlsflags", "").replace("]", "").strip()
-                index = tls_metadata_end + 1
+                index = tls_metadata_end + unit
 
         # Extract Requested URL (Required)
         url_start = index
-        url_end = memory_data.find(b'(socks', index)
+        url_end = find_within(memory_data, text('(socks'), index, FIELD_LIMITS['url'] * unit, 'socks_requests.url', unit)
         if url_end != -1:
-            url = memory_data[url_start:url_end].decode(errors='ignore').strip()
-            index = url_end + len(b'(socks:') 
+            url = encoding.decode(memory_data[url_start:url_end]).strip()
+            index = url_end + len(text('(socks:')) 
        
        # Ensure Required Fields Are Present
-        if tls_metadata == "" or url == "":
-            return  # Skip incomplete entries if any required field is missing
+        if tls_metadata == "":
+            return reject("no TLS metadata")  # Skip incomplete entries if any required field is missing
+        if url == "":
+            return reject("no URL")
         
         # Extract SOCKS info
-        socks_info_end = memory_data.find(b')', index)
-        if socks_info_end != -1:
-            if socks_info_end - index > 20:
-                return stop_extraction()
-            socks_info = memory_data[index:socks_info_end].decode(errors='ignore').strip()
-            index = socks_info_end + 1  # Move past closing bracket
+        socks_info_end = find_within(memory_data, text(')'), index, FIELD_LIMITS['socks_info'] * unit, 'socks_requests.socks_info', unit)
+        if socks_info_end == -1:
+            return stop_extraction()
+        socks_info = encoding.decode(memory_data[index:socks_info_end]).strip()
+        index = socks_info_end + unit  # Move past closing bracket
 
 
         # Extract Second URL
-        second_url_start = memory_data.find(b'[', index)
-        if second_url_start != -1:
-            second_url_start += 1  
-            second_url_end = memory_data.find(b':0:', second_url_start)
-            if second_url_end != -1 and second_url_end <= index + 65:
-                second_url = memory_data[second_url_start:second_url_end].decode(errors='ignore').strip()
-                index = second_url_end + 3  
-            else:
-                return stop_extraction()
+        second_url_start = find_within(memory_data, text('['), index, FIELD_LIMITS['second_url_start'] * unit, 'socks_requests.second_url_start', unit)
+        if second_url_start == -1:
+            return stop_extraction()
+        second_url_start += unit
+        second_url_end = find_within(memory_data, text(':0:'), second_url_start, index + FIELD_LIMITS['second_url_end'] * unit - second_url_start, 'socks_requests.second_url_end', unit)
+        if second_url_end != -1:
+            second_url = encoding.decode(memory_data[second_url_start:second_url_end]).strip()
+            index = second_url_end + len(text(':0:'))
+        else:
+            return stop_extraction()
 
         # Extract Private Browsing ID 
-        private_start = memory_data.find(b'privateBrowsingId=', index)
-        if private_start != -1 and private_start <= index + 200:
-            private_id_start = private_start + len(b'privateBrowsingId=')
-            private_browsing_id_byte = memory_data[private_id_start:private_id_start+1]
+        private_start = find_within(memory_data, text('privateBrowsingId='), index, FIELD_LIMITS['private_browsing_id'] * unit, 'socks_requests.private_browsing_id', unit)
+        if private_start != -1:
+            private_id_start = private_start + len(text('privateBrowsingId='))
+            private_browsing_id_byte = memory_data[private_id_start:private_id_start + unit]
             try:
-                private_browsing_id = private_browsing_id_byte.decode('utf-8')
+                private_browsing_id = private_browsing_id_byte.decode(encoding.name)
                 if not private_browsing_id.isprintable():
                     private_browsing_id = f"[Non-printable: {private_browsing_id_byte.hex()}]"
             except UnicodeDecodeError:
                 private_browsing_id = f"[Non-printable: {private_browsing_id_byte.hex()}]"
-            index = private_id_start + 1
+            index = private_id_start + unit
         else:
             return stop_extraction()
 
         # Extract First Party Domain 
-        first_party_start = memory_data.find(b'firstPartyDomain=', index)
+        first_party_start = find_within(memory_data, text('firstPartyDomain='), index, FIELD_LIMITS['first_party_domain'] * unit, 'socks_requests.first_party_domain', unit)
         if first_party_start != -1:
-            first_party_start += len(b'firstPartyDomain=')
-            first_party_end = memory_data.find(b'\x00', first_party_start)
+            first_party_start += len(text('firstPartyDomain='))
+            first_party_end = find_within(memory_data, text('\x00'), first_party_start, FIELD_LIMITS['first_party_domain_end'] * unit, 'socks_requests.first_party_domain_end', unit)
             if first_party_end != -1:
-                first_party_domain = memory_data[first_party_start:first_party_end].decode(errors='ignore').strip()
-                index = first_party_end + 1  
+                first_party_domain = encoding.decode(memory_data[first_party_start:first_party_end]).strip()
+                index = first_party_end + unit
             else:
                 return stop_extraction()
 
-        print(f"[+] SOCKS5 Traffic Identified at offset {match_offset}")
+        log_event(f"[+] SOCKS5 Traffic Identified at offset {match_offset}")
 
         # **Write Extracted Data to CSV**
         return SocksRequest(match_offset, "SOCKS5 Browser Request", tls_metadata, url, socks_info, second_url, private_browsing_id, first_party_domain)
     
+csv_headers = [
+    "Offset", "Type", "TLS Flags", "Requested Connection",
+    "SOCKS Info", "Session Connection", "Private Browsing ID", "First Party Domain"
+]
+
+memory_parser = MemoryParser(
+    name = "socks_requests",
+    csv_headers = csv_headers,
+    regex_pattern = pattern_re,
+    process_matcher = process_match,
+    record_type = SocksRequest
+)
+
 if __name__ == '__main__':
     run_argparser(
         description = "Extract Tor SOCKS5 Requests from a Memory Dump",
         input_help = "Path to the memory dump file.",
         output_help = "Path to the output CSV file.",
         program_name = "SOCKS5 Requests",
-        csv_headers = [
-            "Offset", "Type", "TLS Flags", "Requested Connection",
-            "SOCKS Info", "Session Connection", "Private Browsing ID", "First Party Domain"
-        ],
+        csv_headers = csv_headers,
         regex_pattern = pattern_re,
         process_matcher = process_match,
         output_folder = ""
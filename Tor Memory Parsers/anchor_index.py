@@ -0,0 +1,254 @@
+import argparse
+import heapq
+import json
+import mmap
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import product, repeat
+from typing import Iterator
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants, sre_parse
+
+from ranges import split_ranges
+from result_cache import dump_fingerprint
+
+# Bumped whenever the layout of an index changes, so old indexes are rebuilt rather than misread
+INDEX_FORMAT = 1
+
+# Bytes searched per step of the indexing pass
+INDEX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Patterns expanding to more literals than this are not indexed
+MAX_PATTERN_LITERALS = 256
+
+MANIFEST_NAME = "manifest.json"
+
+def _expand(parsed) -> list[bytes] | None:
+    """Every byte string a parsed pattern matches, or None if it can match anything but a fixed set of literals"""
+    literals = [b'']
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            alternatives = [bytes([value])]
+        elif op is sre_constants.IN and all(item_op is sre_constants.LITERAL for item_op, _ in value):
+            alternatives = [bytes([item]) for _, item in value]
+        elif op is sre_constants.BRANCH:
+            alternatives = []
+            for branch in value[1]:
+                branch_literals = _expand(branch)
+                if branch_literals is None:
+                    return None
+                alternatives.extend(branch_literals)
+        elif op is sre_constants.SUBPATTERN:
+            alternatives = _expand(value[-1])
+            if alternatives is None:
+                return None
+        else:
+            return None
+        literals = [prefix + suffix for prefix, suffix in product(literals, alternatives)]
+        if len(literals) > MAX_PATTERN_LITERALS:
+            return None
+    return literals
+
+def pattern_literals(pattern: re.Pattern[bytes]) -> list[bytes] | None:
+    """The literals a pattern is an alternation of, in the order re tries them, or None if it is anything else"""
+    if pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        literals = _expand(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None
+    if not literals or b'' in literals:
+        return None
+    return list(dict.fromkeys(literals))
+
+def anchor_file_name(literal: bytes) -> str:
+    return literal.hex() + ".u64"
+
+def build_anchor_index(dump_file_path: str, index_folder: str, literals: list[bytes], progress=None) -> None:
+    """Records the offset of every occurrence of each literal in one pass over the dump.
+
+    Each literal's offsets go to their own file of sorted native-endian
+    uint64s. Occurrences may overlap, so each parser can apply its own
+    matching rules when it reads them back. The manifest is written last and
+    names the dump's fingerprint, so an index that was interrupted or built
+    from another dump is never used.
+    """
+    os.makedirs(index_folder, exist_ok=True)
+    manifest_path = os.path.join(index_folder, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    literals = list(dict.fromkeys(literals))
+    longest = max(map(len, literals))
+    combined_re = re.compile(b'|'.join(re.escape(literal) for literal in literals))
+    anchor_files = {literal: open(os.path.join(index_folder, anchor_file_name(literal)), 'wb') for literal in literals}
+    counts = dict.fromkeys(literals, 0)
+    try:
+        with open(dump_file_path, 'rb') as dump_file:
+            dump_size = os.fstat(dump_file.fileno()).st_size
+            with mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ) as memory_data:
+                for chunk_start, chunk_end in split_ranges([(0, dump_size)], INDEX_CHUNK_SIZE):
+                    offsets = {literal: array('Q') for literal in literals}
+                    search_end = min(chunk_end + longest - 1, dump_size)
+                    position = chunk_start
+                    while True:
+                        match = combined_re.search(memory_data, position, search_end)
+                        if not match or match.start() >= chunk_end:
+                            break
+                        offset = match.start()
+                        # The search only reports the first literal found here, so check them all
+                        window = memory_data[offset:offset + longest]
+                        for literal in literals:
+                            if window.startswith(literal):
+                                offsets[literal].append(offset)
+                        position = offset + 1
+
+                    for literal, literal_offsets in offsets.items():
+                        literal_offsets.tofile(anchor_files[literal])
+                        counts[literal] += len(literal_offsets)
+                    if progress:
+                        progress.update(chunk_end)
+    finally:
+        for anchor_file in anchor_files.values():
+            anchor_file.close()
+
+    manifest = {
+        'format': INDEX_FORMAT,
+        'dump_file': os.path.abspath(dump_file_path),
+        'fingerprint': dump_fingerprint(dump_file_path),
+        'byteorder': sys.byteorder,
+        'anchors': {literal.hex(): counts[literal] for literal in literals},
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    if progress:
+        progress.finish()
+
+class AnchorIndex:
+    """The anchor offsets recorded for one dump, memory-mapped from the index folder.
+
+    iter_matches() replays the hits a scan would have found for a set of
+    parsers, reading only the offsets of their own literals.
+    """
+
+    def __init__(self, index_folder: str, manifest: dict):
+        self.index_folder = index_folder
+        self.offsets: dict[bytes, memoryview | array] = {}
+        self.maps: list[mmap.mmap] = []
+        for literal_hex in manifest['anchors']:
+            literal = bytes.fromhex(literal_hex)
+            with open(os.path.join(index_folder, anchor_file_name(literal)), 'rb') as anchor_file:
+                if manifest['byteorder'] != sys.byteorder:
+                    literal_offsets = array('Q', anchor_file.read())
+                    literal_offsets.byteswap()
+                    self.offsets[literal] = literal_offsets
+                elif os.fstat(anchor_file.fileno()).st_size == 0:
+                    self.offsets[literal] = array('Q')
+                else:
+                    anchor_map = mmap.mmap(anchor_file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.maps.append(anchor_map)
+                    self.offsets[literal] = memoryview(anchor_map).cast('Q')
+
+    @classmethod
+    def open(cls, index_folder: str, dump_file_path: str) -> 'AnchorIndex | None':
+        """Opens the index in index_folder, or returns None if there is none for this dump"""
+        try:
+            with open(os.path.join(index_folder, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format') != INDEX_FORMAT or manifest.get('fingerprint') != dump_fingerprint(dump_file_path):
+            return None
+        return cls(index_folder, manifest)
+
+    def covers(self, memory_parsers: list) -> bool:
+        """True if every literal of every parser was indexed"""
+        for memory_parser in memory_parsers:
+            literals = pattern_literals(memory_parser.regex_pattern)
+            if literals is None or any(literal not in self.offsets for literal in literals):
+                return False
+        return True
+
+    def iter_parser_matches(self, literals: list[bytes], start: int, end: int, lookbehind: int) -> Iterator[tuple[int, bytes]]:
+        """Yields (offset, literal) for the hits of one parser starting in [start, end), as its finditer would find them.
+
+        Hits from lookbehind bytes before start are walked too, so one that
+        runs into the range masks any overlapping hit, just as in a scan.
+        """
+        walk_start = max(0, start - lookbehind)
+        sources = []
+        for rank, literal in enumerate(literals):
+            literal_offsets = self.offsets[literal]
+            first, last = bisect_left(literal_offsets, walk_start), bisect_left(literal_offsets, end)
+            sources.append(zip(literal_offsets[first:last], repeat(rank), repeat(literal)))
+
+        next_allowed = 0
+        # Several literals can occur at one offset; re takes the first alternative, so rank breaks the tie
+        for offset, rank, literal in heapq.merge(*sources):
+            if offset < next_allowed:
+                continue
+            next_allowed = offset + len(literal)
+            if offset >= start:
+                yield offset, literal
+
+    def iter_matches(self, memory_parsers: list, start: int, end: int, lookbehind: int) -> Iterator[tuple]:
+        """Yields (parser, offset, literal) for every parser's hits in [start, end), in offset and then parser order"""
+        sources = []
+        for parser_index, memory_parser in enumerate(memory_parsers):
+            literals = pattern_literals(memory_parser.regex_pattern)
+            sources.append(zip(self.iter_parser_matches(literals, start, end, lookbehind), repeat(parser_index)))
+        for (offset, literal), parser_index in heapq.merge(*sources):
+            yield memory_parsers[parser_index], offset, literal
+
+    def close(self) -> None:
+        self.offsets.clear()
+        for anchor_map in self.maps:
+            anchor_map.close()
+        self.maps.clear()
+
+def open_anchor_index(dump_file_path: str, index_folder: str, memory_parsers: list, progress=None) -> AnchorIndex | None:
+    """Opens the dump's index in index_folder, first building it if it is missing, stale or lacks a parser's literals.
+
+    A rebuilt index keeps the literals of the one it replaces, so indexing for
+    one parser never drops another's. Returns None if some parser's pattern is
+    not a set of literals, in which case the dump has to be scanned.
+    """
+    parser_literals = [pattern_literals(memory_parser.regex_pattern) for memory_parser in memory_parsers]
+    if any(literals is None for literals in parser_literals):
+        return None
+
+    anchor_index = AnchorIndex.open(index_folder, dump_file_path)
+    if anchor_index and anchor_index.covers(memory_parsers):
+        return anchor_index
+
+    literals = [literal for literals in parser_literals for literal in literals]
+    if anchor_index:
+        literals = list(anchor_index.offsets) + literals
+        anchor_index.close()
+    if progress:
+        progress.stream.write(f"Indexing anchors into {index_folder}\n")
+    build_anchor_index(dump_file_path, index_folder, literals, progress)
+    return AnchorIndex.open(index_folder, dump_file_path)
+
+if __name__ == '__main__':
+    from shared import Progress
+    from TorMemory_AllParsers import memory_parsers
+
+    parser = argparse.ArgumentParser(description="Index the offsets of anchor literals in a Memory Dump, so parsers can carve without scanning it.")
+    parser.add_argument('-i', '--input', type=str, required=True, help="Path to the memory dump file.")
+    parser.add_argument('-o', '--output', type=str, required=True, help="Path to the index folder.")
+    parser.add_argument('--anchor', type=bytes.fromhex, action='append', default=[], help="Also index this literal, given in hex (repeatable).")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Do not show the progress bar.")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input):
+        print("The specified memory dump file does not exist.", file=sys.stderr)
+        sys.exit(1)
+    anchors = [literal for memory_parser in memory_parsers for literal in pattern_literals(memory_parser.regex_pattern)] + args.anchor
+    build_anchor_index(args.input, args.output, anchors, None if args.quiet else Progress(os.path.getsize(args.input)))
@@ -0,0 +1,66 @@
+import mmap
+import re
+from dataclasses import dataclass
+from functools import cached_property
+
+# Gecko holds a string either as 8-bit text or as two-byte UTF-16LE text, so text is looked for in both
+TEXT_ENCODINGS = ('utf-8', 'utf-16-le')
+
+class TextEncoding:
+    """Encodes the text a parser searches for, and decodes the fields it finds, in one of TEXT_ENCODINGS.
+
+    unit is the size of a code unit in bytes. Two-byte text only matches at
+    whole code units from where the search starts, and byte distances written
+    for 8-bit text are scaled by it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.unit = len('\x00'.encode(name))
+        self._encoded: dict[str, bytes] = {}
+
+    def encode(self, text: str) -> bytes:
+        encoded = self._encoded.get(text)
+        if encoded is None:
+            encoded = self._encoded[text] = text.encode(self.name)
+        return encoded
+
+    def decode(self, data: bytes) -> str:
+        return data.decode(self.name, errors='ignore')
+
+UTF8, UTF16LE = (TextEncoding(name) for name in TEXT_ENCODINGS)
+
+@dataclass(frozen=True)
+class Anchor:
+    """What a parser's hits start with: binary prefix bytes, then text matched in each of TEXT_ENCODINGS."""
+    prefix: bytes
+    text: str = ""
+
+    @cached_property
+    def variants(self) -> list[tuple[TextEncoding, bytes]]:
+        if not self.text:
+            return [(UTF8, self.prefix)]
+        return [(encoding, self.prefix + encoding.encode(self.text)) for encoding in (UTF8, UTF16LE)]
+
+def anchor_pattern(anchors: list[Anchor]) -> re.Pattern[bytes]:
+    """One pattern matching every anchor in every encoding, all the 8-bit forms first, so a single scan finds both"""
+    variants = [variant for anchor in anchors for variant in anchor.variants]
+    ordered = [literal for encoding, literal in variants if encoding is UTF8] + [literal for encoding, literal in variants if encoding is not UTF8]
+    return re.compile(b'|'.join(re.escape(literal) for literal in ordered))
+
+def anchor_encoding(memory_data: mmap.mmap, offset: int, anchors: list[Anchor]) -> TextEncoding:
+    """The encoding of the anchor at offset. Where both forms fit, as when the text is one character
+    followed by a zero byte, the longer two-byte form wins."""
+    longest = UTF8, 0
+    for anchor in anchors:
+        for encoding, literal in anchor.variants:
+            if len(literal) > longest[1] and memory_data[offset:offset + len(literal)] == literal:
+                longest = encoding, len(literal)
+    return longest[0]
+
+def find_aligned(memory_data: mmap.mmap, sub: bytes, start: int, end: int, unit: int = 1) -> int:
+    """Finds sub within [start, end) at a whole number of unit-byte code units from start, or returns -1"""
+    position = memory_data.find(sub, start, end)
+    while position != -1 and (position - start) % unit:
+        position = memory_data.find(sub, position + 1, end)
+    return position
@@ -1,55 +1,153 @@
 import os
 import re
+import csv
 import base64
 import binascii
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
-def is_valid_base64(s: str) -> bool:
-    """Check if a string is a valid Base64 encoded string."""
-    try:
-        base64.b64decode(s, validate=True)
-        return True
-    except (binascii.Error, ValueError):
-        return False
+# Threads decoding and writing favicons behind the scan
+FAVICON_WRITER_THREADS = 2
 
+# Favicons waiting to be decoded before add() waits for the writers to catch up
+MAX_PENDING_FAVICONS = 1024
 
-def extract_base64_icon(favicon_url: str, index: int, extracted_icons_folder: str) ->  tuple[str, str] | None:
-    """Extract base64-encoded favicons and save them to a folder."""
-    
-    if not favicon_url.startswith('data:image'):
-        return None  # Not a Base64 image
+# Maps every carved favicon's offset to its image file, written into the favicon folder
+MANIFEST_NAME = "favicon_manifest.csv"
+MANIFEST_HEADERS = ["Offset", "File", "SHA256", "Size"]
 
+def decode_base64_icon(favicon_url: str) -> tuple[bytes, str] | None:
+    """Decodes a data:image favicon URL into its image bytes and file extension, or returns None if its data is not valid base64"""
+    # Extract Base64 data part, keeping only valid Base64 characters
+    base64_data = re.sub(r'[^A-Za-z0-9+/=]', '', favicon_url.split(',', 1)[1])
     try:
-        # Extract Base64 data part
-        base64_data = favicon_url.split(',', 1)[1].strip()
+        # Validates and decodes in one pass
+        image_data = base64.b64decode(base64_data, validate=True)
+    except binascii.Error:
+        return None
+
+    # Determine file extension
+    file_extension = 'ico' if 'image/x-icon' in favicon_url else 'png'
+    return image_data, file_extension
+
+class FaviconWriter:
+    """Extracts base64 favicons into a folder on background threads, so carving never waits on the disk.
+
+    Each distinct favicon URL is decoded once and each distinct image is
+    written once, named by its SHA-256. The manifest maps every offset a
+    favicon was carved at to its image file, and is written in the order the
+    favicons were added. Messages for the event log are handed to log in the
+    same order.
+
+    A resumed run passes the manifest_position its checkpoint recorded (see
+    checkpoint()): the manifest is cut back to that length, dropping rows
+    written after the checkpoint, and appended to.
+    """
+
+    def __init__(self, extracted_icons_folder: str, log, manifest_position: int | None = None):
+        self.extracted_icons_folder = extracted_icons_folder
+        self.log = log
+        self.manifest_path = os.path.join(extracted_icons_folder, MANIFEST_NAME)
+        # Bytes of the manifest written out so far, including those kept from the run being resumed
+        self.manifest_length = 0
+        if manifest_position is not None and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r+b') as manifest_file:
+                self.manifest_length = min(manifest_position, os.fstat(manifest_file.fileno()).st_size)
+                manifest_file.truncate(self.manifest_length)
+        self.executor: ThreadPoolExecutor | None = None
+        self.manifest_file = None
+        self.manifest_writer = None
+        # BLAKE2 digest of each favicon URL added -> the Future of its decoding, shared by every offset
+        # it appears at, replaced by what store() returned or the error it raised once that is written
+        # out, so no URL is held once it has been decoded
+        self.decoded: dict[bytes, Future | tuple[str, str, int] | str | None] = {}
+        self.written: set[str] = set()
+        self.written_lock = threading.Lock()
+        # (offset, URL digest) in the order they were added, waiting for their manifest row
+        self.pending: deque[tuple[int, bytes]] = deque()
+
+    def add(self, offset: int, favicon_url: str) -> None:
+        """Queues the favicon carved at offset, if it is a base64 image"""
+        if not favicon_url.startswith('data:image'):
+            return  # Not a Base64 image
+        if self.executor is None:
+            os.makedirs(self.extracted_icons_folder, exist_ok=True)
+            self.executor = ThreadPoolExecutor(FAVICON_WRITER_THREADS, thread_name_prefix='favicon-writer')
 
-        # Ensure only valid Base64 characters remain
-        base64_data = re.sub(r'[^A-Za-z0-9+/=]', '', base64_data)
+        url_digest = hashlib.blake2b(favicon_url.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        if url_digest not in self.decoded:
+            self.decoded[url_digest] = self.executor.submit(self.store, favicon_url)
+        self.pending.append((offset, url_digest))
+        self.write_manifest_rows(wait=len(self.pending) >= MAX_PENDING_FAVICONS)
 
-        # Validate Base64 data before decoding
-        if not is_valid_base64(base64_data):
-            print(f"[-] Invalid Base64 favicon at offset {index}, skipping extraction.")
+    def store(self, favicon_url: str) -> tuple[str, str, int] | None:
+        """Decodes a favicon and writes its image unless an identical one was written already; runs on a writer thread"""
+        decoded = decode_base64_icon(favicon_url)
+        if decoded is None:
             return None
+        image_data, file_extension = decoded
+        digest = hashlib.sha256(image_data).hexdigest()
+        output_filename = f"{digest}.{file_extension}"
 
-        # Decode Base64 data
-        image_data = base64.b64decode(base64_data)
+        with self.written_lock:
+            if output_filename in self.written:
+                return output_filename, digest, len(image_data)
+            self.written.add(output_filename)
 
-        # Determine file extension
-        file_extension = 'ico' if 'image/x-icon' in favicon_url else 'png'
+        icon_output = os.path.join(self.extracted_icons_folder, output_filename)
+        # Files are named by their content, so one left by an earlier run already holds this image
+        if not os.path.exists(icon_output):
+            temporary_output = icon_output + ".tmp"
+            with open(temporary_output, 'wb') as image_file:
+                image_file.write(image_data)
+            os.replace(temporary_output, icon_output)
+        return output_filename, digest, len(image_data)
 
-        # Ensure output folder exists
-        os.makedirs(extracted_icons_folder, exist_ok=True)
+    def write_manifest_rows(self, wait: bool = False) -> None:
+        """Writes the manifest rows of the favicons at the front of the queue that are done, or of all of them if wait is set"""
+        while self.pending:
+            offset, url_digest = self.pending[0]
+            stored = self.decoded[url_digest]
+            if isinstance(stored, Future):
+                if not (wait or stored.done()):
+                    break
+                try:
+                    stored = stored.result()
+                except (OSError, IndexError, ValueError) as e:
+                    stored = str(e)
+                self.decoded[url_digest] = stored
+            self.pending.popleft()
 
-        # Name the file as the starting offset for the favicon data
-        output_filename = f"{index}_favicon.{file_extension}"
-        icon_output = os.path.join(extracted_icons_folder, output_filename)
+            if isinstance(stored, str):
+                self.log(f"[-] Error decoding Base64 Favicon at offset {offset}: {stored}")
+                continue
+            if stored is None:
+                self.log(f"[-] Invalid Base64 favicon at offset {offset}, skipping extraction.")
+                continue
 
-        # Save image data to file
-        with open(icon_output, 'wb') as image_file:
-            image_file.write(image_data)
+            output_filename, digest, size = stored
+            if self.manifest_writer is None:
+                self.manifest_file = open(self.manifest_path, 'a' if self.manifest_length else 'w', newline='', encoding='utf-8')
+                self.manifest_writer = csv.writer(self.manifest_file)
+                if not self.manifest_length:
+                    self.manifest_writer.writerow(MANIFEST_HEADERS)
+            self.manifest_writer.writerow([offset, output_filename, digest, size])
+            self.log(f"[+] Favicon Extracted: {os.path.join(self.extracted_icons_folder, output_filename)}")
 
-        print(f"[+] Favicon Extracted: {icon_output}")
-        return output_filename, icon_output
+    def checkpoint(self) -> int:
+        """Writes out the manifest rows of every favicon added so far and returns the manifest's length, for a CSV run's checkpoint"""
+        self.write_manifest_rows(wait=True)
+        if self.manifest_file:
+            self.manifest_file.flush()
+            self.manifest_length = self.manifest_file.buffer.tell()
+        return self.manifest_length
 
-    except (binascii.Error, OSError, IndexError, ValueError) as e:
-        print(f"[-] Error decoding Base64 Favicon at offset {index}: {e}")
-        return None
\ No newline at end of file
+    def close(self) -> None:
+        """Waits for the queued favicons and finishes the manifest"""
+        if self.executor:
+            self.write_manifest_rows(wait=True)
+            self.executor.shutdown()
+        if self.manifest_file:
+            self.manifest_file.close()
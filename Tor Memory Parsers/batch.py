@@ -0,0 +1,206 @@
+import csv
+import dataclasses
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+from shared import MemoryParser, RunOptions, bound_hits, extract_all_to_csv
+
+# Files in a batch folder with these extensions are taken to be memory dumps; list any others in a manifest
+DUMP_EXTENSIONS = {'.bin', '.core', '.dd', '.dmp', '.img', '.lime', '.mem', '.raw', '.vmem'}
+
+# Dumps read from one storage device at a time, by default; disks mostly slow down when read in several places at once
+PER_DEVICE_JOBS = 1
+
+# Folder inside the batch output holding the case-level CSVs of every dump's records
+MERGED_FOLDER = "merged"
+
+# First column of the merged CSVs, naming the dump a record was carved from
+DUMP_HEADER = "Dump"
+
+@dataclass
+class BatchDump:
+    """A dump in a batch, and the name of its output folder."""
+    path: str
+    label: str
+    size: int
+    # Storage device holding the dump, from os.stat
+    device: int
+
+def dump_label(path: str, base_folder: str) -> str:
+    """A folder name for a dump's outputs: its path from base_folder, less the extension, with separators replaced"""
+    relative_path = os.path.relpath(path, base_folder)
+    if relative_path.startswith(os.pardir):
+        relative_path = os.path.basename(path)
+    return re.sub(r'[\\/:]+', '_', os.path.splitext(relative_path)[0])
+
+def find_dumps(batch_path: str) -> list[BatchDump]:
+    """The dumps in a folder, searched recursively for DUMP_EXTENSIONS, or listed in a manifest file.
+
+    A manifest names one dump per line, relative to the manifest's folder
+    unless absolute; blank lines and anything after a # are skipped. Dumps
+    are returned in path order, each with a unique label.
+    """
+    if os.path.isdir(batch_path):
+        base_folder = batch_path
+        paths = [
+            os.path.join(folder, file_name)
+            for folder, _, file_names in os.walk(batch_path)
+            for file_name in file_names
+            if os.path.splitext(file_name)[1].lower() in DUMP_EXTENSIONS
+        ]
+    else:
+        base_folder = os.path.dirname(os.path.abspath(batch_path))
+        paths = []
+        with open(batch_path, encoding='utf-8') as manifest_file:
+            for line_number, line in enumerate(manifest_file, 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                path = os.path.join(base_folder, line)
+                if not os.path.isfile(path):
+                    raise ValueError(f"{batch_path}, line {line_number}: dump {line} does not exist")
+                paths.append(path)
+
+    dumps = []
+    # Counted already, so a dump named like MERGED_FOLDER gets a suffix too
+    labels = Counter({MERGED_FOLDER: 1})
+    for path in sorted(dict.fromkeys(os.path.abspath(path) for path in paths)):
+        label = dump_label(path, os.path.abspath(base_folder))
+        labels[label] += 1
+        if labels[label] > 1:
+            label = f"{label}-{labels[label]}"
+        stat = os.stat(path)
+        dumps.append(BatchDump(path, label, stat.st_size, stat.st_dev))
+    return dumps
+
+def dump_options(options: RunOptions, output_folder: str) -> RunOptions:
+    """The options for one dump of a batch: quiet, with its event log and anchor index in places of its own"""
+    log_path = options.log_path
+    if log_path and log_path != '-':
+        log_path = os.path.join(output_folder, os.path.basename(log_path))
+    index_folder = options.index_folder and os.path.join(options.index_folder, os.path.basename(output_folder))
+    return dataclasses.replace(options, quiet=True, log_path=log_path, index_folder=index_folder)
+
+def run_dump(dump_file_path: str, output_folder: str, memory_parsers: list[MemoryParser], options: RunOptions) -> float:
+    """Carves one dump of a batch in a pool process and returns the seconds it took"""
+    # Pool processes carve several dumps in turn, so the field limit counts must not carry over
+    bound_hits.clear()
+    started = time.perf_counter()
+    extract_all_to_csv(dump_file_path, output_folder, memory_parsers, options)
+    return time.perf_counter() - started
+
+def run_batch(dumps: list[BatchDump], output_folder: str, memory_parsers: list[MemoryParser], options: RunOptions, jobs: int, per_device: int = PER_DEVICE_JOBS, stream=sys.stdout) -> list[dict]:
+    """Carves each dump into its own folder under output_folder, jobs dumps at a time, and returns a result per dump.
+
+    The biggest dump waiting goes next, so a large image is not left to run
+    on its own at the end, except that no more than per_device dumps are read
+    from one storage device at once. A dump that fails is reported and the
+    batch carries on.
+    """
+    pending = sorted(dumps, key=lambda dump: dump.size, reverse=True)
+    running = {}
+    device_jobs = Counter()
+    results = []
+    with ProcessPoolExecutor(jobs) as executor:
+        while pending or running:
+            for dump in list(pending):
+                if len(running) >= jobs:
+                    break
+                if device_jobs[dump.device] >= per_device:
+                    continue
+                pending.remove(dump)
+                device_jobs[dump.device] += 1
+                dump_folder = os.path.join(output_folder, dump.label)
+                running[executor.submit(run_dump, dump.path, dump_folder, memory_parsers, dump_options(options, dump_folder))] = dump
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                dump = running.pop(future)
+                device_jobs[dump.device] -= 1
+                result = {'dump_file': dump.path, 'label': dump.label, 'size_bytes': dump.size}
+                try:
+                    result['seconds'] = round(future.result(), 3)
+                    message = f"[+] {dump.label}: {dump.size / 1024 ** 2:.1f} MiB in {result['seconds']:.1f}s ({throughput(dump.size, result['seconds'])})"
+                except Exception as e:
+                    result['error'] = str(e)
+                    message = f"[-] {dump.label}: {e}"
+                if stream:
+                    stream.write(message + "\n")
+                    stream.flush()
+                results.append(result)
+    return sorted(results, key=lambda result: result['label'])
+
+def throughput(size: int, seconds: float) -> str:
+    return f"{size / 1024 ** 2 / seconds:.1f} MiB/s" if seconds > 0 else "-"
+
+def merge_outputs(results: list[dict], output_folder: str, memory_parsers: list[MemoryParser]) -> dict[str, int]:
+    """Concatenates each parser's CSV from every finished dump into MERGED_FOLDER, with a first column naming the dump.
+
+    Returns the number of rows merged per parser.
+    """
+    merged_folder = os.path.join(output_folder, MERGED_FOLDER)
+    os.makedirs(merged_folder, exist_ok=True)
+    row_counts = {}
+    for memory_parser in memory_parsers:
+        row_counts[memory_parser.name] = 0
+        with open(os.path.join(merged_folder, f"{memory_parser.name}.csv"), 'w', newline='', encoding='utf-8') as merged_file:
+            merged_writer = csv.writer(merged_file)
+            header_written = False
+            for result in results:
+                if 'error' in result:
+                    continue
+                with open(os.path.join(output_folder, result['label'], f"{memory_parser.name}.csv"), newline='', encoding='utf-8') as dump_file:
+                    dump_reader = csv.reader(dump_file)
+                    headers = next(dump_reader, None)
+                    if headers is None:
+                        continue
+                    if not header_written:
+                        merged_writer.writerow([DUMP_HEADER] + headers)
+                        header_written = True
+                    for row in dump_reader:
+                        merged_writer.writerow([result['label']] + row)
+                        row_counts[memory_parser.name] += 1
+    return row_counts
+
+def carve_batch(batch_path: str, output_folder: str, memory_parsers: list[MemoryParser], options: RunOptions, jobs: int, per_device: int = PER_DEVICE_JOBS) -> bool:
+    """Runs a whole batch: every dump, then the merged outputs, then the report in batch.json. Returns False if any dump failed."""
+    dumps = find_dumps(batch_path)
+    if not dumps:
+        raise ValueError(f"no memory dumps found in {batch_path}")
+    os.makedirs(output_folder, exist_ok=True)
+    say = (lambda message: None) if options.quiet else print
+    total_bytes = sum(dump.size for dump in dumps)
+    say(f"Carving {len(dumps)} dumps ({total_bytes / 1024 ** 3:.2f} GiB), {jobs} at a time, at most {per_device} per device\n")
+
+    started = time.perf_counter()
+    results = run_batch(dumps, output_folder, memory_parsers, options, jobs, per_device, None if options.quiet else sys.stdout)
+    row_counts = merge_outputs(results, output_folder, memory_parsers)
+    seconds = time.perf_counter() - started
+
+    carved_bytes = sum(result['size_bytes'] for result in results if 'error' not in result)
+    failed = [result['label'] for result in results if 'error' in result]
+    report = {
+        'dumps': results,
+        'merged_rows': row_counts,
+        'wall_seconds': round(seconds, 3),
+        'bytes_carved': carved_bytes,
+        'throughput_mib_per_second': round(carved_bytes / 1024 ** 2 / seconds, 2) if seconds > 0 else None,
+        'jobs': jobs,
+        'per_device': per_device,
+    }
+    with open(os.path.join(output_folder, "batch.json"), 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2)
+
+    say(f"\nCarved {len(results) - len(failed)} of {len(results)} dumps, {carved_bytes / 1024 ** 3:.2f} GiB in {seconds:.1f}s ({throughput(carved_bytes, seconds)})")
+    for name, count in row_counts.items():
+        say(f"  {name}: {count} records")
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+    say(f"\nResults saved to: {output_folder}")
+    return not failed
@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from metrics import RunMetrics
+from shared import iter_dump_records
+from TorMemory_AllParsers import memory_parsers
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def peak_rss_bytes() -> int | None:
+    """Peak resident set size of this process and its finished children, including mapped dump pages"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_case(dump_file_path: str, parser_names: list[str], workers: int, results: multiprocessing.Queue) -> None:
+    """Runs one benchmark case in a fresh process so its peak RSS is its own"""
+    selected = [memory_parser for memory_parser in memory_parsers if memory_parser.name in parser_names]
+    metrics = RunMetrics()
+    found = {name: [] for name in parser_names}
+
+    started = time.perf_counter()
+    for memory_parser, row in iter_dump_records(dump_file_path, selected, None, workers, metrics):
+        found[memory_parser.name].append(row.to_csv_row()[0])
+    seconds = time.perf_counter() - started
+
+    results.put({'seconds': seconds, 'peak_rss_bytes': peak_rss_bytes(), 'found': found, 'metrics': metrics.to_dict(dump_file_path, seconds, workers)})
+
+def benchmark(dump_file_path: str, truth: dict, parser_names: list[str], workers: int, combined: bool) -> list[dict]:
+    """Benchmarks each parser on its own, and optionally all of them in one combined pass"""
+    cases = [[name] for name in parser_names]
+    if combined:
+        cases.append(parser_names)
+
+    context = multiprocessing.get_context('spawn')
+    dump_size = os.path.getsize(dump_file_path)
+    results = []
+    for case in cases:
+        queue = context.Queue()
+        process = context.Process(target=run_case, args=(dump_file_path, case, workers, queue))
+        process.start()
+        outcome = queue.get()
+        process.join()
+
+        planted = sum(len(truth['records'][name]) for name in case)
+        found_offsets = {name: set(map(int, offsets)) for name, offsets in outcome['found'].items()}
+        recovered = sum(len(found_offsets[name] & set(truth['records'][name])) for name in case)
+        accepted = sum(len(offsets) for offsets in found_offsets.values())
+        results.append({
+            'case': '+'.join(case) if len(case) > 1 else case[0],
+            'workers': workers,
+            'seconds': round(outcome['seconds'], 3),
+            'bytes_per_second': dump_size / outcome['seconds'] if outcome['seconds'] else None,
+            'peak_rss_bytes': outcome['peak_rss_bytes'],
+            'planted': planted,
+            'recovered': recovered,
+            'recall': recovered / planted if planted else None,
+            'false_positives': accepted - recovered,
+            'metrics': outcome['metrics'],
+        })
+    return results
+
+def find_regressions(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Compares results with an earlier run and describes every case that got slower, fatter or less accurate"""
+    baseline_cases = {result['case']: result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_cases.get(result['case'])
+        if not previous:
+            continue
+        if previous['bytes_per_second'] and result['bytes_per_second'] < previous['bytes_per_second'] * (1 - tolerance):
+            regressions.append(f"{result['case']}: throughput {result['bytes_per_second'] / 2**20:.1f} MiB/s, was {previous['bytes_per_second'] / 2**20:.1f} MiB/s")
+        if previous['peak_rss_bytes'] and result['peak_rss_bytes'] and result['peak_rss_bytes'] > previous['peak_rss_bytes'] * (1 + tolerance):
+            regressions.append(f"{result['case']}: peak RSS {result['peak_rss_bytes'] / 2**20:.1f} MiB, was {previous['peak_rss_bytes'] / 2**20:.1f} MiB")
+        if previous['recall'] is not None and result['recall'] < previous['recall']:
+            regressions.append(f"{result['case']}: recall {result['recall']:.4f}, was {previous['recall']:.4f}")
+    return regressions
+
+def print_results(results: list[dict]) -> None:
+    print(f"{'Case':<40} {'Seconds':>9} {'MiB/s':>9} {'Peak RSS MiB':>13} {'Recall':>8} {'False +':>8}")
+    for result in results:
+        rss = f"{result['peak_rss_bytes'] / 2**20:.1f}" if result['peak_rss_bytes'] else "n/a"
+        recall = f"{result['recall']:.4f}" if result['recall'] is not None else "n/a"
+        print(f"{result['case']:<40} {result['seconds']:>9.3f} {result['bytes_per_second'] / 2**20:>9.1f} {rss:>13} {recall:>8} {result['false_positives']:>8}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the Tor memory parsers against a synthetic dump with known records.")
+    parser.add_argument('-i', '--input', type=str, required=True, help="Path to the synthetic memory dump.")
+    parser.add_argument('-t', '--truth', type=str, help="Path to the ground truth JSON (default: <input>.truth.json).")
+    parser.add_argument('-p', '--parsers', type=str, nargs='+', default=[memory_parser.name for memory_parser in memory_parsers], help="Parsers to benchmark (default: all).")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of worker processes to scan with (default: 1).")
+    parser.add_argument('--combined', action='store_true', help="Also benchmark all selected parsers in one combined pass.")
+    parser.add_argument('--json', type=str, help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', type=str, help="Results JSON from an earlier run; exit with status 1 if any case regressed.")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Allowed throughput and RSS change against the baseline (default: 0.1).")
+
+    args = parser.parse_args()
+    with open(args.truth or args.input + ".truth.json", encoding='utf-8') as truth_file:
+        truth = json.load(truth_file)
+
+    results = benchmark(args.input, truth, args.parsers, args.workers, args.combined)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"[-] Regression: {regression}")
+        if regressions:
+            sys.exit(1)
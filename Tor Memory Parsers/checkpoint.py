@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import IO, Iterable
+
+from base64icon import FaviconWriter
+
+# Minimum seconds between checkpoints; one is only ever taken once a whole chunk's records have been written
+CHECKPOINT_INTERVAL = 10.0
+
+class CheckpointError(Exception):
+    """Raised when a checkpoint cannot be used to resume the requested run"""
+
+@dataclass
+class Checkpoint:
+    """Where an interrupted CSV run got to.
+
+    Every hit starting before offset has been carved and written, and each
+    output file was exactly output_positions[name] bytes long at that point,
+    as was the favicon manifest favicon_manifest_position bytes. The dump and
+    run identity fields make sure a resume continues the same run.
+    """
+    dump_file: str
+    dump_size: int
+    dump_mtime_ns: int
+    parsers: list[str]
+    ranges: list[list[int]] | None
+    offset: int
+    output_positions: dict[str, int]
+    favicon_manifest_position: int = 0
+
+    def save(self, checkpoint_path: str) -> None:
+        """Writes the checkpoint atomically, so a crash leaves either the old or the new one"""
+        temporary_path = checkpoint_path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(asdict(self), checkpoint_file, indent=2)
+        os.replace(temporary_path, checkpoint_path)
+
+    @classmethod
+    def load(cls, checkpoint_path: str) -> 'Checkpoint':
+        try:
+            with open(checkpoint_path, encoding='utf-8') as checkpoint_file:
+                return cls(**json.load(checkpoint_file))
+        except (OSError, ValueError, TypeError) as e:
+            raise CheckpointError(f"cannot read checkpoint {checkpoint_path}: {e}") from None
+
+    def check_resumes(self, other: 'Checkpoint') -> None:
+        """Raises CheckpointError unless other describes the same dump and run as this checkpoint"""
+        for name in ('dump_file', 'dump_size', 'dump_mtime_ns', 'parsers', 'ranges'):
+            if getattr(self, name) != getattr(other, name):
+                raise CheckpointError(f"checkpoint was taken for a different run ({name} differs); remove it or run without --resume")
+
+def new_checkpoint(dump_file_path: str, parser_names: list[str], ranges: list[tuple[int, int]] | None) -> Checkpoint:
+    """A checkpoint for the start of a run"""
+    stat = os.stat(dump_file_path)
+    return Checkpoint(
+        os.path.abspath(dump_file_path), stat.st_size, stat.st_mtime_ns, parser_names,
+        [list(byte_range) for byte_range in ranges] if ranges is not None else None, 0, {},
+    )
+
+class CsvCheckpointer:
+    """Called after each chunk with the offset scanned up to, and saves a checkpoint every CHECKPOINT_INTERVAL seconds"""
+
+    def __init__(self, checkpoint: Checkpoint, checkpoint_path: str, output_files: dict[str, IO[str]], interval: float = CHECKPOINT_INTERVAL, record_writers: Iterable = (), favicon_writer: FaviconWriter | None = None):
+        self.checkpoint = checkpoint
+        self.checkpoint_path = checkpoint_path
+        self.output_files = output_files
+        # Writers holding rows back from output_files, flushed before the files are measured
+        self.record_writers = list(record_writers)
+        # Extracts the favicons of the records written so far; its manifest is measured along with the CSVs
+        self.favicon_writer = favicon_writer
+        self.interval = interval
+        self.next_save = time.monotonic() + interval
+
+    def __call__(self, offset: int, force: bool = False) -> None:
+        if not force and time.monotonic() < self.next_save:
+            return
+        for record_writer in self.record_writers:
+            record_writer.flush()
+        for name, output_file in self.output_files.items():
+            output_file.flush()
+            self.checkpoint.output_positions[name] = output_file.buffer.tell()
+        if self.favicon_writer:
+            self.checkpoint.favicon_manifest_position = self.favicon_writer.checkpoint()
+        self.checkpoint.offset = offset
+        self.checkpoint.save(self.checkpoint_path)
+        self.next_save = time.monotonic() + self.interval
+
+    def finish(self) -> None:
+        """Removes the checkpoint once the run has completed"""
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+def truncate_outputs(output_paths: dict[str, str], checkpoint: Checkpoint) -> None:
+    """Cuts each output back to its checkpointed length, dropping rows written after the checkpoint"""
+    for name, output_path in output_paths.items():
+        if name not in checkpoint.output_positions:
+            raise CheckpointError(f"checkpoint has no position for {output_path}")
+        with open(output_path, 'r+b') as output_file:
+            output_file.truncate(checkpoint.output_positions[name])
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import ipaddress
+import os
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import pairwise
+from typing import Iterable, Iterator
+
+from batch import DUMP_HEADER
+from plugins import builtin_parsers
+from records import BrowserRequest, HttpRequest, SocksRequest, TabData, record_from_csv_row
+from result_cache import parse_size
+
+# Records sharing a domain or URL are linked when they lie at most this many bytes apart; 0 links them however far apart
+DEFAULT_WINDOW = 64 * 1024
+
+# Sessions with fewer records than this are left out of the output
+MIN_SESSION_RECORDS = 2
+
+# Distinct strings whose domain and URL keys are remembered; carved hosts and URLs repeat many times over
+KEY_CACHE_SIZE = 1 << 18
+
+# The fields of each correlated record type holding hosts, and holding URLs
+KEY_FIELDS = {
+    SocksRequest: (('first_party_domain', 'url', 'second_url'), ()),
+    BrowserRequest: (('first_party_domain', 'requested_resource'), ('requested_resource',)),
+    HttpRequest: (('url', 'origin_url', 'document_url'), ('url', 'origin_url', 'document_url')),
+    TabData: (('url',), ('url',)),
+}
+
+SESSION_HEADERS = ["Session", "Offset", "Record", "Type", "Domains", "URLs"]
+SUMMARY_HEADERS = ["Session", "Records", "First Offset", "Last Offset", "Record Counts", "Domains"]
+
+scheme_re = re.compile(r'^[a-z][a-z0-9+.-]*://')
+hostname_re = re.compile(r'[a-z0-9-]+(?:\.[a-z0-9-]+)+')
+# Scheme, host and the rest of a URL up to its fragment
+url_re = re.compile(r'([a-z][a-z0-9+.-]*://[^/?#\s]+)([^#]*)', re.IGNORECASE)
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def domain_key(text: str) -> str | None:
+    """The site a host, host:port, URL or first party domain such as (https,site.onion) belongs to, or None.
+
+    An onion service is its last two labels, so every subdomain joins it;
+    other hosts only lose a leading www., as there is no public suffix list
+    to find their registrable domain with. Loopback addresses, like the
+    SOCKS proxy's own, are left out.
+    """
+    text = scheme_re.sub('', text.strip().lower(), 1).split('/', 1)[0]
+    match = hostname_re.search(text)
+    if not match:
+        return None
+    host = match.group()
+    if host.replace('.', '').isdigit():
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return None
+        return None if address.is_loopback or address.is_unspecified else host
+    if host.endswith('.onion'):
+        return '.'.join(host.rsplit('.', 2)[-2:])
+    return host.removeprefix('www.')
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def url_key(text: str) -> str | None:
+    """A URL with its scheme and host lowercased and its fragment dropped, or None if text is not a URL with a host"""
+    match = url_re.match(text.strip())
+    return match and match.group(1).lower() + match.group(2)
+
+class CorrelationIndex:
+    """Records of every correlated carver, indexed to link them into sessions.
+
+    The records are held column-wise, sorted by dump and then offset; this
+    order is the offset index, and a record's place in it is its id. The
+    domain and URL indexes are hash indexes from each (dump, key) to the ids
+    of the records carrying it. Ids are assigned in offset order, so every
+    posting list is already sorted by offset, and a join is one merge pass
+    over each list.
+    """
+
+    def __init__(self, records: Iterable[tuple[str, str, object]]):
+        """Indexes (dump label, source parser name, record) triples, in any order"""
+        self.dumps: list[str] = []
+        self.sources: list[str] = []
+        dump_indexes: dict[str, int] = {}
+        source_indexes: dict[str, int] = {}
+        # One copy of each key, shared by every record carrying it
+        keys: dict[str, str] = {}
+
+        rows = []
+        for dump, source, record in records:
+            domain_fields, url_fields = KEY_FIELDS[type(record)]
+            domains = {keys.setdefault(key, key) for key in map(domain_key, (getattr(record, name) for name in domain_fields)) if key}
+            urls = {keys.setdefault(key, key) for key in map(url_key, (getattr(record, name) for name in url_fields)) if key}
+            dump_index = dump_indexes.setdefault(dump, len(dump_indexes))
+            source_index = source_indexes.setdefault(source, len(source_indexes))
+            rows.append((dump_index, record.match_offset, source_index, record.entry_type, tuple(sorted(domains)), tuple(sorted(urls))))
+        self.dumps = list(dump_indexes)
+        self.sources = list(source_indexes)
+
+        rows.sort(key=lambda row: (row[0], row[1]))
+        self.record_dumps = array('I', (row[0] for row in rows))
+        self.offsets = array('Q', (row[1] for row in rows))
+        self.record_sources = array('H', (row[2] for row in rows))
+        self.entry_types = [row[3] for row in rows]
+        self.domains = [row[4] for row in rows]
+        self.urls = [row[5] for row in rows]
+        del rows
+
+        self.domain_index = self.build_key_index(self.domains)
+        self.url_index = self.build_key_index(self.urls)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def build_key_index(self, record_keys: list[tuple[str, ...]]) -> dict[tuple[int, str], array]:
+        key_index = {}
+        for record_id, keys in enumerate(record_keys):
+            dump_index = self.record_dumps[record_id]
+            for key in keys:
+                postings = key_index.get((dump_index, key))
+                if postings is None:
+                    postings = key_index[(dump_index, key)] = array('I')
+                postings.append(record_id)
+        return key_index
+
+    def sessions(self, window: int = DEFAULT_WINDOW, min_records: int = MIN_SESSION_RECORDS) -> list[list[int]]:
+        """Groups the records linked by a shared domain or URL within window bytes of each other, directly or through other records.
+
+        Neighbours in a posting list are joined, which links every pair
+        within the window as well, since the records between two linked ones
+        are closer still. Returns the ids of each session with at least
+        min_records records, sessions and ids both in offset order.
+        """
+        parent = array('I', range(len(self)))
+
+        def find(record_id: int) -> int:
+            while parent[record_id] != record_id:
+                parent[record_id] = parent[parent[record_id]]
+                record_id = parent[record_id]
+            return record_id
+
+        offsets = self.offsets
+        for key_index in (self.domain_index, self.url_index):
+            for postings in key_index.values():
+                for first, second in pairwise(postings):
+                    if window and offsets[second] - offsets[first] > window:
+                        continue
+                    first_root, second_root = find(first), find(second)
+                    if first_root != second_root:
+                        # The earlier record stays the root, so a session is numbered by its first record
+                        parent[max(first_root, second_root)] = min(first_root, second_root)
+
+        groups: dict[int, list[int]] = {}
+        for record_id in range(len(self)):
+            groups.setdefault(find(record_id), []).append(record_id)
+        return [members for members in groups.values() if len(members) >= min_records]
+
+def read_output_records(folder: str) -> Iterator[tuple[str, str, object]]:
+    """Yields (dump label, parser name, record) from the CSVs of the correlated parsers in a run's output folder.
+
+    The merged folder of a batch works too; its rows carry the dump they came
+    from. Parsers without a CSV in the folder are skipped.
+    """
+    for memory_parser in builtin_parsers():
+        if memory_parser.record_type not in KEY_FIELDS:
+            continue
+        csv_path = os.path.join(folder, f"{memory_parser.name}.csv")
+        if not os.path.exists(csv_path):
+            continue
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            csv_reader = csv.reader(csv_file)
+            headers = next(csv_reader, None)
+            if headers == memory_parser.csv_headers:
+                for row in csv_reader:
+                    yield '', memory_parser.name, record_from_csv_row(memory_parser.record_type, row)
+            elif headers == [DUMP_HEADER] + memory_parser.csv_headers:
+                for row in csv_reader:
+                    yield row[0], memory_parser.name, record_from_csv_row(memory_parser.record_type, row[1:])
+            elif headers is not None:
+                raise ValueError(f"{csv_path} does not hold one row per record (written with --dedup?)")
+
+def write_sessions(correlation_index: CorrelationIndex, sessions: list[list[int]], output_folder: str) -> None:
+    """Writes sessions.csv, a row per record in each session, and session_summary.csv, a row per session.
+
+    A Dump column comes first when the records came from a batch.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    with_dump = correlation_index.dumps != ['']
+    dump_headers = [DUMP_HEADER] if with_dump else []
+    with open(os.path.join(output_folder, "sessions.csv"), 'w', newline='', encoding='utf-8') as sessions_file, \
+            open(os.path.join(output_folder, "session_summary.csv"), 'w', newline='', encoding='utf-8') as summary_file:
+        sessions_writer = csv.writer(sessions_file)
+        summary_writer = csv.writer(summary_file)
+        sessions_writer.writerow(dump_headers + SESSION_HEADERS)
+        summary_writer.writerow(dump_headers + SUMMARY_HEADERS)
+
+        for session_number, members in enumerate(sessions, 1):
+            dump_columns = [correlation_index.dumps[correlation_index.record_dumps[members[0]]]] if with_dump else []
+            source_counts = Counter()
+            domain_counts = Counter()
+            for record_id in members:
+                source = correlation_index.sources[correlation_index.record_sources[record_id]]
+                source_counts[source] += 1
+                domain_counts.update(correlation_index.domains[record_id])
+                sessions_writer.writerow(dump_columns + [
+                    session_number, correlation_index.offsets[record_id], source, correlation_index.entry_types[record_id],
+                    ";".join(correlation_index.domains[record_id]), ";".join(correlation_index.urls[record_id]),
+                ])
+            summary_writer.writerow(dump_columns + [
+                session_number, len(members), correlation_index.offsets[members[0]], correlation_index.offsets[members[-1]],
+                ";".join(f"{source}={count}" for source, count in sorted(source_counts.items())),
+                ";".join(domain for domain, _ in domain_counts.most_common()),
+            ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Link the SOCKS, browser and HTTP records carved from a Memory Dump into sessions.")
+    parser.add_argument('-i', '--input', type=str, required=True, help="Output folder of a parser run, or the merged folder of a batch.")
+    parser.add_argument('-o', '--output', type=str, help="Folder to write sessions.csv and session_summary.csv to (default: the input folder).")
+    parser.add_argument('--window', type=parse_size, default=DEFAULT_WINDOW, help="Only link records sharing a domain or URL this many bytes apart or closer, e.g. 1M; 0 for any distance (default: 64K).")
+    parser.add_argument('--min-records', type=int, default=MIN_SESSION_RECORDS, help=f"Leave out sessions with fewer records (default: {MIN_SESSION_RECORDS}).")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Print nothing.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input):
+        print("The specified output folder does not exist.", file=sys.stderr)
+        sys.exit(1)
+    started = time.perf_counter()
+    try:
+        correlation_index = CorrelationIndex(read_output_records(args.input))
+    except (ValueError, OSError) as e:
+        print(f"[-] {e}", file=sys.stderr)
+        sys.exit(1)
+    sessions = correlation_index.sessions(args.window, args.min_records)
+    write_sessions(correlation_index, sessions, args.output or args.input)
+    if not args.quiet:
+        linked = sum(map(len, sessions))
+        print(f"Linked {linked} of {len(correlation_index)} records into {len(sessions)} sessions in {time.perf_counter() - started:.1f}s")
+        print(f"Results saved to: {args.output or args.input}")
@@ -0,0 +1,135 @@
+import hashlib
+import heapq
+import pickle
+import tempfile
+from typing import IO, Callable, Iterator
+
+from records import tuple_getter
+
+# Offsets kept per unique record, the lowest ones seen
+MAX_SAMPLE_OFFSETS = 10
+
+# Approximate bytes of unique records held in memory before they are spilled to a sorted run on disk
+MAX_MEMORY_BYTES = 256 * 1024 * 1024
+
+# Rough per-entry cost of the digest, counters and containers on top of the field text
+ENTRY_OVERHEAD = 400
+
+AGGREGATE_HEADERS = ["Count", "First Offset", "Last Offset", "Sample Offsets"]
+
+def aggregate_headers(csv_headers: list[str]) -> list[str]:
+    """CSV headers for aggregated output: the record's content columns followed by the occurrence columns"""
+    return csv_headers[1:] + AGGREGATE_HEADERS
+
+def content_getter(record_type: type) -> Callable[[object], tuple[int, list[str]]]:
+    """A function returning a record's offset and content columns, the columns after the offset that aggregate_headers names.
+
+    The columns are read through the type's csv_columns, each attribute once:
+    SocksRequest rows repeat entry_type, which would push every later column
+    out from under its header. Types without csv_columns use to_csv_row().
+    """
+    csv_columns = getattr(record_type, 'csv_columns', None)
+    if not csv_columns:
+        def offset_and_content(record) -> tuple[int, list[str]]:
+            row = record.to_csv_row()
+            return int(row[0]), row[1:]
+        return offset_and_content
+
+    values = tuple_getter(list(dict.fromkeys(csv_columns)))
+    def offset_and_content(record) -> tuple[int, list[str]]:
+        offset, *content = values(record)
+        return offset, [str(value) for value in content]
+    return offset_and_content
+
+class RecordAggregator:
+    """Collapses records with identical content into one row with an occurrence count.
+
+    A record's content is every CSV column but the offset (see
+    content_getter). Records are keyed by a 128-bit BLAKE2 digest of that
+    content, and each unique record keeps its count, first and last offset
+    and up to MAX_SAMPLE_OFFSETS offsets. Once the unique records in memory
+    pass MAX_MEMORY_BYTES they are written to a
+    temporary file sorted by digest and forgotten; the runs are merged back
+    together when the rows are read out.
+    """
+
+    def __init__(self, spill_folder: str | None = None, max_memory_bytes: int = MAX_MEMORY_BYTES):
+        self.spill_folder = spill_folder
+        self.max_memory_bytes = max_memory_bytes
+        self.entries: dict[bytes, list] = {}
+        self.memory_bytes = 0
+        self.runs: list[IO[bytes]] = []
+        self.content_getters: dict[type, Callable] = {}
+
+    def add(self, record) -> None:
+        get_content = self.content_getters.get(type(record))
+        if get_content is None:
+            get_content = self.content_getters[type(record)] = content_getter(type(record))
+        offset, content = get_content(record)
+        digest = hashlib.blake2b('\x1f'.join(content).encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+        entry = self.entries.get(digest)
+        if entry:
+            entry[0] += 1
+            entry[2] = offset
+            if len(entry[3]) < MAX_SAMPLE_OFFSETS:
+                entry[3].append(offset)
+            return
+
+        # Records arrive in offset order, so the first offset seen is the lowest
+        self.entries[digest] = [1, offset, offset, [offset], content]
+        self.memory_bytes += ENTRY_OVERHEAD + sum(map(len, content))
+        if self.memory_bytes >= self.max_memory_bytes:
+            self.spill()
+
+    def spill(self) -> None:
+        """Writes the in-memory entries to a temporary run file sorted by digest"""
+        run = tempfile.TemporaryFile(dir=self.spill_folder)
+        for digest in sorted(self.entries):
+            pickle.dump((digest, self.entries[digest]), run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+        self.runs.append(run)
+        self.entries = {}
+        self.memory_bytes = 0
+
+    def rows(self) -> Iterator[list[str]]:
+        """Yields one aggregated row per unique record.
+
+        Rows come out in order of first occurrence unless the aggregator had to
+        spill, in which case they come out in digest order.
+        """
+        if not self.runs:
+            for count, first_offset, last_offset, samples, content in self.entries.values():
+                yield self.format_row(count, first_offset, last_offset, samples, content)
+            return
+
+        self.spill()
+        merged = heapq.merge(*(read_run(run) for run in self.runs), key=lambda item: item[0])
+        current_digest, current = None, None
+        for digest, entry in merged:
+            if digest == current_digest:
+                current[0] += entry[0]
+                current[1] = min(current[1], entry[1])
+                current[2] = max(current[2], entry[2])
+                current[3] = sorted(current[3] + entry[3])[:MAX_SAMPLE_OFFSETS]
+                continue
+            if current:
+                yield self.format_row(*current)
+            current_digest, current = digest, entry
+        if current:
+            yield self.format_row(*current)
+
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+    @staticmethod
+    def format_row(count: int, first_offset: int, last_offset: int, samples: list[int], content: list[str]) -> list[str]:
+        return content + [str(count), str(first_offset), str(last_offset), ";".join(map(str, samples))]
+
+def read_run(run: IO[bytes]) -> Iterator[tuple[bytes, list]]:
+    while True:
+        try:
+            yield pickle.load(run)
+        except EOFError:
+            return
@@ -0,0 +1,112 @@
+import mmap
+from dataclasses import dataclass
+from typing import Callable
+
+from anchors import UTF8, UTF16LE, TextEncoding, find_aligned
+
+VALUE_MARKER = b'\xFF\xFF'
+
+# Longest value read for a field, in characters, unless the field sets its own max_length
+DEFAULT_MAX_LENGTH = 2000
+
+# Reads a value starting at the given offset and returns (value, offset just past it), or None if there is no value
+ValueReader = Callable[[mmap.mmap, int], tuple[str, int] | None]
+
+@dataclass(frozen=True)
+class Field:
+    """One key/value pair of a \\xFF\\xFF-delimited record.
+
+    With marker_prefixed set, the first \\xFF\\xFF within key_window bytes must be
+    directly followed by the key name; otherwise the key name itself is searched
+    for within key_window bytes. The value starts after the next \\xFF\\xFF, looked
+    for value_window bytes from value_offset (relative to where the key was found,
+    default: the end of the key), and runs to terminator.
+
+    All of these describe 8-bit text. When a record is walked as two-byte
+    text, the key is matched in UTF-16LE, the distances are doubled and a
+    value runs to the first NUL code unit instead of terminator.
+    """
+    name: str
+    key: bytes
+    key_window: int
+    value_window: int
+    value_offset: int | None = None
+    marker_prefixed: bool = True
+    required: bool = False
+    default: str = ""
+    terminator: bytes = b'\x00\x00'
+    max_length: int = DEFAULT_MAX_LENGTH
+    reader: ValueReader | None = None
+
+class FieldSchema:
+    """An ordered list of Fields, compiled once per text encoding into flat lookup steps and walked per record."""
+
+    def __init__(self, fields: list[Field]):
+        self.fields = fields
+        self.defaults = {field.name: field.default for field in fields}
+        self._steps = {encoding.name: self._compile(encoding) for encoding in (UTF8, UTF16LE)}
+
+    def _compile(self, encoding: TextEncoding) -> list[tuple]:
+        unit = encoding.unit
+        steps = []
+        for field in self.fields:
+            key = encoding.encode(field.key.decode('latin-1'))
+            key_length = len(key)
+            if field.value_offset is not None:
+                value_offset = field.value_offset * unit
+            elif field.marker_prefixed:
+                value_offset = len(VALUE_MARKER) + key_length
+            else:
+                value_offset = key_length
+            terminator = field.terminator if unit == 1 else encoding.encode('\x00')
+            steps.append((
+                field.name, key, key_length, field.key_window * unit, field.marker_prefixed, field.required,
+                value_offset, field.value_window * unit, field.reader, terminator, field.max_length * unit,
+            ))
+        return steps
+
+    def max_lengths(self) -> dict[str, int]:
+        """The longest value of each field by its key name, as the limits for decoding the same record as a structured clone"""
+        return {field.key.decode('latin-1'): field.max_length for field in self.fields}
+
+    def extract(self, memory_data: mmap.mmap, index: int, encoding: TextEncoding = UTF8) -> dict[str, str] | None:
+        """Walks the fields in order from index, reading text in encoding; returns None if a required key is missing"""
+        values = dict(self.defaults)
+        find = memory_data.find
+        unit = encoding.unit
+
+        for name, key, key_length, key_window, marker_prefixed, required, value_offset, value_window, reader, terminator, max_length in self._steps[encoding.name]:
+            # Locate the key
+            if marker_prefixed:
+                key_position = find(VALUE_MARKER, index, index + key_window)
+                if key_position == -1 or memory_data[key_position + 2:key_position + 2 + key_length] != key:
+                    if required:
+                        return None
+                    continue
+            else:
+                key_position = find(key, index, index + key_window)
+                if key_position == -1:
+                    if required:
+                        return None
+                    continue
+                index = key_position + key_length
+
+            # Locate the start of the value
+            value_start = key_position + value_offset
+            value_marker = find(VALUE_MARKER, value_start, value_start + value_window)
+            if value_marker == -1:
+                continue
+            index = value_marker + 2
+
+            # Read the value
+            if reader:
+                result = reader(memory_data, index)
+                if result:
+                    values[name], index = result
+            else:
+                value_end = find_aligned(memory_data, terminator, index, index + max_length, unit)
+                if value_end != -1:
+                    values[name] = encoding.decode(memory_data[index:value_end]).strip()
+                    index = value_end + len(terminator)
+
+        return values
@@ -0,0 +1,100 @@
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+@dataclass
+class ParserMetrics:
+    """Hit and timing counters for one parser in a run."""
+    pattern_hits: Counter[bytes] = field(default_factory=Counter)
+    accepted: int = 0
+    rejected: int = 0
+    rejection_reasons: Counter[str] = field(default_factory=Counter)
+    extract_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+    def merge(self, other: 'ParserMetrics') -> None:
+        self.pattern_hits.update(other.pattern_hits)
+        self.accepted += other.accepted
+        self.rejected += other.rejected
+        self.rejection_reasons.update(other.rejection_reasons)
+        self.extract_seconds += other.extract_seconds
+        self.write_seconds += other.write_seconds
+
+    def to_dict(self) -> dict:
+        raw_hits = sum(self.pattern_hits.values())
+        return {
+            'raw_hits': raw_hits,
+            'hits_per_pattern': {pattern.hex(): count for pattern, count in self.pattern_hits.most_common()},
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'acceptance_rate': self.accepted / raw_hits if raw_hits else None,
+            'rejection_reasons': dict(self.rejection_reasons.most_common()),
+            'extract_seconds': round(self.extract_seconds, 6),
+            'write_seconds': round(self.write_seconds, 6),
+        }
+
+@dataclass
+class RunMetrics:
+    """Counters for a whole run, merged from every chunk and worker that took part in it."""
+    bytes_scanned: int = 0
+    scan_seconds: float = 0.0
+    parsers: dict[str, ParserMetrics] = field(default_factory=dict)
+    bound_hits: Counter[str] = field(default_factory=Counter)
+    # Holes and zero runs that were not scanned, as sorted (start, end) offsets
+    skipped_ranges: list[tuple[int, int]] = field(default_factory=list)
+    # Offset a resumed run continued from; the counters only cover the scan since then
+    resumed_from: int | None = None
+    # Parsers whose records were replayed from the result cache instead of scanned for
+    cached_parsers: list[str] = field(default_factory=list)
+
+    def parser(self, name: str) -> ParserMetrics:
+        if name not in self.parsers:
+            self.parsers[name] = ParserMetrics()
+        return self.parsers[name]
+
+    def merge(self, other: 'RunMetrics') -> None:
+        self.bytes_scanned += other.bytes_scanned
+        self.scan_seconds += other.scan_seconds
+        for name, parser_metrics in other.parsers.items():
+            self.parser(name).merge(parser_metrics)
+        self.bound_hits.update(other.bound_hits)
+        self.add_skipped(other.skipped_ranges)
+
+    def add_skipped(self, ranges: list[tuple[int, int]]) -> None:
+        """Appends skipped ranges that follow the ones already recorded, joining any that touch"""
+        for start, end in ranges:
+            if self.skipped_ranges and self.skipped_ranges[-1][1] == start:
+                self.skipped_ranges[-1] = (self.skipped_ranges[-1][0], end)
+            else:
+                self.skipped_ranges.append((start, end))
+
+    def to_dict(self, dump_file_path: str, wall_seconds: float, workers: int) -> dict:
+        extract_seconds = sum(p.extract_seconds for p in self.parsers.values())
+        write_seconds = sum(p.write_seconds for p in self.parsers.values())
+        return {
+            'dump_file': dump_file_path,
+            'finished_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()),
+            'workers': workers,
+            'resumed_from_offset': self.resumed_from,
+            'replayed_from_cache': self.cached_parsers,
+            'wall_seconds': round(wall_seconds, 6),
+            'bytes_scanned': self.bytes_scanned,
+            'bytes_skipped': sum(end - start for start, end in self.skipped_ranges),
+            'skipped_ranges': [[start, end] for start, end in self.skipped_ranges],
+            'bytes_per_second': self.bytes_scanned / wall_seconds if wall_seconds else None,
+            # Scan and extract times are summed over workers, so they can exceed wall time in parallel runs
+            'scan_seconds': round(self.scan_seconds, 6),
+            'scan_bytes_per_second': self.bytes_scanned / self.scan_seconds if self.scan_seconds else None,
+            'extract_seconds': round(extract_seconds, 6),
+            'write_seconds': round(write_seconds, 6),
+            'field_bounds_hit': dict(sorted(self.bound_hits.items())),
+            'parsers': {name: parser_metrics.to_dict() for name, parser_metrics in self.parsers.items()},
+        }
+
+    def write_json(self, metrics_path: str, dump_file_path: str, wall_seconds: float, workers: int) -> dict:
+        """Writes the metrics to metrics_path and returns what was written"""
+        report = self.to_dict(dump_file_path, wall_seconds, workers)
+        with open(metrics_path, 'w', encoding='utf-8') as metrics_file:
+            json.dump(report, metrics_file, indent=2)
+        return report
@@ -0,0 +1,152 @@
+import importlib
+import os
+import re
+import sys
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec
+from importlib.metadata import entry_points
+from types import ModuleType
+
+from shared import MemoryParser
+
+# Modules of the built-in parsers, in the order they run and their outputs are listed
+BUILTIN_PARSER_MODULES = [
+    'TorMemory_BrowserActivity',
+    'TorMemory_BrowserRequests',
+    'TorMemory_SocksRequests',
+    'TorMemory_HTTPRequests',
+    'TorMemory_BrowserSessionData',
+]
+
+# Folders of parser plugins loaded by every tor_mem_scan run, separated like PATH
+PLUGIN_PATH_VARIABLE = 'TOR_MEM_SCAN_PLUGINS'
+
+# Installed packages register parser plugin modules under this entry point group
+ENTRY_POINT_GROUP = 'tor_mem_scan.parsers'
+
+# Package the modules of plugin folders are imported under, in a subpackage per folder
+PLUGIN_PACKAGE = 'tor_mem_scan_plugins'
+
+class PluginError(Exception):
+    """Raised when a parser plugin cannot be loaded or a requested parser does not exist"""
+
+def folder_package(folder: str) -> str:
+    """The name of the subpackage of PLUGIN_PACKAGE a plugin folder's modules are imported under"""
+    return f"{PLUGIN_PACKAGE}.folder_{os.path.abspath(folder).encode('utf-8', 'surrogateescape').hex()}"
+
+class PluginFolderFinder(MetaPathFinder):
+    """Finds PLUGIN_PACKAGE and its folder subpackages, whose modules are then found in their folder.
+
+    A folder's path is spelled out in its subpackage's name, so a worker
+    process that only has the name of a plugin's process_match, as spawned
+    pool workers do, can import it again.
+    """
+
+    def find_spec(self, fullname: str, path=None, target=None) -> ModuleSpec | None:
+        package, _, subpackage = fullname.partition('.')
+        if package != PLUGIN_PACKAGE:
+            return None
+        if not subpackage:
+            return ModuleSpec(fullname, None, is_package=True)
+        if '.' in subpackage or not subpackage.startswith('folder_'):
+            return None
+        try:
+            folder = bytes.fromhex(subpackage.removeprefix('folder_')).decode('utf-8', 'surrogateescape')
+        except ValueError:
+            return None
+        spec = ModuleSpec(fullname, None, is_package=True)
+        spec.submodule_search_locations = [folder]
+        return spec
+
+if not any(isinstance(finder, PluginFolderFinder) for finder in sys.meta_path):
+    sys.meta_path.append(PluginFolderFinder())
+
+class ParserRegistry:
+    """The parsers tor_mem_scan can run, by name, in the order they were registered.
+
+    A parser plugin is a module that defines memory_parser, a MemoryParser
+    giving the parser's name, csv_headers, regex_pattern, process_matcher and
+    record_type, or memory_parsers, a list of them. A record type is a
+    dataclass with a to_csv_row() method, ideally a @slotted_record with
+    csv_columns like those in records.py. Modules in a plugin folder that
+    define neither are taken to be helpers and skipped. A folder's modules
+    are imported as a package of their own (see folder_package), so they
+    never clash with modules of the same name elsewhere, and import each
+    other relatively, e.g. from . import helpers.
+    """
+
+    def __init__(self):
+        self.parsers: dict[str, MemoryParser] = {}
+
+    def register(self, memory_parser: MemoryParser) -> None:
+        if memory_parser.name in self.parsers:
+            raise PluginError(f"more than one parser is named {memory_parser.name!r}")
+        # Patterns are searched together with the other parsers' (see shared.iter_matches), which needs compiled bytes patterns
+        if not isinstance(memory_parser.regex_pattern, re.Pattern) or not isinstance(memory_parser.regex_pattern.pattern, bytes):
+            raise PluginError(f"parser {memory_parser.name!r} needs a regex_pattern compiled from bytes")
+        self.parsers[memory_parser.name] = memory_parser
+
+    def load_module(self, module: ModuleType) -> None:
+        """Registers the parsers a plugin module defines"""
+        module_parsers = getattr(module, 'memory_parsers', None)
+        if module_parsers is None:
+            module_parsers = [module.memory_parser] if hasattr(module, 'memory_parser') else []
+        for memory_parser in module_parsers:
+            if not isinstance(memory_parser, MemoryParser):
+                raise PluginError(f"{module.__name__} defines a parser that is not a MemoryParser")
+            self.register(memory_parser)
+
+    def load_folder(self, folder: str) -> None:
+        """Imports every module in folder and registers the parsers they define"""
+        if not os.path.isdir(folder):
+            raise PluginError(f"plugin folder {folder} does not exist")
+        folder = os.path.abspath(folder)
+        package = folder_package(folder)
+        for file_name in sorted(os.listdir(folder)):
+            module_name, extension = os.path.splitext(file_name)
+            if extension != '.py' or module_name.startswith('_'):
+                continue
+            try:
+                module = importlib.import_module(f"{package}.{module_name}")
+            except Exception as e:
+                raise PluginError(f"cannot load parser plugin {os.path.join(folder, file_name)}: {e}") from e
+            self.load_module(module)
+
+    def load_entry_points(self) -> None:
+        """Registers the parsers of installed packages, whose ENTRY_POINT_GROUP entry points name a plugin module or a MemoryParser"""
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                plugin = entry_point.load()
+            except Exception as e:
+                raise PluginError(f"cannot load parser plugin {entry_point.value}: {e}") from e
+            if isinstance(plugin, MemoryParser):
+                self.register(plugin)
+            else:
+                self.load_module(plugin)
+
+    def select(self, names: list[str] | None = None) -> list[MemoryParser]:
+        """The named parsers, or all of them, in registration order"""
+        if names is None:
+            return list(self.parsers.values())
+        unknown = [name for name in names if name not in self.parsers]
+        if unknown:
+            raise PluginError(f"unknown parser {', '.join(unknown)}; available: {', '.join(self.parsers)}")
+        return [memory_parser for name, memory_parser in self.parsers.items() if name in names]
+
+def builtin_parsers() -> list[MemoryParser]:
+    """The parsers of BUILTIN_PARSER_MODULES"""
+    registry = ParserRegistry()
+    for module_name in BUILTIN_PARSER_MODULES:
+        registry.load_module(importlib.import_module(module_name))
+    return registry.select()
+
+def load_registry(plugin_folders: list[str] = ()) -> ParserRegistry:
+    """A registry of the built-in parsers, then those of installed packages, PLUGIN_PATH_VARIABLE and plugin_folders"""
+    registry = ParserRegistry()
+    for memory_parser in builtin_parsers():
+        registry.register(memory_parser)
+    registry.load_entry_points()
+    environment_folders = [folder for folder in os.environ.get(PLUGIN_PATH_VARIABLE, '').split(os.pathsep) if folder]
+    for folder in environment_folders + list(plugin_folders):
+        registry.load_folder(folder)
+    return registry
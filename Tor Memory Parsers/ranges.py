@@ -0,0 +1,75 @@
+import re
+
+# A range is (start, end) in absolute dump offsets, end exclusive
+ByteRange = tuple[int, int]
+
+range_re = re.compile(r'^(\w+)\s*([-+])\s*(\w+)$')
+
+def parse_offset(text: str) -> int:
+    """Parses a 0x-prefixed hexadecimal offset, or a decimal one, which memory map exports often zero-pad (e.g. 0001000)"""
+    try:
+        return int(text, 16) if text[:2].lower() == '0x' else int(text, 10)
+    except ValueError:
+        raise ValueError(f"invalid offset {text!r}") from None
+
+def parse_range(text: str) -> ByteRange:
+    """Parses START-END (END exclusive) or START+LENGTH"""
+    match = range_re.match(text.strip())
+    if not match:
+        raise ValueError(f"invalid range {text!r}, expected START-END or START+LENGTH")
+    start, operator, other = parse_offset(match[1]), match[2], parse_offset(match[3])
+    end = other if operator == '-' else start + other
+    if end < start:
+        raise ValueError(f"range {text!r} ends before it starts")
+    return start, end
+
+def parse_ranges(text: str) -> list[ByteRange]:
+    """Parses a comma separated list of ranges, as given to --ranges"""
+    return [parse_range(part) for part in text.split(',') if part.strip()]
+
+def read_range_file(path: str) -> list[ByteRange]:
+    """Reads one range per line, as START-END, START+LENGTH or whitespace separated START END columns.
+
+    Columns after the first two are ignored, so a process memory map exported
+    with its start and end offsets first can be used as it is. Blank lines and
+    anything after a # are skipped.
+    """
+    ranges = []
+    with open(path, encoding='utf-8') as range_file:
+        for line_number, line in enumerate(range_file, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            columns = line.replace(',', ' ').split()
+            try:
+                if range_re.match(columns[0]):
+                    ranges.append(parse_range(columns[0]))
+                elif len(columns) >= 2:
+                    ranges.append(parse_range(f"{columns[0]}-{columns[1]}"))
+                else:
+                    raise ValueError(f"expected a range, found {line!r}")
+            except ValueError as e:
+                raise ValueError(f"{path}, line {line_number}: {e}") from None
+    return ranges
+
+def normalize_ranges(ranges: list[ByteRange], dump_size: int) -> list[ByteRange]:
+    """Clips ranges to the dump, sorts them and merges any that overlap or touch"""
+    merged = []
+    for start, end in sorted((max(0, start), min(end, dump_size)) for start, end in ranges):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def ranges_from(ranges: list[ByteRange], offset: int) -> list[ByteRange]:
+    """The parts of ranges at or after offset"""
+    return [(max(start, offset), end) for start, end in ranges if end > offset]
+
+def split_ranges(ranges: list[ByteRange], chunk_size: int):
+    """Yields the ranges cut into pieces of at most chunk_size bytes"""
+    for start, end in ranges:
+        for chunk_start in range(start, end, chunk_size):
+            yield chunk_start, min(chunk_start + chunk_size, end)
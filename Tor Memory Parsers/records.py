@@ -1,37 +1,68 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from typing import Callable, ClassVar, Sequence
 
-@dataclass
+def tuple_getter(names: Sequence[str]) -> Callable[[object], tuple]:
+    """An attrgetter for names that returns a tuple even when there is only one name"""
+    if len(names) == 1:
+        name = names[0]
+        return lambda item: (getattr(item, name),)
+    return attrgetter(*names)
+
+def slotted_record(cls):
+    """Makes cls a slotted dataclass that pickles as a plain tuple of its fields.
+
+    Slots drop the per-instance __dict__, and the tuple keeps records small
+    and quick to pickle when scan workers hand them back in bulk.
+    """
+    cls = dataclass(slots=True)(cls)
+    values = tuple_getter([field.name for field in fields(cls)])
+    cls.__reduce__ = lambda self: (type(self), values(self))
+    return cls
+
+def record_from_csv_row(record_type: type, row: list[str]):
+    """Rebuilds a record from the CSV row its to_csv_row() wrote"""
+    values = dict(zip(record_type.csv_columns, row))
+    return record_type(*(int(values[field.name]) if field.type is int else values[field.name] for field in fields(record_type)))
+
+@slotted_record
 class BrowserActivity:
     offset: int
     entry_type: str
     data: str
+    # The attributes behind each CSV column, as to_csv_row() writes them
+    csv_columns: ClassVar[tuple[str, ...]] = ('offset', 'entry_type', 'data')
 
     def to_csv_row(self) -> list[str]:
         return [str(self.offset), self.entry_type, self.data]
 
-@dataclass
+@slotted_record
 class BrowserRequest:
     match_offset: int
     entry_type: str
     private_browsing_id: str
     first_party_domain: str
     requested_resource: str
+    # The attributes behind each CSV column, as to_csv_row() writes them
+    csv_columns: ClassVar[tuple[str, ...]] = ('match_offset', 'entry_type', 'private_browsing_id', 'first_party_domain', 'requested_resource')
 
     def to_csv_row(self) -> list[str]:
         return [str(self.match_offset), self.entry_type, self.private_browsing_id, self.first_party_domain, self.requested_resource]
 
-@dataclass
+@slotted_record
 class TabData:
     match_offset: int
     entry_type: str
     url: str
     title: str
     favicon_url: str
+    # The attributes behind each CSV column, as to_csv_row() writes them
+    csv_columns: ClassVar[tuple[str, ...]] = ('match_offset', 'entry_type', 'url', 'title', 'favicon_url')
 
     def to_csv_row(self) -> list[str]:
         return [str(self.match_offset), self.entry_type, self.url, self.title, self.favicon_url]
 
-@dataclass
+@slotted_record
 class HttpRequest:
     match_offset: int
     entry_type: str
@@ -41,11 +72,13 @@ class HttpRequest:
     origin_url: str
     document_url: str
     request_type: str
+    # The attributes behind each CSV column, as to_csv_row() writes them
+    csv_columns: ClassVar[tuple[str, ...]] = ('match_offset', 'entry_type', 'method', 'request_id', 'url', 'origin_url', 'document_url', 'request_type')
 
     def to_csv_row(self) -> list[str]:
         return [str(self.match_offset), self.entry_type, self.method, self.request_id, self.url, self.origin_url, self.document_url, self.request_type]
 
-@dataclass
+@slotted_record
 class SocksRequest:
     match_offset: int
     entry_type: str
@@ -55,6 +88,8 @@ class SocksRequest:
     second_url: str
     private_browsing_id: str
     first_party_domain: str
+    # The attributes behind each CSV column, as to_csv_row() writes them
+    csv_columns: ClassVar[tuple[str, ...]] = ('match_offset', 'entry_type', 'entry_type', 'tls_metadata', 'url', 'socks_info', 'second_url', 'private_browsing_id', 'first_party_domain')
 
     def to_csv_row(self) -> list[str]:
         return [str(self.match_offset), self.entry_type, self.entry_type, self.tls_metadata, self.url, self.socks_info, self.second_url, self.private_browsing_id, self.first_party_domain]
\ No newline at end of file
@@ -0,0 +1,193 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import re
+import tempfile
+import time
+from dataclasses import fields
+from typing import Iterator
+
+from records import tuple_getter
+
+# Bumped whenever the layout of a cache entry changes, so old entries are never misread
+CACHE_FORMAT = 2
+
+# Entries are evicted, least recently used first, once the cache holds more than this
+CACHE_MAX_BYTES = 10 * 1024 ** 3
+
+# Entries not used for this many seconds are evicted
+CACHE_MAX_AGE = 30 * 24 * 3600
+
+# The quick fingerprint hashes this many blocks of this size, spread evenly over the dump
+SAMPLE_BLOCKS = 64
+SAMPLE_BLOCK_SIZE = 64 * 1024
+
+# Read size when hashing a whole dump
+HASH_READ_SIZE = 8 * 1024 * 1024
+
+# Records pickled together in an entry
+RECORD_BATCH_SIZE = 10_000
+
+# Modules every carver relies on; a change to any of them gives every parser a new version
+CARVER_SUPPORT_MODULES = ['shared.py', 'records.py', 'fieldschema.py', 'structured_clone.py', 'base64icon.py', 'anchors.py']
+
+size_re = re.compile(r'^(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?$', re.IGNORECASE)
+
+def parse_size(text: str) -> int:
+    """Parses a byte count with an optional K, M, G or T (binary) suffix, e.g. 500M"""
+    match = size_re.match(text.strip())
+    if not match:
+        raise ValueError(f"invalid size {text!r}")
+    return int(float(match[1]) * 1024 ** ' KMGT'.index(match[2].upper() or ' '))
+
+def dump_fingerprint(dump_file_path: str, full_hash: bool = False) -> str:
+    """Identifies the dump's contents for the cache.
+
+    The quick fingerprint is the size, modification time and a BLAKE2 hash of
+    SAMPLE_BLOCKS blocks spread over the file, including its first and last.
+    With full_hash the whole file is hashed instead and the modification time
+    is left out, so a copy of the same image is recognised too.
+    """
+    stat = os.stat(dump_file_path)
+    digest = hashlib.blake2b(digest_size=20)
+    with open(dump_file_path, 'rb') as dump_file:
+        if full_hash:
+            while block := dump_file.read(HASH_READ_SIZE):
+                digest.update(block)
+            return f"full:{stat.st_size}:{digest.hexdigest()}"
+
+        last_block = max(stat.st_size - SAMPLE_BLOCK_SIZE, 0)
+        for offset in sorted({last_block * index // (SAMPLE_BLOCKS - 1) for index in range(SAMPLE_BLOCKS)}):
+            dump_file.seek(offset)
+            digest.update(dump_file.read(SAMPLE_BLOCK_SIZE))
+    return f"sampled:{stat.st_size}:{stat.st_mtime_ns}:{digest.hexdigest()}"
+
+def parser_version(memory_parser) -> tuple[str, str]:
+    """Returns the carver's name and a version that changes with its pattern or code.
+
+    The name comes from the module defining process_matcher rather than
+    memory_parser.name, which the single parser scripts take from the output
+    file. The version hashes the pattern, that module's source and the
+    CARVER_SUPPORT_MODULES.
+    """
+    source_path = inspect.getsourcefile(memory_parser.process_matcher)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(memory_parser.regex_pattern.pattern + str(memory_parser.regex_pattern.flags).encode())
+    package_folder = os.path.dirname(os.path.abspath(__file__))
+    for path in [source_path] + [os.path.join(package_folder, name) for name in CARVER_SUPPORT_MODULES]:
+        with open(path, 'rb') as source_file:
+            digest.update(source_file.read())
+    return os.path.splitext(os.path.basename(source_path))[0], digest.hexdigest()
+
+class ResultCache:
+    """Stores the records each parser carved from a dump, so a repeated run can replay them instead of scanning.
+
+    An entry is keyed by the dump fingerprint, the carver's name and version
+    and the scanned ranges, and holds the records as pickled batches of field
+    tuples. Entries are written to a temporary file and renamed into place
+    only once a scan has completed. Reading an entry refreshes its
+    modification time, which eviction treats as its last use.
+    """
+
+    def __init__(self, cache_folder: str, max_bytes: int = CACHE_MAX_BYTES, max_age: float = CACHE_MAX_AGE):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(cache_folder, exist_ok=True)
+
+    def entry_key(self, fingerprint: str, memory_parser, ranges: list[tuple[int, int]]) -> str:
+        carver_name, version = parser_version(memory_parser)
+        key_data = json.dumps([CACHE_FORMAT, fingerprint, carver_name, version, ranges])
+        return f"{carver_name}-{hashlib.blake2b(key_data.encode(), digest_size=16).hexdigest()}"
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_folder, key + ".records")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self.entry_path(key))
+
+    def read(self, key: str) -> Iterator:
+        """Yields the records stored under key, in the order they were carved"""
+        path = self.entry_path(key)
+        os.utime(path)
+        with open(path, 'rb') as entry_file:
+            header = pickle.load(entry_file)
+            if header.get('format') != CACHE_FORMAT:
+                return
+            while True:
+                try:
+                    record_type, rows = pickle.load(entry_file)
+                except EOFError:
+                    return
+                for row in rows:
+                    yield record_type(*row)
+
+    def writer(self, key: str, description: dict) -> 'CacheEntryWriter':
+        return CacheEntryWriter(self, key, description)
+
+    def evict(self) -> None:
+        """Removes entries unused for longer than max_age, then the least recently used until the cache fits in max_bytes"""
+        now = time.time()
+        entries = []
+        # Runs of a batch share the cache, so another run may have removed an entry first
+        for entry in os.scandir(self.cache_folder):
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                # Left-over temporary files from interrupted scans age out like entries
+                if now - stat.st_mtime > self.max_age:
+                    os.remove(entry.path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                pass
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+class CacheEntryWriter:
+    """Collects one parser's records as they are carved and stores them when the scan completes."""
+
+    def __init__(self, cache: ResultCache, key: str, description: dict):
+        self.cache = cache
+        self.key = key
+        self.entry_file = tempfile.NamedTemporaryFile(dir=cache.cache_folder, prefix=key + ".", suffix=".tmp", delete=False)
+        pickle.dump({'format': CACHE_FORMAT, **description}, self.entry_file, pickle.HIGHEST_PROTOCOL)
+        self.record_type = None
+        self.getter = None
+        self.batch = []
+
+    def add(self, record) -> None:
+        if type(record) is not self.record_type:
+            self.flush()
+            self.record_type = type(record)
+            self.getter = tuple_getter([field.name for field in fields(record)])
+        self.batch.append(self.getter(record))
+        if len(self.batch) >= RECORD_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.batch:
+            # The class is pickled by reference, so record types from plugins are found again too
+            pickle.dump((self.record_type, self.batch), self.entry_file, pickle.HIGHEST_PROTOCOL)
+            self.batch = []
+
+    def commit(self) -> None:
+        """Moves the finished entry into place"""
+        self.flush()
+        self.entry_file.close()
+        os.replace(self.entry_file.name, self.cache.entry_path(self.key))
+
+    def discard(self) -> None:
+        self.entry_file.close()
+        os.remove(self.entry_file.name)
@@ -1,12 +1,35 @@
+import io
 import os
+import sys
 import argparse
 import re
 import mmap
 import time
 import csv
-from typing import Callable
+import heapq
+import multiprocessing
+from collections import Counter, deque
+from contextlib import contextmanager
+from itertools import groupby, islice
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 
 from records import *
+from metrics import RunMetrics
+from sqlite_sink import SqliteSink
+from dedup import RecordAggregator, aggregate_headers
+from ranges import ByteRange, normalize_ranges, parse_ranges, ranges_from, read_range_file, split_ranges
+from sparse import can_skip_zeros, data_regions, find_empty_regions
+from checkpoint import Checkpoint, CheckpointError, CsvCheckpointer, new_checkpoint, truncate_outputs
+from anchors import find_aligned
+from anchor_index import AnchorIndex, open_anchor_index
+from result_cache import CACHE_MAX_AGE, CACHE_MAX_BYTES, ResultCache, dump_fingerprint, parse_size
+from base64icon import FaviconWriter
 
 SPIDER_LOGO = r"""
    _____                 _             ______                       _          
@@ -28,11 +51,744 @@ Website: www.spyderforensics.com
 Course: Host-Based Dark Web Forensics
 """
 
-def extract_to_csv(dump_file_path: str, output_csv_path: str, csv_headers: list[str], regex_pattern: re.Pattern[bytes], process_matcher: Callable[[int, mmap.mmap, str | None], BrowserRequest | BrowserActivity | SocksRequest | TabData | None], output_folder: str | None) -> None:
-    """Reads the entire file using mmap"""
+# Workers scan the dump in chunks of this size, each against its own mmap of the whole file
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# Bytes a chunk scan reads past its edges. Matches are only reported for offsets inside the chunk,
+# so hits are never duplicated, and field walks (e.g. the 2000-byte windows in TorMemory_HTTPRequests)
+# are never truncated because every worker maps the full dump.
+CHUNK_OVERLAP = 64 * 1024
+
+# How often a bounded field search missed its marker because it lay just past the limit, keyed by "<parser>.<field>"
+bound_hits: Counter[str] = Counter()
+
+def find_within(memory_data: mmap.mmap, sub: bytes, start: int, max_distance: int, bound_name: str, unit: int = 1) -> int:
+    """Finds sub starting at most max_distance bytes after start, or returns -1.
+
+    A miss is counted against bound_name only when sub starts within another
+    max_distance bytes past the limit, so the counts show which limits cut
+    fields short rather than how often a marker is simply not there. With a
+    unit of 2, sub is two-byte text and only matches at whole code units from
+    start.
+    """
+    position = find_aligned(memory_data, sub, start, start + max_distance + len(sub), unit)
+    if position == -1 and max_distance >= 0:
+        past_limit = start + (max_distance // unit + 1) * unit
+        if find_aligned(memory_data, sub, past_limit, past_limit + max_distance + len(sub), unit) != -1:
+            bound_hits[bound_name] += 1
+    return position
+
+# Where per-hit detail lines go, see log_event(). None drops them, which is the default.
+_event_sink: Callable[[str], None] | None = None
+
+def log_event(message: str) -> None:
+    """Records a per-hit detail line (e.g. "[+] ... identified at offset") in the event log, if one is open"""
+    if _event_sink:
+        _event_sink(message)
+
+@contextmanager
+def event_log(log_path: str | None, append: bool = False) -> Iterator[None]:
+    """Sends log_event() lines to a buffered log file for the duration of a run, or to stdout if log_path is '-'"""
+    global _event_sink
+    if log_path is None:
+        yield
+        return
+    if log_path == '-':
+        _event_sink = print
+        try:
+            yield
+        finally:
+            _event_sink = None
+        return
+
+    with open(log_path, 'a' if append else 'w', encoding='utf-8', buffering=EVENT_LOG_BUFFER_SIZE) as log_file:
+        _event_sink = lambda message: log_file.write(message + '\n')
+        try:
+            yield
+        finally:
+            _event_sink = None
+
+# Event log files are written through a buffer of this size, so per-hit lines cost no syscalls
+EVENT_LOG_BUFFER_SIZE = 1024 * 1024
+
+# Seconds between progress bar redraws
+PROGRESS_INTERVAL = 0.5
+
+class Progress:
+    """A progress bar on stderr showing how much of the dump has been scanned, records per second and ETA.
+
+    update() is cheap enough to call for every hit; the bar is only redrawn
+    every PROGRESS_INTERVAL seconds. When stderr is not a terminal each redraw
+    is written as its own line instead.
+    """
+
+    def __init__(self, total_bytes: int, stream=sys.stderr, interval: float = PROGRESS_INTERVAL):
+        self.total_bytes = total_bytes
+        self.stream = stream
+        self.interval = interval
+        self.position = 0
+        # Added to every position passed to update(), turning dump offsets into bytes scanned when only some ranges are scanned
+        self.offset_shift = 0
+        self.records = 0
+        self.started = time.monotonic()
+        self.next_draw = self.started + interval
+        self.is_terminal = stream.isatty()
+
+    def update(self, position: int, records: int = 0) -> None:
+        """Notes that the scan has reached position and found records more records"""
+        self.position = position + self.offset_shift
+        self.records += records
+        if time.monotonic() >= self.next_draw:
+            self.draw()
+
+    def draw(self) -> None:
+        now = time.monotonic()
+        self.next_draw = now + self.interval
+        elapsed = now - self.started
+        fraction = min(self.position / self.total_bytes, 1.0) if self.total_bytes else 1.0
+        rate = self.records / elapsed if elapsed else 0.0
+        if 0 < fraction < 1:
+            eta = time.strftime('%H:%M:%S', time.gmtime(elapsed / fraction - elapsed))
+        else:
+            eta = "--:--:--"
+
+        filled = int(fraction * 30)
+        line = f"[{'#' * filled}{'.' * (30 - filled)}] {fraction * 100:5.1f}%  {self.records} records  {rate:,.0f} records/s  ETA {eta}"
+        if self.is_terminal:
+            self.stream.write('\r' + line)
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def finish(self) -> None:
+        self.position = self.total_bytes
+        self.draw()
+        if self.is_terminal:
+            self.stream.write('\n')
+            self.stream.flush()
+
+# Why the current process_match call is discarding its hit, see reject()
+_rejection_reason: str | None = None
+
+def reject(reason: str) -> None:
+    """Records why process_match is discarding a hit for the run metrics, so parsers can `return reject(...)`"""
+    global _rejection_reason
+    _rejection_reason = reason
+
+def print_run_summary(start_time: float, output_path: str) -> None:
+    """Prints the completion time, elapsed time and output location of a run"""
+    if bound_hits:
+        print("\nField search limits reached:")
+        for bound_name, count in sorted(bound_hits.items()):
+            print(f"  {bound_name}: {count}")
+    end_time = time.time()
+    print(f"\nProcessing completed at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}")
+    elapsed_time = end_time - start_time
+    hours, remainder = divmod(elapsed_time, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    print(f"Total execution time: {int(hours):02d}:{int(minutes):02d}:{seconds:.2f}")
+    print(f"\nResults saved to: {output_path}")
+
+CarvedRecord = BrowserActivity | BrowserRequest | HttpRequest | SocksRequest | TabData
+ProcessMatcher = Callable[[int, mmap.mmap, str | None], CarvedRecord | None]
+
+@dataclass
+class MemoryParser:
+    """A carver that can take part in a combined scan of a memory dump, and the plugin interface of tor_mem_scan (see plugins.py)."""
+    name: str
+    csv_headers: list[str]
+    regex_pattern: re.Pattern[bytes]
+    process_matcher: ProcessMatcher
+    # The class of the records process_matcher returns
+    record_type: type | None = None
+
+def has_backreference(node) -> bool:
+    """True if a parsed pattern, or any part of it, refers back to one of its groups"""
+    if isinstance(node, sre_parse.SubPattern):
+        return any(op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS) or has_backreference(av) for op, av in node)
+    if isinstance(node, (tuple, list)):
+        return any(has_backreference(item) for item in node)
+    return False
+
+def can_combine(pattern: re.Pattern[bytes]) -> bool:
+    """True if pattern still matches the same bytes once joined with others into one alternation.
+
+    Joining keeps no compile flags, including inline global ones such as
+    (?s), which pattern.flags holds as well; renumbers groups, so
+    backreferences would point at the wrong group; and fails on a group name
+    two patterns share.
+    """
+    if pattern.flags != re.compile(b'').flags or pattern.groupindex:
+        return False
+    try:
+        return not has_backreference(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return False
+
+def iter_pattern_matches(memory_data: mmap.mmap, parser_index: int, pattern: re.Pattern[bytes], start: int, end: int, scan_start: int, scan_end: int) -> Iterator[tuple[int, int, bytes]]:
+    """Yields (offset, parser_index, matched bytes) for the hits of one pattern starting in [start, end)"""
+    for match in pattern.finditer(memory_data, scan_start, scan_end):
+        if match.start() >= end:
+            return
+        if match.start() >= start:
+            yield match.start(), parser_index, match.group()
+
+def iter_combined_matches(memory_data: mmap.mmap, indexed_patterns: list[tuple[int, re.Pattern[bytes]]], start: int, end: int, scan_start: int, scan_end: int) -> Iterator[tuple[int, int, bytes]]:
+    """Yields (offset, parser_index, matched bytes) for the hits of several patterns starting in [start, end), found in one pass"""
+    # Joined without wrapping groups so re keeps its first-byte prefilter, which is several times faster
+    combined_re = re.compile(b'|'.join(pattern.pattern for _, pattern in indexed_patterns))
+    next_allowed = [0] * len(indexed_patterns)
+    position = scan_start
+
+    while True:
+        match = combined_re.search(memory_data, position, scan_end)
+        if not match or match.start() >= end:
+            return
+        offset = match.start()
+
+        # The combined pattern only reports the first alternative, so check every pattern at this offset
+        for pattern_number, (parser_index, pattern) in enumerate(indexed_patterns):
+            if offset < next_allowed[pattern_number]:
+                continue
+            parser_match = pattern.match(memory_data, offset, scan_end)
+            if parser_match:
+                next_allowed[pattern_number] = max(parser_match.end(), offset + 1)
+                if offset >= start:
+                    yield offset, parser_index, parser_match.group()
+
+        position = offset + 1
+
+def iter_matches(memory_data: mmap.mmap, memory_parsers: list[MemoryParser], start: int = 0, end: int | None = None) -> Iterator[tuple[MemoryParser, int, bytes]]:
+    """Yields (parser, offset, matched bytes) for every pattern hit of every parser in a single pass over memory_data.
+
+    Hits come out in ascending offset order, and each parser sees exactly the
+    non-overlapping matches its own finditer would have produced. Only hits
+    starting in [start, end) are reported; the scan itself reaches CHUNK_OVERLAP
+    bytes either side so matches spanning the range edges are still found.
+    Patterns that can_combine share one search; any other pattern is searched
+    on its own, and the hits of every search are merged by offset.
+    """
+    if end is None:
+        end = len(memory_data)
+    scan_start = max(0, start - CHUNK_OVERLAP)
+    scan_end = min(len(memory_data), end + CHUNK_OVERLAP)
+
+    combined = [(parser_index, memory_parser.regex_pattern) for parser_index, memory_parser in enumerate(memory_parsers) if can_combine(memory_parser.regex_pattern)]
+    if len(combined) < 2:
+        combined = []
+    combined_indexes = {parser_index for parser_index, _ in combined}
+    searches = [
+        iter_pattern_matches(memory_data, parser_index, memory_parser.regex_pattern, start, end, scan_start, scan_end)
+        for parser_index, memory_parser in enumerate(memory_parsers) if parser_index not in combined_indexes
+    ]
+    if combined:
+        searches.append(iter_combined_matches(memory_data, combined, start, end, scan_start, scan_end))
+
+    # Hits at one offset come out in parser order, as no parser has two hits at the same offset
+    hits = searches[0] if len(searches) == 1 else heapq.merge(*searches)
+    for offset, parser_index, matched in hits:
+        yield memory_parsers[parser_index], offset, matched
+
+def carve_records(memory_data: mmap.mmap, memory_parsers: list[MemoryParser], output_folder: str | None, metrics: RunMetrics, start: int = 0, end: int | None = None, progress: Progress | None = None, anchor_index: AnchorIndex | None = None) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """Runs process_match on every hit in [start, end) and yields the records that are kept, in offset order.
+
+    With an anchor_index the hits are read from the index instead of found by searching memory_data.
+    """
+    global _rejection_reason
+    perf_counter = time.perf_counter
+    if end is None:
+        end = len(memory_data)
+    if anchor_index:
+        hits = anchor_index.iter_matches(memory_parsers, start, end, CHUNK_OVERLAP)
+    else:
+        hits = iter_matches(memory_data, memory_parsers, start, end)
+    metrics.bytes_scanned += end - start
+
+    while True:
+        scan_started = perf_counter()
+        hit = next(hits, None)
+        extract_started = perf_counter()
+        metrics.scan_seconds += extract_started - scan_started
+        if hit is None:
+            return
+
+        memory_parser, offset, anchor = hit
+        parser_metrics = metrics.parser(memory_parser.name)
+        parser_metrics.pattern_hits[anchor] += 1
+
+        _rejection_reason = None
+        row = memory_parser.process_matcher(offset, memory_data, output_folder)
+        parser_metrics.extract_seconds += perf_counter() - extract_started
+
+        if row:
+            parser_metrics.accepted += 1
+            yield memory_parser, row
+        else:
+            parser_metrics.rejected += 1
+            parser_metrics.rejection_reasons[_rejection_reason or "unspecified"] += 1
+
+        if progress:
+            progress.update(offset, 1 if row else 0)
+
+def carve_region(memory_data: mmap.mmap, dump_fd: int | None, memory_parsers: list[MemoryParser], output_folder: str | None, metrics: RunMetrics, start: int, end: int, progress: Progress | None = None, skip_empty: bool = False, anchor_index: AnchorIndex | None = None) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """carve_records over [start, end), first leaving out holes and zero runs if skip_empty is set.
+
+    Nothing is searched when carving from an anchor_index, so there is nothing to skip either.
+    """
+    if not skip_empty or anchor_index:
+        yield from carve_records(memory_data, memory_parsers, output_folder, metrics, start, end, progress, anchor_index)
+        return
+
+    skipped = find_empty_regions(memory_data, dump_fd, start, end)
+    metrics.add_skipped(skipped)
+    for region_start, region_end in data_regions(start, end, skipped):
+        yield from carve_records(memory_data, memory_parsers, output_folder, metrics, region_start, region_end, progress)
+        # Moves the bar past regions without hits, and the zero runs skipped after them
+        if progress:
+            progress.update(region_end, 0)
+
+# Per-process state of a scan worker, set up once by _init_scan_worker
+_worker_dump_file = None
+_worker_memory_data: mmap.mmap | None = None
+_worker_memory_parsers: list[MemoryParser] = []
+_worker_output_folder: str | None = None
+_worker_log_events = False
+_worker_skip_empty = False
+_worker_anchor_index: AnchorIndex | None = None
+
+def _init_scan_worker(dump_file_path: str, memory_parsers: list[MemoryParser], output_folder: str | None, log_events: bool, skip_empty: bool, index_folder: str | None) -> None:
+    """Opens a private mmap of the dump, and of its anchor index if it is carved from one, for this worker process"""
+    global _worker_dump_file, _worker_memory_data, _worker_memory_parsers, _worker_output_folder, _worker_log_events, _worker_skip_empty, _worker_anchor_index
+    # The file stays open for SEEK_HOLE lookups
+    _worker_dump_file = open(dump_file_path, 'rb')
+    _worker_memory_data = mmap.mmap(_worker_dump_file.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker_memory_parsers = memory_parsers
+    _worker_output_folder = output_folder
+    _worker_log_events = log_events
+    _worker_skip_empty = skip_empty
+    _worker_anchor_index = AnchorIndex.open(index_folder, dump_file_path) if index_folder else None
+
+def _scan_chunk(chunk: tuple[int, int]) -> tuple[list[tuple[int, CarvedRecord]], RunMetrics, list[str]]:
+    """Runs the worker's parsers over one chunk and returns (parser index, record) pairs in offset order,
+    along with the chunk's metrics and event log lines"""
+    global _event_sink
+    chunk_start, chunk_end = chunk
+    bound_hits.clear()
+    # Events are handed back to the main process, which writes them in offset order
+    events = []
+    _event_sink = events.append if _worker_log_events else None
+    chunk_metrics = RunMetrics()
+    parser_indexes = {id(memory_parser): index for index, memory_parser in enumerate(_worker_memory_parsers)}
+    results = [
+        (parser_indexes[id(memory_parser)], row)
+        for memory_parser, row in carve_region(_worker_memory_data, _worker_dump_file.fileno(), _worker_memory_parsers, _worker_output_folder, chunk_metrics, chunk_start, chunk_end, skip_empty=_worker_skip_empty, anchor_index=_worker_anchor_index)
+    ]
+    chunk_metrics.bound_hits = bound_hits.copy()
+    return results, chunk_metrics, events
+
+# Called with the end offset of each chunk once all of its records have been yielded and handled
+ChunkCallback = Callable[[int], None]
+
+def iter_parallel_records(dump_file_path: str, memory_parsers: list[MemoryParser], output_folder: str | None, workers: int, metrics: RunMetrics, progress: Progress | None, ranges: list[ByteRange], skip_empty: bool, on_chunk_done: ChunkCallback | None, index_folder: str | None = None) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """Scans the ranges in CHUNK_SIZE pieces across a process pool and yields (parser, record) in offset order.
+
+    At most two chunks per worker are in flight at once, so memory stays flat
+    however large the dump is and records are yielded as soon as the first
+    chunk finishes.
+    """
+    chunks = split_ranges(ranges, CHUNK_SIZE)
+    scanned = 0
+
+    initargs = (dump_file_path, memory_parsers, output_folder, _event_sink is not None, skip_empty, index_folder)
+    with multiprocessing.Pool(workers, initializer=_init_scan_worker, initargs=initargs) as pool:
+        pending = deque((chunk, pool.apply_async(_scan_chunk, (chunk,))) for chunk in islice(chunks, workers * 2))
+        while pending:
+            # Chunks are collected in submission order, which keeps the output in offset order
+            (chunk_start, chunk_end), result = pending.popleft()
+            chunk_results, chunk_metrics, events = result.get()
+            bound_hits.update(chunk_metrics.bound_hits)
+            chunk_metrics.bound_hits.clear()
+            metrics.merge(chunk_metrics)
+            next_chunk = next(chunks, None)
+            if next_chunk:
+                pending.append((next_chunk, pool.apply_async(_scan_chunk, (next_chunk,))))
+
+            for message in events:
+                log_event(message)
+            for parser_index, row in chunk_results:
+                yield memory_parsers[parser_index], row
+            scanned += chunk_end - chunk_start
+            if progress:
+                progress.update(scanned, len(chunk_results))
+            if on_chunk_done:
+                on_chunk_done(chunk_end)
+
+def iter_dump_records(dump_file_path: str, memory_parsers: list[MemoryParser], output_folder: str | None, workers: int, metrics: RunMetrics, progress: Progress | None = None, ranges: list[ByteRange] | None = None, skip_empty: bool = True, on_chunk_done: ChunkCallback | None = None, index_folder: str | None = None) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """Yields (parser, record) for the whole dump, or only hits inside ranges, in offset order, in this process or across a worker pool.
+
+    Offsets are always absolute. A range only limits where hits may start:
+    fields are read from the full mapping, so a record that runs past the end
+    of its range is carved the same as in a full scan.
+
+    With skip_empty, sparse file holes and long all-zero runs are not scanned,
+    as long as no parser's pattern could start inside them (see sparse.py).
+
+    The ranges are always scanned in the same CHUNK_SIZE chunks, whatever the
+    worker count, so a run resumed from a chunk boundary matches a run that
+    was never interrupted.
+
+    With an index_folder, hits are read from the dump's anchor index there
+    (see anchor_index.py), which is built first if it is missing or lacks
+    one of the parsers' literals. Only the bytes around each hit are read.
+    """
+    dump_size = os.path.getsize(dump_file_path)
+    ranges = [(0, dump_size)] if ranges is None else normalize_ranges(ranges, dump_size)
+    skip_empty = skip_empty and can_skip_zeros([memory_parser.regex_pattern for memory_parser in memory_parsers])
+
+    anchor_index = None
+    if index_folder:
+        anchor_index = open_anchor_index(dump_file_path, index_folder, memory_parsers, Progress(dump_size, progress.stream) if progress else None)
+        if anchor_index is None:
+            message = "[-] Not every parser's pattern is a set of literals, so the dump is scanned instead of indexed"
+            log_event(message)
+            # Only shown with the progress bar, as a quiet run prints nothing
+            if progress:
+                print(message, file=sys.stderr)
+        if progress:
+            # The carving rate should not count time spent indexing
+            progress.started = time.monotonic()
+    if progress:
+        progress.total_bytes = sum(end - start for start, end in ranges)
+
+    try:
+        if workers > 1:
+            yield from iter_parallel_records(dump_file_path, memory_parsers, output_folder, workers, metrics, progress, ranges, skip_empty, on_chunk_done, index_folder if anchor_index else None)
+        else:
+            with open(dump_file_path, 'rb') as dump_file:
+                with mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ) as memory_data:
+                    # Hits are handled as they are found, in ascending offset order
+                    scanned = 0
+                    for chunk_start, chunk_end in split_ranges(ranges, CHUNK_SIZE):
+                        if progress:
+                            progress.offset_shift = scanned - chunk_start
+                        yield from carve_region(memory_data, dump_file.fileno(), memory_parsers, output_folder, metrics, chunk_start, chunk_end, progress, skip_empty, anchor_index)
+                        # Hits alone move the bar, so a chunk without any would leave it where the last hit was
+                        if progress:
+                            progress.update(chunk_end, 0)
+                        scanned += chunk_end - chunk_start
+                        if on_chunk_done:
+                            on_chunk_done(chunk_end)
+    finally:
+        if anchor_index:
+            anchor_index.close()
+
+    if progress:
+        progress.finish()
+
+# A dump to carve: its path, its contents already in memory, or a binary file opened on it
+DumpSource = str | os.PathLike | mmap.mmap | bytes | bytearray | memoryview | BinaryIO
+
+def iter_records(dump: DumpSource, memory_parsers: MemoryParser | list[MemoryParser], ranges: list[ByteRange] | None = None, workers: int = 1, skip_empty: bool = True, metrics: RunMetrics | None = None) -> Iterator[CarvedRecord]:
+    """Yields the records carved from a dump, lazily and in offset order, without writing any files.
+
+    This is the library entry point, e.g. iter_records(path, memory_parser)
+    with a parser module's memory_parser. Several parsers share one scan; each
+    parser's records are of its own records.py type, so they can be routed
+    with isinstance. An open file is memory-mapped for the scan and left open;
+    an in-memory file such as io.BytesIO is carved from its whole buffer, and
+    any other file object is read from its current position. A bytearray or
+    memoryview is copied to bytes first. Only a dump given by its path can be
+    split across workers. Pass a RunMetrics to collect the scan's metrics.
+    Raises TypeError for any other kind of dump.
+    """
+    if isinstance(memory_parsers, MemoryParser):
+        memory_parsers = [memory_parsers]
+    if metrics is None:
+        metrics = RunMetrics()
+
+    if isinstance(dump, (str, os.PathLike)):
+        for _, record in iter_dump_records(os.fspath(dump), memory_parsers, None, workers, metrics, ranges=ranges, skip_empty=skip_empty):
+            yield record
+        return
+    if workers > 1:
+        raise ValueError("only a dump given by its path can be carved by several workers")
+    if isinstance(dump, (mmap.mmap, bytes)):
+        yield from iter_buffer_records(dump, None, memory_parsers, metrics, ranges, skip_empty)
+        return
+    if isinstance(dump, (bytearray, memoryview)):
+        # The parsers slice and decode their matches as bytes, which a memoryview cannot
+        yield from iter_buffer_records(bytes(dump), None, memory_parsers, metrics, ranges, skip_empty)
+        return
+    if not hasattr(dump, 'read'):
+        raise TypeError(f"cannot carve a dump given as {type(dump).__name__}; pass a path, an open binary file or bytes")
+
+    try:
+        dump_fd = dump.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        dump_fd = None
+    if dump_fd is not None:
+        with mmap.mmap(dump_fd, 0, access=mmap.ACCESS_READ) as memory_data:
+            yield from iter_buffer_records(memory_data, dump_fd, memory_parsers, metrics, ranges, skip_empty)
+        return
+    # A file with no descriptor to map, such as io.BytesIO
+    memory_data = bytes(dump.getbuffer()) if hasattr(dump, 'getbuffer') else dump.read()
+    yield from iter_buffer_records(memory_data, None, memory_parsers, metrics, ranges, skip_empty)
+
+def iter_buffer_records(memory_data: mmap.mmap | bytes, dump_fd: int | None, memory_parsers: list[MemoryParser], metrics: RunMetrics, ranges: list[ByteRange] | None, skip_empty: bool) -> Iterator[CarvedRecord]:
+    """Carves a dump already in memory in this process, in the same chunks as iter_dump_records"""
+    ranges = [(0, len(memory_data))] if ranges is None else normalize_ranges(ranges, len(memory_data))
+    skip_empty = skip_empty and can_skip_zeros([memory_parser.regex_pattern for memory_parser in memory_parsers])
+    for chunk_start, chunk_end in split_ranges(ranges, CHUNK_SIZE):
+        for _, record in carve_region(memory_data, dump_fd, memory_parsers, None, metrics, chunk_start, chunk_end, skip_empty=skip_empty):
+            yield record
+
+# Writes one record to wherever a parser's output is going
+RecordWriter = Callable[[CarvedRecord], None]
+
+# Records a CsvBatchWriter collects before writing them in one writerows call
+CSV_BATCH_SIZE = 4096
+
+class CsvBatchWriter:
+    """A RecordWriter for one parser's CSV that writes its records a batch at a time.
+
+    Each row is read straight off the record through its type's csv_columns,
+    if it has them, so no per-record list of strings is built. Rows only reach the CSV when a
+    batch fills or flush() is called, so whatever measures the file, like a
+    checkpoint, flushes first.
+    """
+
+    def __init__(self, csv_writer: csv.writer):
+        self.csv_writer = csv_writer
+        self.batch: list[CarvedRecord] = []
+        self.row_getters: dict[type, Callable] = {}
+
+    def __call__(self, record: CarvedRecord) -> None:
+        self.batch.append(record)
+        if len(self.batch) >= CSV_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        for record_type, records in groupby(self.batch, type):
+            row_getter = self.row_getters.get(record_type)
+            if row_getter is None:
+                # Record types from plugins may only define to_csv_row
+                csv_columns = getattr(record_type, 'csv_columns', None)
+                row_getter = self.row_getters[record_type] = tuple_getter(csv_columns) if csv_columns else record_type.to_csv_row
+            self.csv_writer.writerows(map(row_getter, records))
+        self.batch.clear()
+
+def write_records(records: Iterator[tuple[MemoryParser, CarvedRecord]], record_writers: dict[str, RecordWriter], metrics: RunMetrics) -> None:
+    """Writes each record with its parser's writer, timing the writes"""
+    perf_counter = time.perf_counter
+    for memory_parser, row in records:
+        write_started = perf_counter()
+        record_writers[memory_parser.name](row)
+        metrics.parser(memory_parser.name).write_seconds += perf_counter() - write_started
+
+def finish_run(metrics: RunMetrics, metrics_path: str, dump_file_path: str, start_time: float, workers: int) -> dict:
+    """Writes the run's metrics sidecar and returns its contents"""
+    metrics.bound_hits.update(bound_hits)
+    return metrics.write_json(metrics_path, dump_file_path, time.time() - start_time, workers)
+
+@dataclass
+class RunOptions:
+    """How a run is carried out and what it writes, beyond the dump and output paths."""
+    workers: int = 1
+    quiet: bool = False
+    log_path: str | None = None
+    sqlite_path: str | None = None
+    dedup: bool = False
+    # Only hits starting inside these (start, end) offset ranges are carved; None scans the whole dump
+    ranges: list[ByteRange] | None = None
+    skip_empty: bool = True
+    # Continue an interrupted CSV run from its checkpoint, if it left one
+    resume: bool = False
+    # Result cache folder; None neither replays nor stores results
+    cache_folder: str | None = None
+    cache_full_hash: bool = False
+    cache_max_bytes: int = CACHE_MAX_BYTES
+    # Seconds an unused cache entry is kept
+    cache_max_age: float = CACHE_MAX_AGE
+    # Anchor index folder to carve from instead of scanning, see anchor_index.py
+    index_folder: str | None = None
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> 'RunOptions':
+        """Builds the options from arguments added by add_output_arguments and checked by check_output_arguments"""
+        return cls(
+            args.workers, args.quiet, args.log, args.sqlite, args.dedup, args.scan_ranges, args.skip_empty, args.resume,
+            args.cache, args.cache_full_hash, args.cache_max_size, args.cache_max_age * 24 * 3600, args.index,
+        )
+
+def replay_cached_records(cache: ResultCache, keys: dict[str, str], memory_parsers: list[MemoryParser], output_folder: str | None, metrics: RunMetrics, progress: Progress | None) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """Yields every parser's cached records in turn"""
+    for memory_parser in memory_parsers:
+        parser_metrics = metrics.parser(memory_parser.name)
+        for record in cache.read(keys[memory_parser.name]):
+            parser_metrics.accepted += 1
+            if progress:
+                progress.update(0, 1)
+            yield memory_parser, record
+        metrics.cached_parsers.append(memory_parser.name)
+        log_event(f"[+] Replayed {memory_parser.name} records from the result cache")
+    if progress:
+        progress.finish()
+
+def iter_run_records(dump_file_path: str, memory_parsers: list[MemoryParser], output_folder: str | None, options: RunOptions, metrics: RunMetrics, progress: Progress | None = None, ranges: list[ByteRange] | None = None, on_chunk_done: ChunkCallback | None = None, resuming: bool = False, favicon_writer: FaviconWriter | None = None) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """Yields the run's records from iter_cached_records, extracting the base64 favicons of tab records into output_folder.
+
+    Favicons are written by a FaviconWriter on background threads, whether
+    the records were carved in this process, by scan workers or replayed from
+    the cache. A CSV run passes the favicon_writer its checkpoints measure;
+    either way the writer is closed once the records run out.
+    """
+    records = iter_cached_records(dump_file_path, memory_parsers, output_folder, options, metrics, progress, ranges, on_chunk_done, use_cache=not resuming)
+    if favicon_writer is None:
+        if not output_folder:
+            yield from records
+            return
+        favicon_writer = FaviconWriter(output_folder, log_event)
+    try:
+        for memory_parser, record in records:
+            if isinstance(record, TabData):
+                favicon_writer.add(record.match_offset, record.favicon_url)
+            yield memory_parser, record
+    finally:
+        favicon_writer.close()
+
+def iter_cached_records(dump_file_path: str, memory_parsers: list[MemoryParser], output_folder: str | None, options: RunOptions, metrics: RunMetrics, progress: Progress | None = None, ranges: list[ByteRange] | None = None, on_chunk_done: ChunkCallback | None = None, use_cache: bool = True) -> Iterator[tuple[MemoryParser, CarvedRecord]]:
+    """Yields the run's records like iter_dump_records, going through the result cache at options.cache_folder if set.
+
+    When every parser has a cache entry for this dump and these ranges, the
+    records are replayed from it and the dump is not scanned. Otherwise the
+    dump is scanned and, once the scan completes, each parser's records are
+    stored for next time. A resumed run only scans part of the dump, so it
+    passes use_cache=False.
+    """
+    if not options.cache_folder or not use_cache:
+        yield from iter_dump_records(dump_file_path, memory_parsers, output_folder, options.workers, metrics, progress, ranges, options.skip_empty, on_chunk_done, options.index_folder)
+        return
+
+    dump_size = os.path.getsize(dump_file_path)
+    cache_ranges = [(0, dump_size)] if ranges is None else normalize_ranges(ranges, dump_size)
+    cache = ResultCache(options.cache_folder, options.cache_max_bytes, options.cache_max_age)
+    fingerprint = dump_fingerprint(dump_file_path, options.cache_full_hash)
+    keys = {memory_parser.name: cache.entry_key(fingerprint, memory_parser, cache_ranges) for memory_parser in memory_parsers}
+    if all(cache.has(key) for key in keys.values()):
+        yield from replay_cached_records(cache, keys, memory_parsers, output_folder, metrics, progress)
+        cache.evict()
+        return
+
+    description = {'dump_file': os.path.abspath(dump_file_path), 'fingerprint': fingerprint, 'ranges': cache_ranges}
+    entry_writers = {name: cache.writer(key, description) for name, key in keys.items()}
+    try:
+        for memory_parser, record in iter_dump_records(dump_file_path, memory_parsers, output_folder, options.workers, metrics, progress, ranges, options.skip_empty, on_chunk_done, options.index_folder):
+            entry_writers[memory_parser.name].add(record)
+            yield memory_parser, record
+    except BaseException:
+        for entry_writer in entry_writers.values():
+            entry_writer.discard()
+        raise
+    for entry_writer in entry_writers.values():
+        entry_writer.commit()
+    cache.evict()
+
+def extract_to_sqlite(dump_file_path: str, memory_parsers: list[MemoryParser], output_folder: str | None, options: RunOptions, progress: Progress | None, start_time: float) -> None:
+    """Appends every parser's records to the SQLite case database, with the run's metrics sidecar next to it"""
+    metrics = RunMetrics()
+    sink = SqliteSink(options.sqlite_path, dump_file_path)
+    try:
+        with event_log(options.log_path):
+            records = iter_run_records(dump_file_path, memory_parsers, output_folder, options, metrics, progress, options.ranges)
+            write_records(records, {memory_parser.name: sink.write for memory_parser in memory_parsers}, metrics)
+    except BaseException:
+        sink.abort()
+        raise
+
+    report = finish_run(metrics, os.path.splitext(options.sqlite_path)[0] + ".metrics.json", dump_file_path, start_time, options.workers)
+    sink.close(report)
+
+def write_csv_outputs(dump_file_path: str, memory_parsers: list[MemoryParser], output_paths: dict[str, str], output_folder: str | None, options: RunOptions, progress: Progress | None, metrics: RunMetrics, checkpoint_path: str) -> None:
+    """Carves the dump into one CSV per parser at output_paths.
+
+    Unless options.dedup is set, a checkpoint is saved at checkpoint_path as
+    the run goes. With options.resume, a run that left a checkpoint behind
+    continues from it: each CSV and the favicon manifest are cut back to their
+    checkpointed lengths and the scan picks up at the checkpointed offset, so
+    the finished files are byte-identical to those of an uninterrupted run.
+    """
+    parser_names = [memory_parser.name for memory_parser in memory_parsers]
+    checkpoint = new_checkpoint(dump_file_path, parser_names, options.ranges)
+    ranges = options.ranges
+    resuming = options.resume and os.path.exists(checkpoint_path)
+    if resuming:
+        saved_checkpoint = Checkpoint.load(checkpoint_path)
+        saved_checkpoint.check_resumes(checkpoint)
+        truncate_outputs(output_paths, saved_checkpoint)
+        checkpoint = saved_checkpoint
+        ranges = ranges_from(ranges or [(0, checkpoint.dump_size)], checkpoint.offset)
+        metrics.resumed_from = checkpoint.offset
+    favicon_writer = FaviconWriter(output_folder, log_event, checkpoint.favicon_manifest_position if resuming else None) if output_folder else None
+
+    csv_files = {}
+    try:
+        for name in parser_names:
+            csv_files[name] = open(output_paths[name], 'a' if resuming else 'w', newline='', encoding='utf-8')
+        csv_writers = {name: CsvBatchWriter(csv.writer(csv_file)) for name, csv_file in csv_files.items()}
+
+        checkpointer = None
+        if not options.dedup:
+            if not resuming:
+                for memory_parser in memory_parsers:
+                    csv_writers[memory_parser.name].csv_writer.writerow(memory_parser.csv_headers)
+            checkpointer = CsvCheckpointer(checkpoint, checkpoint_path, csv_files, record_writers=csv_writers.values(), favicon_writer=favicon_writer)
+            if not resuming:
+                # Replaces any checkpoint left by an earlier run of the same outputs
+                checkpointer(0, force=True)
+
+        with event_log(options.log_path, append=resuming):
+            records = iter_run_records(dump_file_path, memory_parsers, output_folder, options, metrics, progress, ranges, checkpointer, resuming, favicon_writer)
+            spill_folder = os.path.dirname(os.path.abspath(output_paths[parser_names[0]]))
+            write_csv_records(records, memory_parsers, csv_writers, options, spill_folder, metrics)
+    finally:
+        for csv_file in csv_files.values():
+            csv_file.close()
+
+    if checkpointer:
+        checkpointer.finish()
+
+def write_csv_records(records: Iterator[tuple[MemoryParser, CarvedRecord]], memory_parsers: list[MemoryParser], csv_writers: dict[str, CsvBatchWriter], options: RunOptions, spill_folder: str, metrics: RunMetrics) -> None:
+    """Writes each record to its parser's CSV or, with options.dedup, one row per unique record with its own headers"""
+    if not options.dedup:
+        write_records(records, csv_writers, metrics)
+        for memory_parser in memory_parsers:
+            write_started = time.perf_counter()
+            csv_writers[memory_parser.name].flush()
+            metrics.parser(memory_parser.name).write_seconds += time.perf_counter() - write_started
+        return
+
+    aggregators = {memory_parser.name: RecordAggregator(spill_folder) for memory_parser in memory_parsers}
+    write_records(records, {name: aggregator.add for name, aggregator in aggregators.items()}, metrics)
+    for memory_parser in memory_parsers:
+        csv_writer = csv_writers[memory_parser.name].csv_writer
+        csv_writer.writerow(aggregate_headers(memory_parser.csv_headers))
+        csv_writer.writerows(aggregators[memory_parser.name].rows())
+
+def extract_to_csv(dump_file_path: str, output_csv_path: str | None, csv_headers: list[str], regex_pattern: re.Pattern[bytes], process_matcher: ProcessMatcher, output_folder: str | None, options: RunOptions | None = None) -> None:
+    """Reads the entire file using mmap, writing to output_csv_path or, if options.sqlite_path is set, appending to that database"""
+    options = options or RunOptions()
     start_time = time.time()
-    print(f"Processing started at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}\n")
-    
+    if not options.quiet:
+        print(f"Processing started at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}\n")
+
+    progress = None if options.quiet else Progress(os.path.getsize(dump_file_path))
+    if options.sqlite_path:
+        memory_parser = MemoryParser(os.path.splitext(os.path.basename(options.sqlite_path))[0], csv_headers, regex_pattern, process_matcher)
+        extract_to_sqlite(dump_file_path, [memory_parser], output_folder, options, progress, start_time)
+        if not options.quiet:
+            print_run_summary(start_time, options.sqlite_path)
+        return
+
     if output_folder:
         # Create the main output folder based on user input
         os.makedirs(output_folder, exist_ok=True)
@@ -44,37 +800,95 @@ def extract_to_csv(dump_file_path: str, output_csv_path: str, csv_headers: list[
         extracted_icons_folder = os.path.join(output_folder, "Extracted FavIcons")
         os.makedirs(extracted_icons_folder, exist_ok=True)
     
-    with open(output_csv_path, 'w', newline='', encoding='utf-8') as csv_file:
-        csv_writer = csv.writer(csv_file)
-        csv_writer.writerow(csv_headers)
+    metrics = RunMetrics()
+    output_stem = os.path.splitext(output_csv_path)[0]
+    memory_parser = MemoryParser(os.path.basename(output_stem), csv_headers, regex_pattern, process_matcher)
+    write_csv_outputs(dump_file_path, [memory_parser], {memory_parser.name: output_csv_path}, output_folder, options, progress, metrics, output_stem + ".checkpoint.json")
 
-        with open(dump_file_path, 'rb') as dump_file:
-            with mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ) as memory_data:
-                match_offsets = sorted(match.start() for match in regex_pattern.finditer(memory_data))
+    finish_run(metrics, os.path.splitext(output_csv_path)[0] + ".metrics.json", dump_file_path, start_time, options.workers)
+    if not options.quiet:
+        print_run_summary(start_time, output_csv_path)
 
-                for offset in match_offsets:
-                    row = process_matcher(offset, memory_data, output_folder)
-                    if row:
-                        csv_writer.writerow(row.to_csv_row())
 
-    end_time = time.time()
-    print(f"\nProcessing completed at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}")
-    elapsed_time = end_time - start_time
-    hours, remainder = divmod(elapsed_time, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    print(f"Total execution time: {int(hours):02d}:{int(minutes):02d}:{seconds:.2f}")
-    print(f"\nResults saved to: {output_csv_path}")
+def extract_all_to_csv(dump_file_path: str, output_folder: str | None, memory_parsers: list[MemoryParser], options: RunOptions | None = None) -> None:
+    """Runs every parser over one mmap of the dump and writes one CSV per parser into output_folder,
+    or appends them all to the database at options.sqlite_path"""
+    options = options or RunOptions()
+    start_time = time.time()
+    if not options.quiet:
+        print(f"Processing started at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}\n")
+
+    progress = None if options.quiet else Progress(os.path.getsize(dump_file_path))
+    if options.sqlite_path:
+        extracted_icons_folder = os.path.join(os.path.dirname(os.path.abspath(options.sqlite_path)), "Extracted FavIcons")
+        extract_to_sqlite(dump_file_path, memory_parsers, extracted_icons_folder, options, progress, start_time)
+        if not options.quiet:
+            print_run_summary(start_time, options.sqlite_path)
+        return
 
+    os.makedirs(output_folder, exist_ok=True)
+    extracted_icons_folder = os.path.join(output_folder, "Extracted FavIcons")
 
-def run_argparser(description: str, input_help: str, output_help: str, program_name: str, csv_headers: list[str], regex_pattern: re.Pattern[bytes], process_matcher: Callable[[int, mmap.mmap, str | None], BrowserActivity | TabData | SocksRequest | BrowserRequest | None], output_folder: str):
+    metrics = RunMetrics()
+    output_paths = {memory_parser.name: os.path.join(output_folder, f"{memory_parser.name}.csv") for memory_parser in memory_parsers}
+    write_csv_outputs(dump_file_path, memory_parsers, output_paths, extracted_icons_folder, options, progress, metrics, os.path.join(output_folder, "checkpoint.json"))
+
+    finish_run(metrics, os.path.join(output_folder, "metrics.json"), dump_file_path, start_time, options.workers)
+    if not options.quiet:
+        print_run_summary(start_time, output_folder)
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the options shared by every parser's command line, see RunOptions"""
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of worker processes to scan with (default: 1).")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Print nothing, not even the progress bar or summary.")
+    parser.add_argument('--log', type=str, help="Write a line per identified record to this log file, or to the terminal if '-'.")
+    parser.add_argument('--sqlite', type=str, help="Append the records to this SQLite case database instead of writing CSV.")
+    parser.add_argument('--dedup', action='store_true', help="Write each unique record once, with its occurrence count, first and last offset and sample offsets.")
+    parser.add_argument('--ranges', type=str, help="Only scan these offset ranges, e.g. 0x1000-0x8000,0x20000+4096 (END is exclusive).")
+    parser.add_argument('--range-file', type=str, help="Only scan the ranges listed in this file, one START-END, START+LENGTH or 'START END ...' per line.")
+    parser.add_argument('--no-skip-empty', dest='skip_empty', action='store_false', help="Scan sparse file holes and all-zero regions too.")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted run from the checkpoint it left next to its output.")
+    parser.add_argument('--cache', type=str, help="Result cache folder: replay records from an earlier run on the same dump instead of scanning, and store them after a scan.")
+    parser.add_argument('--cache-full-hash', action='store_true', help="Identify the dump in the cache by a hash of its whole contents rather than its size, time and sampled blocks.")
+    parser.add_argument('--cache-max-size', type=parse_size, default=CACHE_MAX_BYTES, help="Evict the least recently used cache entries beyond this size, e.g. 20G (default: 10G).")
+    parser.add_argument('--cache-max-age', type=float, default=CACHE_MAX_AGE / (24 * 3600), help="Evict cache entries unused for this many days (default: 30).")
+    parser.add_argument('--index', type=str, help="Anchor index folder: carve from the offsets indexed there, building or extending the index first if needed.")
+
+def check_output_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Rejects conflicting options and parses the scan ranges into args.scan_ranges"""
+    if not args.output and not args.sqlite:
+        parser.error("one of -o/--output or --sqlite is required")
+    if args.dedup and args.sqlite:
+        parser.error("--dedup only applies to CSV output")
+    if args.resume and (args.dedup or args.sqlite):
+        parser.error("--resume only applies to CSV output without --dedup")
+
+    args.scan_ranges = None
+    try:
+        if args.ranges:
+            args.scan_ranges = parse_ranges(args.ranges)
+        if args.range_file:
+            args.scan_ranges = (args.scan_ranges or []) + read_range_file(args.range_file)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+
+def run_argparser(description: str, input_help: str, output_help: str, program_name: str, csv_headers: list[str], regex_pattern: re.Pattern[bytes], process_matcher: ProcessMatcher, output_folder: str):
     parser = argparse.ArgumentParser(description=description)
     parser.add_argument('-i', '--input', type=str, required=True, help=input_help)
-    parser.add_argument('-o', '--output', type=str, required=True, help=output_help)
+    parser.add_argument('-o', '--output', type=str, help=output_help)
+    add_output_arguments(parser)
 
     args = parser.parse_args()
-    print(banner(program_name))
+    check_output_arguments(parser, args)
+    if not args.quiet:
+        print(banner(program_name))
 
     if not os.path.isfile(args.input):
-        print("The specified memory dump file does not exist.")
-    else:
-        extract_to_csv(args.input, args.output, csv_headers, regex_pattern, process_matcher, output_folder)
\ No newline at end of file
+        print("The specified memory dump file does not exist.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        extract_to_csv(args.input, args.output, csv_headers, regex_pattern, process_matcher, output_folder, RunOptions.from_args(args))
+    except CheckpointError as e:
+        print(f"[-] {e}", file=sys.stderr)
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,103 @@
+import errno
+import mmap
+import os
+import re
+from typing import Iterator
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from ranges import ByteRange
+
+# Zero runs are found in whole blocks of this size, aligned to it
+ZERO_BLOCK_SIZE = 64 * 1024
+ZERO_BLOCK = bytes(ZERO_BLOCK_SIZE)
+
+# Shorter holes and zero runs are scanned anyway, since every region scanned on its own
+# also rescans CHUNK_OVERLAP bytes either side of it
+MIN_SKIP_LENGTH = 1024 * 1024
+
+# Bytes left unskipped at the end of every skipped run, so a hit that starts in the zeros
+# just before the data is still found. Must be at least the longest pattern.
+SKIP_MARGIN = 4096
+
+def can_skip_zeros(patterns: list[re.Pattern[bytes]]) -> bool:
+    """True if no pattern can match inside all-zero bytes and none can be longer than SKIP_MARGIN"""
+    for pattern in patterns:
+        if pattern.search(bytes(2 * SKIP_MARGIN)):
+            return False
+        try:
+            max_width = sre_parse.parse(pattern.pattern, pattern.flags).getwidth()[1]
+        except Exception:
+            return False
+        if max_width > SKIP_MARGIN:
+            return False
+    return True
+
+def iter_holes(fd: int | None, start: int, end: int) -> Iterator[ByteRange]:
+    """Yields the holes of a sparse file within [start, end), or nothing where SEEK_HOLE is not supported or there is no file"""
+    if fd is None or not hasattr(os, 'SEEK_HOLE'):
+        return
+    position = start
+    try:
+        while position < end:
+            hole = os.lseek(fd, position, os.SEEK_HOLE)
+            if hole >= end:
+                return
+            try:
+                data = os.lseek(fd, hole, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+                data = end  # The hole runs to the end of the file
+            yield hole, min(data, end)
+            position = data
+    except OSError:
+        return  # Not supported by this filesystem
+
+def iter_zero_runs(memory_data: mmap.mmap, start: int, end: int) -> Iterator[ByteRange]:
+    """Yields runs of aligned ZERO_BLOCK_SIZE blocks within [start, end) that hold nothing but zeros"""
+    block = -(-start // ZERO_BLOCK_SIZE) * ZERO_BLOCK_SIZE
+    run_start = None
+    while block + ZERO_BLOCK_SIZE <= end:
+        if memory_data[block:block + ZERO_BLOCK_SIZE] == ZERO_BLOCK:
+            if run_start is None:
+                run_start = block
+        elif run_start is not None:
+            yield run_start, block
+            run_start = None
+        block += ZERO_BLOCK_SIZE
+    if run_start is not None:
+        yield run_start, block
+
+def find_empty_regions(memory_data: mmap.mmap, fd: int | None, start: int, end: int) -> list[ByteRange]:
+    """Returns the parts of [start, end) that are safe to skip: holes and all-zero runs of at least
+    MIN_SKIP_LENGTH, each less SKIP_MARGIN bytes at its end"""
+    candidates = []
+    position = start
+    # Holes read back as zeros without touching the disk, so only the data between them is checked block by block
+    for hole_start, hole_end in iter_holes(fd, start, end):
+        candidates.extend(iter_zero_runs(memory_data, position, hole_start))
+        candidates.append((hole_start, hole_end))
+        position = hole_end
+    candidates.extend(iter_zero_runs(memory_data, position, end))
+
+    merged = []
+    for run_start, run_end in candidates:
+        if merged and run_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], run_end))
+        else:
+            merged.append((run_start, run_end))
+    return [(run_start, run_end - SKIP_MARGIN) for run_start, run_end in merged if run_end - run_start >= MIN_SKIP_LENGTH]
+
+def data_regions(start: int, end: int, skipped: list[ByteRange]) -> Iterator[ByteRange]:
+    """Yields the parts of [start, end) outside the sorted skipped ranges"""
+    position = start
+    for skip_start, skip_end in skipped:
+        if skip_start > position:
+            yield position, skip_start
+        position = max(position, skip_end)
+    if position < end:
+        yield position, end
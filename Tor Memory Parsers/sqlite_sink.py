@@ -0,0 +1,112 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from dataclasses import fields
+
+from records import BrowserActivity, BrowserRequest, HttpRequest, SocksRequest, TabData, tuple_getter
+
+# Every record type gets its own table, named after the class in snake_case. These are always created.
+RECORD_TYPES = [BrowserActivity, BrowserRequest, TabData, HttpRequest, SocksRequest]
+
+# Rows buffered per table before they are handed to executemany
+BATCH_SIZE = 10_000
+
+# Rows written between commits, so a huge dump does not build one enormous journal
+TRANSACTION_SIZE = 1_000_000
+
+# Columns indexed in every table that has them, along with the record offset
+INDEXED_COLUMNS = ['url', 'first_party_domain']
+
+SQL_TYPES = {int: 'INTEGER', str: 'TEXT'}
+
+def table_name(record_type: type) -> str:
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', record_type.__name__).lower()
+
+class SqliteSink:
+    """Appends carved records from one dump to a SQLite case database.
+
+    Records are buffered per table and inserted with executemany inside large
+    transactions. Indexes are created once loading has finished; when
+    appending to a database that already has them, SQLite maintains them as
+    rows go in. Each run adds a row to the dumps table, and every record
+    carries that row's id, so several dumps can share one database.
+    """
+
+    def __init__(self, database_path: str, dump_file_path: str):
+        self.connection = sqlite3.connect(database_path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA cache_size = -65536")  # 64 MiB
+
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS dumps ("
+            "id INTEGER PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "started_at TEXT NOT NULL, finished_at TEXT, metrics TEXT)"
+        )
+        self.tables = {}
+        for record_type in RECORD_TYPES:
+            self.add_table(record_type)
+
+        cursor = self.connection.execute(
+            "INSERT INTO dumps (path, size, started_at) VALUES (?, ?, ?)",
+            (os.path.abspath(dump_file_path), os.path.getsize(dump_file_path), time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())),
+        )
+        self.dump_id = cursor.lastrowid
+        self.rows_in_transaction = 0
+        self.connection.execute("BEGIN")
+
+    def add_table(self, record_type: type) -> tuple:
+        """Creates the table for a record type if the database lacks it; types beyond RECORD_TYPES come from parser plugins"""
+        name = table_name(record_type)
+        record_fields = fields(record_type)
+        # Annotations of a plugin's record type may be strings, which are stored as TEXT
+        columns = ", ".join(f'"{field.name}" {SQL_TYPES.get(field.type, "TEXT")} NOT NULL' for field in record_fields)
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS {name} (dump_id INTEGER NOT NULL REFERENCES dumps(id), {columns})')
+
+        placeholders = ", ".join("?" * (len(record_fields) + 1))
+        insert_sql = f'INSERT INTO {name} VALUES ({placeholders})'
+        table = self.tables[record_type] = (name, [field.name for field in record_fields], insert_sql, tuple_getter([field.name for field in record_fields]), [])
+        return table
+
+    def write(self, record) -> None:
+        """Buffers one record, flushing its table when the batch is full"""
+        table = self.tables.get(type(record)) or self.add_table(type(record))
+        name, columns, insert_sql, getter, batch = table
+        batch.append((self.dump_id, *getter(record)))
+        if len(batch) >= BATCH_SIZE:
+            self.flush(insert_sql, batch)
+
+    def flush(self, insert_sql: str, batch: list[tuple]) -> None:
+        self.connection.executemany(insert_sql, batch)
+        self.rows_in_transaction += len(batch)
+        batch.clear()
+        if self.rows_in_transaction >= TRANSACTION_SIZE:
+            self.connection.execute("COMMIT")
+            self.connection.execute("BEGIN")
+            self.rows_in_transaction = 0
+
+    def close(self, metrics: dict | None = None) -> None:
+        """Writes the remaining rows, marks the dump as finished and builds the indexes"""
+        for name, columns, insert_sql, getter, batch in self.tables.values():
+            if batch:
+                self.flush(insert_sql, batch)
+        self.connection.execute(
+            "UPDATE dumps SET finished_at = ?, metrics = ? WHERE id = ?",
+            (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()), json.dumps(metrics) if metrics else None, self.dump_id),
+        )
+        self.connection.execute("COMMIT")
+
+        for name, columns, insert_sql, getter, batch in self.tables.values():
+            # The offset is always the first field of a record
+            for column in [columns[0], 'dump_id'] + [column for column in INDEXED_COLUMNS if column in columns]:
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS {name}_{column} ON {name} ("{column}")')
+        self.connection.execute("PRAGMA optimize")
+        self.connection.close()
+
+    def abort(self) -> None:
+        """Rolls back the open transaction; rows committed earlier stay, with finished_at left empty"""
+        if self.connection.in_transaction:
+            self.connection.execute("ROLLBACK")
+        self.connection.close()
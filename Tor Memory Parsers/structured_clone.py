@@ -0,0 +1,163 @@
+import mmap
+import struct
+
+# Tags from SpiderMonkey's StructuredClone.cpp. Every value starts with a 64-bit
+# little-endian word holding a 32-bit data field followed by a 32-bit tag, so a
+# tag shows up in memory as xx xx FF FF.
+SCTAG_FLOAT_MAX = 0xFFF00000
+SCTAG_NULL = 0xFFFF0000
+SCTAG_UNDEFINED = 0xFFFF0001
+SCTAG_BOOLEAN = 0xFFFF0002
+SCTAG_INT32 = 0xFFFF0003
+SCTAG_STRING = 0xFFFF0004
+SCTAG_DATE_OBJECT = 0xFFFF0005
+SCTAG_REGEXP_OBJECT = 0xFFFF0006
+SCTAG_ARRAY_OBJECT = 0xFFFF0007
+SCTAG_OBJECT_OBJECT = 0xFFFF0008
+SCTAG_BOOLEAN_OBJECT = 0xFFFF000A
+SCTAG_STRING_OBJECT = 0xFFFF000B
+SCTAG_NUMBER_OBJECT = 0xFFFF000C
+SCTAG_END_OF_KEYS = 0xFFFF0013
+
+# The top bit of a string's data field is set for Latin-1 strings and clear for two-byte (UTF-16LE) strings
+LATIN1_FLAG = 0x80000000
+
+# Offset of the \xFF\xFF tag bytes within a value's header word
+TAG_MARKER_OFFSET = 6
+
+# Sanity limits, anything beyond these is treated as corrupt memory rather than a record
+MAX_STRING_LENGTH = 1 << 20
+# Property names are short identifiers
+MAX_KEY_LENGTH = 256
+MAX_PROPERTIES = 256
+MAX_DEPTH = 8
+
+pair_struct = struct.Struct('<II')
+double_struct = struct.Struct('<d')
+
+class DecodeError(ValueError):
+    """Raised when the bytes at an offset are not a valid structured-clone value"""
+
+def read_pair(memory_data: mmap.mmap, offset: int) -> tuple[int, int]:
+    """Reads the (data, tag) header word at offset"""
+    if offset < 0 or offset + 8 > len(memory_data):
+        raise DecodeError(f"header at {offset} is outside the dump")
+    return pair_struct.unpack_from(memory_data, offset)
+
+def read_string_chars(memory_data: mmap.mmap, offset: int, data: int, max_length: int = MAX_STRING_LENGTH) -> tuple[str, int]:
+    """Reads the characters of a string whose header data field is data, returning the text and the next 8-byte aligned offset.
+
+    A string claiming more than max_length characters is rejected before any of it is read.
+    """
+    length = data & ~LATIN1_FLAG
+    if length > max_length:
+        raise DecodeError(f"string at {offset} claims {length} characters")
+
+    if data & LATIN1_FLAG:
+        size, encoding = length, 'latin-1'
+    else:
+        size, encoding = length * 2, 'utf-16-le'
+    end = offset + size
+    if end > len(memory_data):
+        raise DecodeError(f"string at {offset} runs past the end of the dump")
+
+    return memory_data[offset:end].decode(encoding, errors='replace'), end + (-size % 8)
+
+def string_value_after_key(key_marker: int, key_size: int) -> int:
+    """Offset of the characters of a string value following a key of key_size bytes whose \\xFF\\xFF tag marker is at key_marker"""
+    key_end = key_marker + 2 + key_size
+    return key_end + (-key_size % 8) + 8
+
+def read_string(memory_data: mmap.mmap, offset: int, max_length: int = MAX_STRING_LENGTH) -> tuple[str, int]:
+    """Reads a string value whose header word is at offset"""
+    data, tag = read_pair(memory_data, offset)
+    if tag != SCTAG_STRING:
+        raise DecodeError(f"expected a string at {offset}, found tag {tag:#x}")
+    return read_string_chars(memory_data, offset + 8, data, max_length)
+
+def read_value(memory_data: mmap.mmap, offset: int, depth: int = 0, max_length: int = MAX_STRING_LENGTH) -> tuple[object, int]:
+    """Reads one value whose header word is at offset, returning the value and the offset after it; a string value may be at most max_length characters"""
+    data, tag = read_pair(memory_data, offset)
+    offset += 8
+
+    if tag < SCTAG_FLOAT_MAX:
+        # Doubles are stored as raw IEEE-754 words rather than tagged pairs
+        return double_struct.unpack_from(memory_data, offset - 8)[0], offset
+    if tag in (SCTAG_NULL, SCTAG_UNDEFINED):
+        return None, offset
+    if tag in (SCTAG_BOOLEAN, SCTAG_BOOLEAN_OBJECT):
+        return bool(data), offset
+    if tag == SCTAG_INT32:
+        return data - (1 << 32) if data & 0x80000000 else data, offset
+    if tag == SCTAG_STRING:
+        return read_string_chars(memory_data, offset, data, max_length)
+    if tag == SCTAG_STRING_OBJECT:
+        # A String object's pair carries the string's own length and encoding, with its characters right after
+        return read_string_chars(memory_data, offset, data, max_length)
+    if tag in (SCTAG_DATE_OBJECT, SCTAG_NUMBER_OBJECT):
+        read_pair(memory_data, offset)  # Bounds check
+        return double_struct.unpack_from(memory_data, offset)[0], offset + 8
+    if tag == SCTAG_REGEXP_OBJECT:
+        source, offset = read_string(memory_data, offset, max_length)
+        return f"/{source}/", offset
+    if tag in (SCTAG_OBJECT_OBJECT, SCTAG_ARRAY_OBJECT):
+        if depth >= MAX_DEPTH:
+            raise DecodeError(f"object at {offset - 8} is nested too deeply")
+        return read_properties(memory_data, offset, depth + 1, max_length)
+
+    raise DecodeError(f"unsupported tag {tag:#x} at {offset - 8}")
+
+def read_properties(memory_data: mmap.mmap, offset: int, depth: int = 0, max_length: int = MAX_STRING_LENGTH) -> tuple[dict[str | int, object], int]:
+    """Reads key/value pairs from offset up to the END_OF_KEYS marker; keys may be at most MAX_KEY_LENGTH characters and string values max_length"""
+    properties = {}
+    for _ in range(MAX_PROPERTIES):
+        if read_pair(memory_data, offset)[1] == SCTAG_END_OF_KEYS:
+            return properties, offset + 8
+
+        key, offset = read_value(memory_data, offset, depth, MAX_KEY_LENGTH)
+        if not isinstance(key, (str, int)):
+            raise DecodeError(f"property key before {offset} is not a string or index")
+        properties[key], offset = read_value(memory_data, offset, depth, max_length)
+
+    raise DecodeError(f"object ending at {offset} has too many properties")
+
+def decode_record(memory_data: mmap.mmap, offset: int, max_lengths: dict[str, int] | None = None, default_max_length: int = MAX_STRING_LENGTH) -> dict[str | int, object]:
+    """Decodes the key/value pairs of a record starting at offset.
+
+    Carved records are often cut short by reused memory, so decoding stops at
+    the first word that is not a valid value and whatever was read up to that
+    point is returned. A string value may be at most max_lengths[key]
+    characters, or default_max_length for keys not listed, so a false match
+    whose length word is junk stops without reading the bytes it claims.
+    """
+    properties = {}
+    max_lengths = max_lengths or {}
+    try:
+        for _ in range(MAX_PROPERTIES):
+            if read_pair(memory_data, offset)[1] == SCTAG_END_OF_KEYS:
+                break
+            key, value_offset = read_value(memory_data, offset, max_length=MAX_KEY_LENGTH)
+            if not isinstance(key, (str, int)):
+                break
+            value, offset = read_value(memory_data, value_offset, max_length=max_lengths.get(key, default_max_length))
+            properties[key] = value
+    except DecodeError:
+        pass
+    return properties
+
+def value_to_text(value: object) -> str | None:
+    """Renders a decoded scalar for CSV output, or None if it has no text form"""
+    if value is None or isinstance(value, dict):
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def property_text(properties: dict[str | int, object], key: str, default: str) -> str:
+    """Returns the text of a decoded property, or default if it is missing or not a scalar"""
+    text = value_to_text(properties.get(key))
+    return default if text is None else text
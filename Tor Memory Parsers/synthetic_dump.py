@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import random
+import struct
+
+from structured_clone import LATIN1_FLAG, SCTAG_END_OF_KEYS, SCTAG_STRING, TAG_MARKER_OFFSET
+
+# Planted records and noise blocks each get their own slot, so nothing overlaps
+SLOT_SIZE = 4096
+
+# The smallest valid PNG, used as a base64 favicon
+FAVICON_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+
+ACTIVITY_PREFIXES = [
+    b'\x01\x00\x00\x00\xF8\x00\x00\x00', b'\x01\x00\x00\x00\xF8\x01\x00\x00', b'\x01\x00\x00\x00\xF8\x03\x00\x00',
+    b'\x02\x00\x00\x00\xF8\x01\x00\x00', b'\x02\x00\x00\x00\xF8\x00\x00\x00', b'\x02\x00\x00\x00\xF8\x03\x00\x00',
+    b'\x03\x00\x00\x00\xF8\x01\x00\x00', b'\x03\x00\x00\x00\xF8\x00\x00\x00', b'\x04\x00\x00\x00\xF8\x00\x00\x00',
+    b'\x05\x00\x00\x00\xF8\x00\x00\x00',
+]
+BROWSER_REQUEST_PREFIXES = [b'\x02\x00\x00\x00\xF8\x01\x00\x00\x4F\x5E', b'\x02\x00\x00\x00\xF8\x00\x00\x00\x4F\x5E', b'\x02\x00\x00\x00\xF8\x03\x00\x00\x4F\x5E']
+SOCKS_REQUEST_PREFIXES = [b'\x01\x00\x00\x00\xF8\x00\x00\x00\x2E', b'\x01\x00\x00\x00\xF8\x01\x00\x00\x2E', b'\x02\x00\x00\x00\xF8\x01\x00\x00\x2E', b'\x02\x00\x00\x00\xF8\x00\x00\x00\x2E']
+
+def parse_size(size: str) -> int:
+    """Parses a size such as 512M, 64G or 1T into bytes"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    size = size.strip().upper().removesuffix('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+def onion_host(rng: random.Random) -> str:
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz234567') for _ in range(16)) + '.onion'
+
+def clone_string(text: str, latin1: bool = True) -> bytes:
+    """Serialises text the way SpiderMonkey's structured clone writes a string value"""
+    if latin1:
+        data, length_and_encoding = text.encode('latin-1'), len(text) | LATIN1_FLAG
+    else:
+        data, length_and_encoding = text.encode('utf-16-le'), len(text)
+    return struct.pack('<II', length_and_encoding, SCTAG_STRING) + data + b'\x00' * (-len(data) % 8)
+
+def clone_properties(properties: list[tuple[str, str]], latin1: bool = True) -> bytes:
+    return b''.join(clone_string(key, latin1) + clone_string(value, latin1) for key, value in properties) + struct.pack('<II', 0, SCTAG_END_OF_KEYS)
+
+def text_after_prefix(prefix: bytes, text: str, two_byte: bool) -> bytes:
+    """The binary header of a prefix followed by its text tail and text, as 8-bit or UTF-16LE text"""
+    return prefix[:8] + (prefix[8:].decode('latin-1') + text).encode('utf-16-le' if two_byte else 'latin-1')
+
+# Each builder returns the record bytes and the offset, relative to their start, that the parser reports.
+# With two_byte set, the record's text is written as UTF-16LE where Gecko may hold it that way.
+
+def build_browser_activity(rng: random.Random, two_byte: bool = False) -> tuple[bytes, int]:
+    url = f"https://{onion_host(rng)}/{rng.randrange(10**6)}"
+    return rng.choice(ACTIVITY_PREFIXES) + url.encode() + b'\x00\x00', 0
+
+def build_browser_request(rng: random.Random, two_byte: bool = False) -> tuple[bytes, int]:
+    host = onion_host(rng)
+    body = f"privateBrowsingId=1&firstPartyDomain={host},p,:https://{host}/res/{rng.randrange(10**6)}.js"
+    return text_after_prefix(rng.choice(BROWSER_REQUEST_PREFIXES), body + '\x00', two_byte), 0
+
+def build_socks_request(rng: random.Random, two_byte: bool = False) -> tuple[bytes, int]:
+    host = onion_host(rng)
+    body = f"[tlsflags0x00000000]{host}:443(socks:127.0.0.1:9150)[{host}:443]:0:^privateBrowsingId=1&firstPartyDomain={host}"
+    return text_after_prefix(rng.choice(SOCKS_REQUEST_PREFIXES), body + '\x00', two_byte), 0
+
+def build_http_request(rng: random.Random, two_byte: bool = False) -> tuple[bytes, int]:
+    host = onion_host(rng)
+    record = clone_properties([
+        ('requestId', f"{rng.randrange(10**8):08d}"),
+        ('url', f"https://{host}/page/{rng.randrange(10**6)}"),
+        ('originUrl', f"https://{host}/"),
+        ('documentUrl', f"https://{host}/"),
+        ('method', rng.choice(['GET', 'POST'])),
+        ('type', rng.choice(['main_frame', 'sub_frame', 'script', 'image'])),
+    ], latin1=not two_byte)
+    return record, TAG_MARKER_OFFSET
+
+def build_tab_data(rng: random.Random, two_byte: bool = False) -> tuple[bytes, int]:
+    host = onion_host(rng)
+    record = clone_string('firefox-private', latin1=not two_byte) + clone_properties([
+        ('url', f"http://{host}/index.html"),
+        ('title', f"{host} - Tab {rng.randrange(1000)}"),
+        ('favIconUrl', f"data:image/png;base64,{FAVICON_PNG}"),
+    ], latin1=not two_byte)
+    return record, TAG_MARKER_OFFSET
+
+# Near misses carry a parser's anchor pattern but not a valid record behind it
+
+def near_miss_browser_activity(rng: random.Random) -> bytes:
+    return rng.choice(ACTIVITY_PREFIXES) + rng.choice([b'\x00', b'\x08', b'\xFF', b'\xD0']) + rng.randbytes(32)
+
+def near_miss_browser_request(rng: random.Random) -> bytes:
+    return rng.choice(BROWSER_REQUEST_PREFIXES) + b'privateBrowsing' + rng.randbytes(200)
+
+def near_miss_socks_request(rng: random.Random) -> bytes:
+    return rng.choice(SOCKS_REQUEST_PREFIXES) + rng.randbytes(200)
+
+def near_miss_http_request(rng: random.Random) -> bytes:
+    return b'\xFF\xFFrequestId' + rng.randbytes(64)
+
+def near_miss_tab_data(rng: random.Random) -> bytes:
+    return clone_string('firefox-private') + rng.randbytes(64).replace(b'url', b'uRl')
+
+# Parser name: (record builder, near-miss builder)
+GENERATORS = {
+    'browser_activity': (build_browser_activity, near_miss_browser_activity),
+    'browser_requests': (build_browser_request, near_miss_browser_request),
+    'socks_requests': (build_socks_request, near_miss_socks_request),
+    'http_requests': (build_http_request, near_miss_http_request),
+    'browser_session_data': (build_tab_data, near_miss_tab_data),
+}
+
+def generate_dump(output_path: str, size: int, records_per_parser: int, near_misses_per_parser: int, noise_ratio: float, seed: int, two_byte_ratio: float = 0.0) -> dict:
+    """Writes a sparse synthetic memory dump and returns its ground truth.
+
+    Records, near misses and random noise blocks are placed in distinct
+    SLOT_SIZE slots; everything else is left as holes, so the file only
+    occupies the space actually written. A two_byte_ratio share of the
+    records hold their text as UTF-16LE.
+
+    The slots are chosen up front and filled in offset order, each block
+    built just before it is written from a generator seeded by its slot, so
+    only the slot plan is held in memory however large the dump.
+    """
+    rng = random.Random(seed)
+    slot_count = size // SLOT_SIZE
+    noise_blocks = int(slot_count * noise_ratio)
+    planted = len(GENERATORS) * (records_per_parser + near_misses_per_parser)
+    if planted + noise_blocks > slot_count:
+        raise ValueError(f"a {size} byte dump only has room for {slot_count} records and noise blocks")
+
+    # (slot, parser name or None for noise, whether it is a near miss), in offset order
+    slots = rng.sample(range(slot_count), planted + noise_blocks)
+    plan = []
+    for name in GENERATORS:
+        plan.extend((slots.pop(), name, False) for _ in range(records_per_parser))
+        plan.extend((slots.pop(), name, True) for _ in range(near_misses_per_parser))
+    plan.extend((slot, None, False) for slot in slots)
+    del slots
+    plan.sort()
+
+    truth = {'size': size, 'seed': seed, 'records': {name: [] for name in GENERATORS}, 'near_misses': {name: [] for name in GENERATORS}}
+    with open(output_path, 'wb') as dump_file:
+        dump_file.truncate(size)
+        for slot, name, near_miss in plan:
+            slot_offset = slot * SLOT_SIZE
+            block_rng = random.Random(f"{seed}/{slot}")
+            if name is None:
+                data = block_rng.randbytes(SLOT_SIZE)
+            elif near_miss:
+                data = GENERATORS[name][1](block_rng)
+                truth['near_misses'][name].append(slot_offset)
+            else:
+                two_byte = two_byte_ratio > 0 and block_rng.random() < two_byte_ratio
+                data, match_offset = GENERATORS[name][0](block_rng, two_byte)
+                truth['records'][name].append(slot_offset + match_offset)
+            dump_file.seek(slot_offset)
+            dump_file.write(data)
+    return truth
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic Tor Browser memory dump with known records for benchmarking the parsers.")
+    parser.add_argument('-o', '--output', type=str, required=True, help="Path to the dump file to create.")
+    parser.add_argument('-s', '--size', type=str, default="1G", help="Dump size, e.g. 512M, 64G or 1T (default: 1G).")
+    parser.add_argument('-r', '--records', type=int, default=1000, help="Valid records planted per parser (default: 1000).")
+    parser.add_argument('-n', '--near-misses', type=int, default=1000, help="Anchor patterns without a valid record planted per parser (default: 1000).")
+    parser.add_argument('--noise', type=float, default=0.01, help="Fraction of the dump filled with random bytes (default: 0.01).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument('--two-byte', type=float, default=0.0, help="Fraction of records whose text is UTF-16LE (default: 0).")
+    parser.add_argument('--truth', type=str, help="Path to the ground truth JSON (default: <output>.truth.json).")
+
+    args = parser.parse_args()
+    truth = generate_dump(args.output, parse_size(args.size), args.records, args.near_misses, args.noise, args.seed, args.two_byte)
+
+    truth_path = args.truth or args.output + ".truth.json"
+    with open(truth_path, 'w', encoding='utf-8') as truth_file:
+        json.dump(truth, truth_file)
+    print(f"Dump written to: {args.output}")
+    print(f"Ground truth written to: {truth_path}")
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The parser modules import each other as siblings, as they do when run as scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shared
+from plugins import builtin_parsers
+from synthetic_dump import generate_dump
+
+# A few MB dump is carved in many chunks once CHUNK_SIZE is cut down to this
+TEST_CHUNK_SIZE = 256 * 1024
+
+@pytest.fixture(scope='session')
+def synthetic_dump(tmp_path_factory) -> tuple[str, dict]:
+    """A 4 MiB synthetic dump, with a third of its records stored as two-byte text, and its ground truth"""
+    dump_path = str(tmp_path_factory.mktemp("dump") / "synthetic.bin")
+    truth = generate_dump(dump_path, 4 * 1024 * 1024, records_per_parser=40, near_misses_per_parser=20, noise_ratio=0.02, seed=7, two_byte_ratio=0.3)
+    return dump_path, truth
+
+@pytest.fixture
+def memory_parsers():
+    return builtin_parsers()
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Scans in TEST_CHUNK_SIZE chunks, so workers, checkpoints and ranges cross many chunk edges"""
+    monkeypatch.setattr(shared, 'CHUNK_SIZE', TEST_CHUNK_SIZE)
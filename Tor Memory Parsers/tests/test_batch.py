@@ -0,0 +1,70 @@
+import csv
+import shutil
+from concurrent.futures import Future
+
+import batch
+from batch import DUMP_HEADER, MERGED_FOLDER, BatchDump, carve_batch, run_batch
+from shared import RunOptions
+
+def read_csv(path) -> list[list[str]]:
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        return list(csv.reader(csv_file))
+
+def test_biggest_dump_first_within_the_device_cap(monkeypatch, tmp_path):
+    # Dumps submitted before each wait for one to finish; every dump finishes at once
+    rounds = [[]]
+
+    class ImmediateExecutor:
+        def __init__(self, jobs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def submit(self, function, dump_file_path, *args):
+            rounds[-1].append(dump_file_path)
+            future = Future()
+            future.set_result(1.0)
+            return future
+
+    wait = batch.wait
+
+    def wait_for_round(futures, return_when):
+        rounds.append([])
+        return wait(futures, return_when=return_when)
+
+    monkeypatch.setattr(batch, 'ProcessPoolExecutor', ImmediateExecutor)
+    monkeypatch.setattr(batch, 'wait', wait_for_round)
+    dumps = [
+        BatchDump("small.bin", "small", 10, device=2),
+        BatchDump("huge.bin", "huge", 40, device=1),
+        BatchDump("large.bin", "large", 30, device=1),
+        BatchDump("medium.bin", "medium", 20, device=3),
+        BatchDump("tiny.bin", "tiny", 5, device=3),
+    ]
+    results = run_batch(dumps, str(tmp_path), [], RunOptions(), jobs=3, per_device=1, stream=None)
+
+    # large waits for huge on device 1, even though there is a free job for it
+    assert rounds[:-1] == [["huge.bin", "medium.bin", "small.bin"], ["large.bin", "tiny.bin"]]
+    assert [result['label'] for result in results] == ["huge", "large", "medium", "small", "tiny"]
+
+def test_merged_outputs_name_each_dump(synthetic_dump, memory_parsers, tmp_path):
+    dump_path, _ = synthetic_dump
+    batch_folder = tmp_path / "dumps"
+    (batch_folder / "host").mkdir(parents=True)
+    shutil.copy(dump_path, batch_folder / "first.mem")
+    shutil.copy(dump_path, batch_folder / "host" / "second.raw")
+    output_folder = tmp_path / "output"
+    assert carve_batch(str(batch_folder), str(output_folder), memory_parsers, RunOptions(quiet=True), jobs=2)
+
+    for memory_parser in memory_parsers:
+        merged = read_csv(output_folder / MERGED_FOLDER / f"{memory_parser.name}.csv")
+        expected = [[DUMP_HEADER] + memory_parser.csv_headers]
+        for label in ["first", "host_second"]:
+            _, *rows = read_csv(output_folder / label / f"{memory_parser.name}.csv")
+            expected += [[label] + row for row in rows]
+        assert len(expected) > 1
+        assert merged == expected, memory_parser.name
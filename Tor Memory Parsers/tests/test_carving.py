@@ -0,0 +1,184 @@
+import contextlib
+import functools
+import gc
+import io
+import mmap
+import os
+import pathlib
+import random
+import re
+
+import pytest
+
+import shared
+from base64icon import MANIFEST_NAME
+from checkpoint import Checkpoint
+from records import BrowserActivity
+from shared import CsvBatchWriter, MemoryParser, RunOptions, extract_all_to_csv, iter_records
+
+def read_outputs(output_folder: str, memory_parsers) -> dict[str, bytes]:
+    """Each parser's CSV and the favicon manifest, by name"""
+    paths = {memory_parser.name: os.path.join(output_folder, f"{memory_parser.name}.csv") for memory_parser in memory_parsers}
+    paths[MANIFEST_NAME] = os.path.join(output_folder, "Extracted FavIcons", MANIFEST_NAME)
+    outputs = {}
+    for name, path in paths.items():
+        with open(path, 'rb') as output_file:
+            outputs[name] = output_file.read()
+    return outputs
+
+def carve_to_csv(dump_path: str, output_folder, memory_parsers, **options) -> dict[str, bytes]:
+    extract_all_to_csv(dump_path, str(output_folder), memory_parsers, RunOptions(quiet=True, **options))
+    return read_outputs(str(output_folder), memory_parsers)
+
+def test_recall(synthetic_dump, memory_parsers):
+    dump_path, truth = synthetic_dump
+    found = {memory_parser.name: set() for memory_parser in memory_parsers}
+    record_parsers = {memory_parser.record_type: memory_parser.name for memory_parser in memory_parsers}
+    for record in iter_records(dump_path, memory_parsers):
+        found[record_parsers[type(record)]].add(int(record.to_csv_row()[0]))
+
+    for name, offsets in truth['records'].items():
+        assert set(offsets) <= found[name], name
+    for name, offsets in truth['near_misses'].items():
+        # The HTTP parser keeps every requestId anchor, filling in what it cannot read as Unknown
+        if name != 'http_requests':
+            assert not set(offsets) & found[name], name
+
+def test_workers_match_serial(synthetic_dump, memory_parsers, small_chunks, tmp_path):
+    dump_path, _ = synthetic_dump
+    serial = carve_to_csv(dump_path, tmp_path / "serial", memory_parsers)
+    parallel = carve_to_csv(dump_path, tmp_path / "parallel", memory_parsers, workers=3)
+    assert parallel == serial
+
+def test_index_matches_scan(synthetic_dump, memory_parsers, small_chunks, tmp_path):
+    dump_path, _ = synthetic_dump
+    scanned = carve_to_csv(dump_path, tmp_path / "scanned", memory_parsers)
+    indexed = carve_to_csv(dump_path, tmp_path / "indexed", memory_parsers, index_folder=str(tmp_path / "index"))
+    assert os.listdir(tmp_path / "index")
+    assert indexed == scanned
+    # A second run reads the index that is already there
+    assert carve_to_csv(dump_path, tmp_path / "reindexed", memory_parsers, index_folder=str(tmp_path / "index"), workers=2) == scanned
+
+def open_dump(dump_path: str, kind: str, stack):
+    """The dump at dump_path as one kind of DumpSource"""
+    if kind == 'path':
+        return dump_path
+    if kind == 'pathlib':
+        return pathlib.Path(dump_path)
+    dump_file = stack.enter_context(open(dump_path, 'rb'))
+    if kind == 'file':
+        return dump_file
+    if kind == 'mmap':
+        return stack.enter_context(mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ))
+    data = dump_file.read()
+    return {'bytes': data, 'bytearray': bytearray(data), 'memoryview': memoryview(data), 'bytesio': io.BytesIO(data)}[kind]
+
+@pytest.mark.parametrize('kind', ['path', 'pathlib', 'file', 'mmap', 'bytes', 'bytearray', 'memoryview', 'bytesio'])
+def test_every_dump_source_carves_the_same_records(synthetic_dump, memory_parsers, small_chunks, kind):
+    dump_path, _ = synthetic_dump
+    expected = [record.to_csv_row() for record in iter_records(dump_path, memory_parsers)]
+    with contextlib.ExitStack() as stack:
+        dump = open_dump(dump_path, kind, stack)
+        assert [record.to_csv_row() for record in iter_records(dump, memory_parsers)] == expected
+
+def test_unsupported_dump_source_is_rejected(memory_parsers):
+    with pytest.raises(TypeError):
+        next(iter_records(12345, memory_parsers))
+
+def test_ranges_keep_hits_starting_inside(synthetic_dump, memory_parsers, small_chunks):
+    dump_path, _ = synthetic_dump
+    full = [record.to_csv_row() for record in iter_records(dump_path, memory_parsers)]
+    # Unaligned edges, one range across a chunk edge and one overlapping another
+    ranges = [(100_000, 900_000), (1_500_001, 2_600_003), (2_500_000, 2_700_000)]
+    ranged = [record.to_csv_row() for record in iter_records(dump_path, memory_parsers, ranges=ranges)]
+
+    expected = [row for row in full if any(start <= int(row[0]) < end for start, end in ranges)]
+    assert expected
+    assert ranged == expected
+
+def test_resume_matches_uninterrupted(synthetic_dump, memory_parsers, small_chunks, monkeypatch, tmp_path):
+    dump_path, _ = synthetic_dump
+    uninterrupted = carve_to_csv(dump_path, tmp_path / "uninterrupted", memory_parsers)
+
+    # Checkpoint after every chunk, write rows straight through so some land after the last checkpoint, and crash part way through the dump
+    monkeypatch.setattr(shared, 'CsvCheckpointer', functools.partial(shared.CsvCheckpointer, interval=0))
+    monkeypatch.setattr(shared, 'CSV_BATCH_SIZE', 1)
+    write_record = CsvBatchWriter.__call__
+    written = 0
+
+    def crashing_write(self, record):
+        nonlocal written
+        written += 1
+        if written > 150:
+            raise KeyboardInterrupt
+        write_record(self, record)
+
+    monkeypatch.setattr(CsvBatchWriter, '__call__', crashing_write)
+    output_folder = tmp_path / "resumed"
+    with pytest.raises(KeyboardInterrupt):
+        carve_to_csv(dump_path, output_folder, memory_parsers)
+    # Finish off the abandoned run's generators now rather than during the resumed run
+    gc.collect()
+    assert Checkpoint.load(str(output_folder / "checkpoint.json")).offset > 0
+
+    monkeypatch.setattr(CsvBatchWriter, '__call__', write_record)
+    resumed = carve_to_csv(dump_path, output_folder, memory_parsers, resume=True)
+    assert resumed == uninterrupted
+    assert not (output_folder / "checkpoint.json").exists()
+
+def test_index_falls_back_to_scan_with_a_warning(synthetic_dump, memory_parsers, tmp_path, capsys):
+    dump_path, _ = synthetic_dump
+    pattern_parser = MemoryParser("pattern", ["Offset", "Type", "Data"], re.compile(rb'onion[a-z]+'), lambda offset, memory_data, _: BrowserActivity(offset, "Pattern", ""), BrowserActivity)
+    scanned = carve_to_csv(dump_path, tmp_path / "scanned", memory_parsers + [pattern_parser])
+    capsys.readouterr()
+    indexed = carve_to_csv(dump_path, tmp_path / "indexed", memory_parsers + [pattern_parser], index_folder=str(tmp_path / "index"))
+    assert indexed == scanned
+    # -q prints nothing, the warning included
+    assert not capsys.readouterr().err
+
+    extract_all_to_csv(dump_path, str(tmp_path / "shown"), memory_parsers + [pattern_parser], RunOptions(index_folder=str(tmp_path / "index")))
+    assert "scanned instead of indexed" in capsys.readouterr().err
+
+def test_flagged_patterns_run_with_the_builtin_parsers(synthetic_dump, memory_parsers):
+    dump_path, _ = synthetic_dump
+    with open(dump_path, 'rb') as dump_file:
+        data = dump_file.read()
+    planted = len(data)
+    data += b"..Onion\nX..ONION-ONION..host.ONION..x.ONION"
+    # Flags, an inline global flag, a backreference and a group name used twice, none of which survive being joined
+    flagged_patterns = {
+        "ignorecase": re.compile(rb'onion', re.IGNORECASE),
+        "dotall": re.compile(rb'(?s)onion.x', re.IGNORECASE),
+        "backreference": re.compile(rb'(ONION)-\1'),
+        "named": re.compile(rb'(?P<host>[a-z]+)\.ONION'),
+        "same name": re.compile(rb'(?P<host>x)\.ONION'),
+    }
+    all_parsers = memory_parsers + [MemoryParser(name, ["Offset"], pattern, None) for name, pattern in flagged_patterns.items()]
+
+    combined = {memory_parser.name: [] for memory_parser in all_parsers}
+    for memory_parser, offset, matched in shared.iter_matches(data, all_parsers):
+        combined[memory_parser.name].append((offset, matched))
+    for memory_parser in all_parsers:
+        alone = [(offset, matched) for _, offset, matched in shared.iter_matches(data, [memory_parser])]
+        assert combined[memory_parser.name] == alone, memory_parser.name
+    assert [offset - planted for offset, _ in combined["ignorecase"] if offset >= planted] == [2, 11, 17, 29, 38]
+    assert [offset - planted for offset, _ in combined["backreference"]] == [11]
+
+def test_progress_moves_without_hits(memory_parsers, small_chunks, tmp_path):
+    dump_path = tmp_path / "no_hits.bin"
+    dump_path.write_bytes(random.Random(1).randbytes(2 * 1024 * 1024) + bytes(2 * 1024 * 1024))
+    progress = shared.Progress(dump_path.stat().st_size, io.StringIO(), interval=0)
+    assert not list(shared.iter_dump_records(str(dump_path), memory_parsers, None, 1, shared.RunMetrics(), progress))
+    drawn = {float(line.split('%')[0].split(']')[1]) for line in progress.stream.getvalue().splitlines()}
+    # A draw at every chunk of data, then one past the skipped zeros
+    assert len(drawn - {0.0, 100.0}) >= 8
+
+def test_find_within_counts_only_markers_past_the_limit(monkeypatch):
+    monkeypatch.setattr(shared, 'bound_hits', shared.Counter())
+    data = b"name=" + b"x" * 20 + b";" + b"\x00" * 40
+    assert shared.find_within(data, b";", 0, 30, 'found') == 25
+    assert shared.find_within(data, b";", 0, 15, 'cut short') == -1
+    assert shared.find_within(data, b"&", 0, 10, 'absent') == -1
+    two_byte = "name=xxxxxxxxx;".encode('utf-16-le')
+    assert shared.find_within(two_byte, ";".encode('utf-16-le'), 0, 20, 'two-byte cut short', 2) == -1
+    assert shared.bound_hits == {'cut short': 1, 'two-byte cut short': 1}
@@ -0,0 +1,31 @@
+import csv
+
+import pytest
+
+from correlate import DEFAULT_WINDOW, CorrelationIndex, write_sessions
+from records import BrowserRequest, SocksRequest, TabData
+
+HOST = "duskgytldkxiuqc6.onion"
+
+def planted_records(gap: int) -> list[tuple[str, str, object]]:
+    """A SOCKS request and a browser request for the same onion site gap bytes apart, and an unrelated tab between them"""
+    return [
+        ('', 'socks_requests', SocksRequest(1000, "SOCKS", "", f"{HOST}:443", "socks:127.0.0.1:9150", f"{HOST}:443", "1", f"(https,{HOST})")),
+        ('', 'browser_requests', BrowserRequest(1000 + gap, "Browser", "1", f"(https,{HOST})", f"https://www.{HOST}/index.js")),
+        ('', 'browser_session_data', TabData(1000 + gap // 2, "Tab", "https://other.example/", "Other", "")),
+    ]
+
+@pytest.mark.parametrize('gap, linked', [(DEFAULT_WINDOW // 2, True), (DEFAULT_WINDOW * 2, False)])
+def test_shared_domain_links_records_within_the_window(gap, linked):
+    correlation_index = CorrelationIndex(planted_records(gap))
+    sessions = [[correlation_index.offsets[record_id] for record_id in members] for members in correlation_index.sessions(DEFAULT_WINDOW)]
+    assert sessions == ([[1000, 1000 + gap]] if linked else [])
+
+def test_window_of_zero_links_at_any_distance(tmp_path):
+    correlation_index = CorrelationIndex(planted_records(DEFAULT_WINDOW * 100))
+    sessions = correlation_index.sessions(0)
+    write_sessions(correlation_index, sessions, str(tmp_path))
+
+    with open(tmp_path / "sessions.csv", newline='', encoding='utf-8') as sessions_file:
+        _, *rows = csv.reader(sessions_file)
+    assert [(row[0], row[2], row[4]) for row in rows] == [("1", "socks_requests", HOST), ("1", "browser_requests", HOST)]
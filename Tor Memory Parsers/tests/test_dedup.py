@@ -0,0 +1,33 @@
+import csv
+
+from dedup import RecordAggregator, aggregate_headers
+from records import record_from_csv_row
+from shared import RunOptions, extract_all_to_csv, iter_records
+
+def test_spilled_rows_match_in_memory_rows(synthetic_dump, memory_parsers, tmp_path):
+    dump_path, _ = synthetic_dump
+    records = list(iter_records(dump_path, memory_parsers))
+    # Every record again further on, so each unique record is seen twice
+    shift = 1 << 32
+    repeats = [record_from_csv_row(type(record), [str(int(row[0]) + shift)] + row[1:]) for record in records for row in [record.to_csv_row()]]
+
+    in_memory = RecordAggregator(str(tmp_path))
+    spilling = RecordAggregator(str(tmp_path), max_memory_bytes=4096)
+    for record in records + repeats:
+        in_memory.add(record)
+        spilling.add(record)
+
+    assert spilling.runs
+    in_memory_rows = list(in_memory.rows())
+    assert sorted(spilling.rows()) == sorted(in_memory_rows)
+    assert all(int(row[-4]) >= 2 for row in in_memory_rows)
+
+def test_aggregated_rows_line_up_with_their_headers(synthetic_dump, memory_parsers, tmp_path):
+    dump_path, _ = synthetic_dump
+    extract_all_to_csv(dump_path, str(tmp_path), memory_parsers, RunOptions(quiet=True, dedup=True))
+    for memory_parser in memory_parsers:
+        with open(tmp_path / f"{memory_parser.name}.csv", newline='', encoding='utf-8') as csv_file:
+            headers, *rows = csv.reader(csv_file)
+        assert headers == aggregate_headers(memory_parser.csv_headers)
+        assert rows
+        assert all(len(row) == len(headers) for row in rows), memory_parser.name
@@ -0,0 +1,76 @@
+import re
+import sys
+
+import pytest
+
+import records
+from plugins import PLUGIN_PACKAGE, ParserRegistry, PluginError, load_registry
+from shared import MemoryParser, iter_records
+
+# A plugin named like one of the parser modules, importing a helper beside it
+PLUGIN_SOURCE = '''
+from records import slotted_record
+from shared import MemoryParser
+from . import onion_patterns
+
+@slotted_record
+class OnionHost:
+    match_offset: int
+    host: str
+
+    def to_csv_row(self):
+        return [str(self.match_offset), self.host]
+
+def process_match(match_offset, memory_data, output_folder):
+    match = onion_patterns.onion_host_re.match(memory_data, match_offset)
+    return OnionHost(match_offset, match.group().decode())
+
+memory_parser = MemoryParser("onion_hosts", ["Offset", "Host"], onion_patterns.onion_host_re, process_match, OnionHost)
+'''
+
+HELPER_SOURCE = '''
+import re
+
+onion_host_re = re.compile(rb'[a-z2-7]{16,56}\\.onion')
+'''
+
+# The hosts upper case, so they are only found with the pattern's inline IGNORECASE flag
+UPPERCASE_HELPER_SOURCE = '''
+import re
+
+onion_host_re = re.compile(rb'(?i)[A-Z2-7]{16,56}\\.ONION')
+'''
+
+def test_plugin_named_like_a_parser_module(synthetic_dump, small_chunks, tmp_path):
+    dump_path, _ = synthetic_dump
+    (tmp_path / "records.py").write_text(PLUGIN_SOURCE)
+    (tmp_path / "onion_patterns.py").write_text(HELPER_SOURCE)
+    registry = ParserRegistry()
+    registry.load_folder(str(tmp_path))
+    [memory_parser] = registry.select()
+
+    assert memory_parser.process_matcher.__module__.startswith(PLUGIN_PACKAGE + ".")
+    assert sys.modules['records'] is records
+    serial = [record.to_csv_row() for record in iter_records(dump_path, memory_parser)]
+    assert serial
+    # Workers unpickle process_match by its module's name
+    assert [record.to_csv_row() for record in iter_records(dump_path, memory_parser, workers=2)] == serial
+
+def test_flagged_plugin_pattern_runs_with_the_builtin_parsers(synthetic_dump, small_chunks, tmp_path):
+    dump_path, _ = synthetic_dump
+    (tmp_path / "onion_hosts.py").write_text(PLUGIN_SOURCE)
+    (tmp_path / "onion_patterns.py").write_text(UPPERCASE_HELPER_SOURCE)
+    memory_parsers = load_registry([str(tmp_path)]).select()
+    plugin_parser = memory_parsers[-1]
+    assert plugin_parser.name == "onion_hosts"
+
+    alone = [record.to_csv_row() for record in iter_records(dump_path, plugin_parser)]
+    builtin_alone = [record.to_csv_row() for record in iter_records(dump_path, memory_parsers[:-1])]
+    together = list(iter_records(dump_path, memory_parsers, workers=2))
+    assert alone
+    assert [record.to_csv_row() for record in together if isinstance(record, plugin_parser.record_type)] == alone
+    assert [record.to_csv_row() for record in together if not isinstance(record, plugin_parser.record_type)] == builtin_alone
+
+def test_str_pattern_is_rejected():
+    with pytest.raises(PluginError):
+        ParserRegistry().register(MemoryParser("text", ["Offset"], re.compile(r'onion'), None))
@@ -0,0 +1,16 @@
+import pytest
+
+from ranges import parse_offset, parse_range
+
+@pytest.mark.parametrize('text, offset', [("4096", 4096), ("0001000", 1000), ("0", 0), ("0x1000", 4096), ("0X00ff", 255)])
+def test_parse_offset(text, offset):
+    assert parse_offset(text) == offset
+
+@pytest.mark.parametrize('text', ["", "0x", "12ab", "0b101"])
+def test_parse_offset_rejects_junk(text):
+    with pytest.raises(ValueError):
+        parse_offset(text)
+
+def test_parse_range_with_zero_padded_offsets():
+    assert parse_range("0001000-0002000") == (1000, 2000)
+    assert parse_range("0x1000+0010") == (4096, 4106)
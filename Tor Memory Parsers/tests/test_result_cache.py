@@ -0,0 +1,68 @@
+import os
+import time
+
+import shared
+from plugins import ParserRegistry
+from result_cache import ResultCache, dump_fingerprint
+from test_carving import carve_to_csv
+
+PLUGIN_SOURCE = '''
+import re
+from records import BrowserActivity
+from shared import MemoryParser
+
+def process_match(match_offset, memory_data, output_folder):
+    return BrowserActivity(match_offset, "Onion", "")
+
+memory_parser = MemoryParser("onions", ["Offset", "Type", "Data"], re.compile(rb'\\.onion'), process_match, BrowserActivity)
+'''
+
+def test_cache_hit_replays_identical_csvs(synthetic_dump, memory_parsers, monkeypatch, tmp_path):
+    dump_path, _ = synthetic_dump
+    cache_folder = str(tmp_path / "cache")
+    uncached = carve_to_csv(dump_path, tmp_path / "uncached", memory_parsers)
+    stored = carve_to_csv(dump_path, tmp_path / "stored", memory_parsers, cache_folder=cache_folder)
+    assert stored == uncached
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("the dump was scanned")
+
+    monkeypatch.setattr(shared, 'iter_dump_records', no_scan)
+    assert carve_to_csv(dump_path, tmp_path / "replayed", memory_parsers, cache_folder=cache_folder) == uncached
+
+def test_changed_parser_source_invalidates_its_entry(synthetic_dump, memory_parsers, tmp_path):
+    dump_path, _ = synthetic_dump
+    plugin_folder = tmp_path / "plugins"
+    plugin_folder.mkdir()
+    plugin_path = plugin_folder / "onions.py"
+    plugin_path.write_text(PLUGIN_SOURCE)
+    registry = ParserRegistry()
+    registry.load_folder(str(plugin_folder))
+    cached_parsers = memory_parsers + registry.select()
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    fingerprint = dump_fingerprint(dump_path)
+    ranges = [(0, os.path.getsize(dump_path))]
+    keys = [cache.entry_key(fingerprint, memory_parser, ranges) for memory_parser in cached_parsers]
+    for key in keys:
+        cache.writer(key, {}).commit()
+
+    plugin_path.write_text(PLUGIN_SOURCE + "# A fix to the carver\n")
+    new_keys = [cache.entry_key(fingerprint, memory_parser, ranges) for memory_parser in cached_parsers]
+    assert new_keys[:-1] == keys[:-1]
+    assert new_keys[-1] != keys[-1]
+    assert not cache.has(new_keys[-1])
+
+def test_eviction_by_age_then_size(tmp_path):
+    day = 24 * 3600
+    cache = ResultCache(str(tmp_path), max_bytes=250, max_age=5 * day)
+    now = time.time()
+    for name, age in [("expired", 6 * day), ("oldest", 3 * day), ("older", 2 * day), ("newest", day)]:
+        path = cache.entry_path(name)
+        with open(path, 'wb') as entry_file:
+            entry_file.write(bytes(100))
+        os.utime(path, (now - age, now - age))
+
+    cache.evict()
+    # The expired entry goes for its age, then the least recently used one until 250 bytes are left
+    assert sorted(os.listdir(tmp_path)) == ["newest.records", "older.records"]
@@ -0,0 +1,41 @@
+import random
+import re
+
+from metrics import RunMetrics
+from records import BrowserActivity
+from shared import MemoryParser, iter_records
+from sparse import SKIP_MARGIN, ZERO_BLOCK_SIZE
+from synthetic_dump import build_browser_activity, build_socks_request
+
+MIB = 1024 * 1024
+
+def test_hits_at_the_edges_of_zero_runs_are_carved(memory_parsers):
+    rng = random.Random(3)
+    # Found only if the end of the zero run before 'TOR' is scanned
+    zero_led_parser = MemoryParser("zero_led", ["Offset", "Type", "Data"], re.compile(rb'\x00{4}TOR'), lambda offset, memory_data, _: BrowserActivity(offset, "Zero-led", ""), BrowserActivity)
+    socks_request, _ = build_socks_request(rng)
+    browser_activity, _ = build_browser_activity(rng)
+
+    # Data, 2 MiB of zeros, data starting with a hit and ending with one, then zeros to the end
+    first_zeros = 4 * ZERO_BLOCK_SIZE
+    second_data = first_zeros + 2 * MIB
+    second_zeros = second_data + 4 * ZERO_BLOCK_SIZE
+    head = b'TOR' + socks_request
+    tail = browser_activity
+    data = rng.randbytes(first_zeros) + bytes(2 * MIB)
+    data += head + rng.randbytes(second_zeros - second_data - len(head) - len(tail)) + tail
+    data += bytes(4 * MIB - len(data))
+
+    parsers = memory_parsers + [zero_led_parser]
+    metrics = RunMetrics()
+    skipping = [record.to_csv_row() for record in iter_records(data, parsers, metrics=metrics)]
+    scanning = [record.to_csv_row() for record in iter_records(data, parsers, skip_empty=False)]
+
+    assert skipping == scanning
+    offsets = {int(row[0]) for row in skipping}
+    assert {second_data - 4, second_data + 3, second_zeros - len(tail)} <= offsets
+    skipped = [(first_zeros, second_data - SKIP_MARGIN), (second_zeros, 4 * MIB - SKIP_MARGIN)]
+    assert metrics.skipped_ranges == skipped
+    report = metrics.to_dict("dump", 1.0, 1)
+    assert report['skipped_ranges'] == [list(skipped_range) for skipped_range in skipped]
+    assert report['bytes_skipped'] == sum(end - start for start, end in skipped)
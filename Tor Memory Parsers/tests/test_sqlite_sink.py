@@ -0,0 +1,31 @@
+import sqlite3
+from collections import Counter
+
+from shared import RunOptions, extract_all_to_csv, iter_records
+from sqlite_sink import INDEXED_COLUMNS, RECORD_TYPES, table_name
+
+def test_two_runs_append_to_one_database(synthetic_dump, memory_parsers, tmp_path):
+    dump_path, _ = synthetic_dump
+    database_path = tmp_path / "case.db"
+    expected = Counter(table_name(type(record)) for record in iter_records(dump_path, memory_parsers))
+    assert all(expected[table_name(record_type)] for record_type in RECORD_TYPES)
+    extract_all_to_csv(dump_path, None, memory_parsers, RunOptions(quiet=True, sqlite_path=str(database_path)))
+    extract_all_to_csv(dump_path, None, memory_parsers, RunOptions(quiet=True, sqlite_path=str(database_path), workers=2))
+
+    connection = sqlite3.connect(database_path)
+    try:
+        dumps = connection.execute("SELECT id, finished_at, metrics FROM dumps ORDER BY id").fetchall()
+        assert len(dumps) == 2
+        assert all(finished_at and metrics for _, finished_at, metrics in dumps)
+        indexes = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+        for record_type in RECORD_TYPES:
+            name = table_name(record_type)
+            counts = dict(connection.execute(f"SELECT dump_id, COUNT(*) FROM {name} GROUP BY dump_id"))
+            assert counts == {dump_id: expected[name] for dump_id, _, _ in dumps}, name
+            columns = [column for _, column, *_ in connection.execute(f"PRAGMA table_info({name})")]
+            # The record offset follows dump_id
+            for column in [columns[1], 'dump_id'] + [column for column in INDEXED_COLUMNS if column in columns]:
+                assert f"{name}_{column}" in indexes
+    finally:
+        connection.close()
@@ -0,0 +1,39 @@
+import struct
+
+from structured_clone import LATIN1_FLAG, SCTAG_END_OF_KEYS, SCTAG_OBJECT_OBJECT, SCTAG_STRING, SCTAG_STRING_OBJECT, decode_record
+from synthetic_dump import clone_properties, clone_string
+
+PROPERTIES = [
+    ('url', "https://example.onion/page?q=1"),
+    ('title', "Café été"),
+    ('method', "GET"),
+]
+
+def test_decodes_latin1_strings():
+    assert decode_record(clone_properties(PROPERTIES, latin1=True), 0) == dict(PROPERTIES)
+
+def test_decodes_two_byte_strings():
+    properties = PROPERTIES + [('note', "привет 日本")]
+    assert decode_record(clone_properties(properties, latin1=False), 0) == dict(properties)
+
+def test_stops_at_truncated_record():
+    # The first property, then a key whose header claims more characters than the dump holds
+    cut = clone_properties(PROPERTIES[:1], latin1=True)[:-8] + struct.pack('<II', 5000, SCTAG_STRING) + b'x' * 16
+    assert decode_record(cut, 0) == {'url': PROPERTIES[0][1]}
+
+def test_string_over_its_field_limit_stops_decoding():
+    data = clone_properties([('method', "GET"), ('url', "https://example.onion/" + "a" * 5000)], latin1=True)
+    assert decode_record(data, 0, {'url': 2000}) == {'method': "GET"}
+    assert len(decode_record(data, 0)['url']) == 5022
+
+def test_decodes_string_objects():
+    # new String("Tor") holds its length and encoding in its own pair, with no string header after it
+    string_object = struct.pack('<II', 3 | LATIN1_FLAG, SCTAG_STRING_OBJECT) + b"Tor" + b'\x00' * 5
+    data = clone_string("name") + string_object + clone_properties([('method', "GET")])
+    assert decode_record(data, 0) == {'name': "Tor", 'method': "GET"}
+
+def test_nested_strings_keep_their_field_limit():
+    nested = struct.pack('<II', 0, SCTAG_OBJECT_OBJECT) + clone_properties([('href', "https://example.onion/" + "a" * 5000)])
+    data = clone_properties([('method', "GET")])[:-8] + clone_string("location") + nested + struct.pack('<II', 0, SCTAG_END_OF_KEYS)
+    assert decode_record(data, 0, {'location': 2000}) == {'method': "GET"}
+    assert len(decode_record(data, 0)['location']['href']) == 5022
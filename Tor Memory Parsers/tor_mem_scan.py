@@ -0,0 +1,70 @@
+import argparse
+import inspect
+import os
+import sys
+
+from shared import CheckpointError, RunOptions, add_output_arguments, banner, check_output_arguments, extract_all_to_csv
+from plugins import PLUGIN_PATH_VARIABLE, PluginError, load_registry
+from batch import PER_DEVICE_JOBS, carve_batch
+
+def parse_parser_names(text: str) -> list[str]:
+    """Parses the comma separated parser names given to --parsers"""
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run any set of Tor memory parsers, built-in or plugins, over a Memory Dump in a single pass.")
+    parser.add_argument('-i', '--input', type=str, help="Path to the memory dump file.")
+    parser.add_argument('--batch', type=str, help="Carve every dump in this folder, or listed in this manifest file, into its own folder under the output folder, then merge them.")
+    parser.add_argument('-o', '--output', type=str, help="Path to the output folder, one CSV is written per parser.")
+    parser.add_argument('--parsers', type=parse_parser_names, help="Comma separated names of the parsers to run (default: all of them, see --list-parsers).")
+    parser.add_argument('--plugins', type=str, action='append', default=[], help=f"Load parser plugins from the modules in this folder (repeatable). Folders in ${PLUGIN_PATH_VARIABLE} are always loaded.")
+    parser.add_argument('--list-parsers', action='store_true', help="List the available parsers and exit.")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="With --batch, the number of dumps carved at once (default: the CPU count). Each uses --workers processes.")
+    parser.add_argument('--per-device', type=int, default=PER_DEVICE_JOBS, help=f"With --batch, the most dumps read from one storage device at once (default: {PER_DEVICE_JOBS}).")
+    add_output_arguments(parser)
+
+    args = parser.parse_args()
+    try:
+        registry = load_registry(args.plugins)
+    except PluginError as e:
+        print(f"[-] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.list_parsers:
+        for name, memory_parser in registry.parsers.items():
+            print(f"{name}\t{inspect.getmodule(memory_parser.process_matcher).__name__}")
+        sys.exit(0)
+
+    if bool(args.input) == bool(args.batch):
+        parser.error("exactly one of -i/--input or --batch is required")
+    check_output_arguments(parser, args)
+    if args.batch:
+        if args.sqlite or not args.output:
+            parser.error("--batch writes CSV into -o/--output and cannot use --sqlite")
+        if args.scan_ranges is not None:
+            parser.error("--ranges and --range-file apply to a single dump")
+        if args.jobs < 1 or args.per_device < 1:
+            parser.error("--jobs and --per-device must be at least 1")
+    try:
+        memory_parsers = registry.select(args.parsers)
+    except PluginError as e:
+        parser.error(str(e))
+    if not args.quiet:
+        print(banner("Tor Memory Scan"))
+
+    if args.batch:
+        try:
+            succeeded = carve_batch(args.batch, args.output, memory_parsers, RunOptions.from_args(args), args.jobs, args.per_device)
+        except (ValueError, OSError) as e:
+            print(f"[-] {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0 if succeeded else 1)
+
+    if not os.path.isfile(args.input):
+        print("The specified memory dump file does not exist.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        extract_all_to_csv(args.input, args.output, memory_parsers, RunOptions.from_args(args))
+    except CheckpointError as e:
+        print(f"[-] {e}", file=sys.stderr)
+        sys.exit(1)